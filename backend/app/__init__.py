@@ -5,9 +5,20 @@ from flask import Flask, jsonify
 import asyncio
 import threading
 
+from . import security_master
+from .bar_store import bar_store
 from .extensions import bcrypt, cors, db, jwt
+from .fill_relay import fill_relay
+from .leader import leader
+from .migrations import migrate
 from .routes import api
-from .models import Position, RevokedToken
+from .matching_engine import matching_engine
+from .models import Position
+from .portfolio_stream import portfolio_stream
+from .symbol_index import symbol_index
+from .token_blocklist import token_blocklist
+from .trigger_engine import trigger_book
+from .valuation_engine import valuation_engine
 from .websocket_manager import ws_manager
 from .scheduler import init_scheduler
 
@@ -56,13 +67,23 @@ def create_app(config=None):
     db.init_app(app)
     jwt.init_app(app)
     bcrypt.init_app(app)
+    security_master.init_app(app)
+    bar_store.init_app(app)
+    trigger_book.init_app(app)
+    matching_engine.init_app(app)
+    portfolio_stream.init_app(app)
+    valuation_engine.init_app(app)
+    symbol_index.init_app(app)
+    leader.init_app(app)
+    token_blocklist.init_app(app)
+    fill_relay.init_app(app)
 
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
         jti = jwt_payload.get("jti")
         if not jti:
             return False
-        return RevokedToken.query.filter_by(jti=jti).first() is not None
+        return token_blocklist.is_revoked(jti)
 
     @jwt.unauthorized_loader
     def unauthorized_callback(_reason):
@@ -104,19 +125,28 @@ def create_app(config=None):
     def _init_background():
         """Defer heavy init so worker can accept connections quickly (avoids Render port scan timeout)."""
         with app.app_context():
-            db.create_all()
+            migrate()
+            fill_relay.start()
+            trigger_count = trigger_book.load()
+            print(f"Loaded {trigger_count} stop-loss/take-profit triggers")
+            resting_count = matching_engine.load()
+            print(f"Loaded {resting_count} resting limit/stop orders")
+            print(f"Indexed {symbol_index.load()} symbols for search")
             symbols = db.session.query(Position.symbol).distinct().all()
-            symbol_list = [symbol[0] for symbol in symbols]
+            # Resting orders need ticks even where no position is held yet
+            symbol_list = sorted({symbol[0] for symbol in symbols} | matching_engine.symbols())
             if symbol_list:
                 def run_ws_manager():
                     asyncio.run(ws_manager.start(symbol_list))
                 t = threading.Thread(target=run_ws_manager, daemon=True)
                 t.start()
                 print(f"Started WebSocket for {len(symbol_list)} symbols: {symbol_list}")
-            if not app.config.get("TESTING", False):
-                init_scheduler(app)
+            init_scheduler(app)
 
-    t = threading.Thread(target=_init_background, daemon=True)
-    t.start()
+    # Tests create their own schema and share a single in-memory SQLite connection
+    # with any other thread, so there is nothing to initialise in the background
+    if not app.config.get("TESTING", False):
+        t = threading.Thread(target=_init_background, daemon=True)
+        t.start()
 
     return app
\ No newline at end of file
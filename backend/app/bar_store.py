@@ -0,0 +1,331 @@
+"""Local OHLCV history store behind the chart endpoints.
+
+Bars live in their own SQLite file, stored column-wise: each row of the
+``chunks`` table holds a fixed time span of one series as a float64 NumPy
+array (ts, open, high, low, close, volume). A range query reads a handful of
+blobs and slices them, instead of materialising one Python tuple per bar.
+
+The first request for a symbol/interval downloads as much history as upstream
+allows; later requests only fetch the tail since the last stored bar (at most
+every TAIL_REFRESH seconds), rewrite the chunks it touches and serve
+everything else locally.
+
+history() mirrors the subset of yf.Ticker.history used by the app and returns
+a DataFrame of the same shape (Open/High/Low/Close/Volume, tz-aware index).
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from . import upstream
+
+INTRADAY_INTERVALS = {"1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"}
+
+# How far back upstream serves each interval on the first download
+INITIAL_PERIODS = {
+    "1m": "7d",
+    "2m": "60d",
+    "5m": "60d",
+    "15m": "60d",
+    "30m": "60d",
+    "90m": "60d",
+    "60m": "730d",
+    "1h": "730d",
+}
+DEFAULT_INITIAL_PERIOD = "max"
+
+# Seconds before the tail is re-fetched from upstream
+TAIL_REFRESH = {"intraday": 60, "daily": 15 * 60}
+
+# Re-downloaded bars that differ from the stored ones by more than this mean
+# upstream re-adjusted history (split or dividend), so the series is reloaded
+ADJUSTMENT_TOLERANCE = 1e-4
+
+# Seconds of bars per chunk: about 250 daily bars, or a week of intraday bars
+CHUNK_SPAN = {"intraday": 7 * 86400, "daily": 365 * 86400}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    chunk INTEGER NOT NULL,
+    bars INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (symbol, interval, chunk)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS series (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    tz TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (symbol, interval)
+);
+"""
+
+_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def _download(symbol: str, interval: str, period: Optional[str] = None, start=None) -> pd.DataFrame:
+    """Upstream history for one symbol; the only function that talks to Yahoo."""
+    ticker = upstream.ticker(symbol, upstream.REFERENCE_MAX_AGE)
+    if start is not None:
+        return ticker.history(start=start, interval=interval)
+    return ticker.history(period=period, interval=interval)
+
+
+def refresh_seconds(interval: str) -> float:
+    """How long stored bars of this interval are served before the tail is re-fetched."""
+    return TAIL_REFRESH["intraday" if interval.lower() in INTRADAY_INTERVALS else "daily"]
+
+
+def _period_start(period: str, last: pd.Timestamp) -> Optional[pd.Timestamp]:
+    """Earliest bar time for a yfinance period string, relative to the latest bar. None for max."""
+    period = period.lower()
+    if period == "max":
+        return None
+    if period == "ytd":
+        return last.normalize().replace(month=1, day=1)
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not match:
+        raise ValueError(f"Invalid period: {period}")
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == "d":
+        return None  # handled as trading sessions by the caller
+    if unit == "wk":
+        return last - pd.DateOffset(weeks=count)
+    if unit == "mo":
+        return last - pd.DateOffset(months=count)
+    return last - pd.DateOffset(years=count)
+
+
+class BarStore:
+    def __init__(self):
+        self.path: Optional[str] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # One upstream refresh per series at a time
+        self._refresh_locks: dict[tuple[str, str], threading.Lock] = {}
+
+    def init_app(self, app) -> None:
+        path = app.config.get("BAR_STORE_PATH") or os.environ.get("BAR_STORE_PATH")
+        if not path:
+            os.makedirs(app.instance_path, exist_ok=True)
+            path = os.path.join(app.instance_path, "bars.db")
+        self.open(path)
+
+    def open(self, path: str) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self.path = path
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    # -- storage -----------------------------------------------------------
+
+    def _series(self, symbol: str, interval: str) -> Optional[tuple[str, float]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT tz, fetched_at FROM series WHERE symbol = ? AND interval = ?",
+                (symbol, interval),
+            ).fetchone()
+
+    @staticmethod
+    def _span(interval: str) -> int:
+        return CHUNK_SPAN["intraday" if interval in INTRADAY_INTERVALS else "daily"]
+
+    def _load_chunks(self, symbol: str, interval: str, where: str = "", params=(), tail: int = 0) -> np.ndarray:
+        """Stored bars of the matching chunks as one (n, 6) array ordered by ts."""
+        query = f"SELECT data FROM chunks WHERE symbol = ? AND interval = ?{where}"
+        if tail:
+            query += f" ORDER BY chunk DESC LIMIT {int(tail)}"
+        with self._lock:
+            blobs = [row[0] for row in self._conn.execute(query, (symbol, interval, *params))]
+        if tail:
+            blobs.reverse()
+        if not blobs:
+            return np.empty((0, 6))
+        return np.concatenate([np.frombuffer(blob, dtype=np.float64).reshape(-1, 6) for blob in blobs])
+
+    def _last_ts(self, symbol: str, interval: str, offset: int = 0) -> Optional[int]:
+        values = self._load_chunks(symbol, interval, tail=2)
+        if len(values) <= offset:
+            return None
+        return int(values[-1 - offset, 0])
+
+    def _write(self, symbol: str, interval: str, frame: pd.DataFrame, replace: bool = False) -> None:
+        frame_tz = getattr(frame.index, "tz", None) if frame is not None else None
+        if frame_tz is not None:
+            tz = str(frame_tz)
+        else:
+            # Empty downloads carry no timezone; keep the stored series'
+            series = self._series(symbol, interval)
+            tz = series[0] if series else "UTC"
+        new = np.empty((0, 6))
+        if frame is not None and not frame.empty:
+            frame = frame.dropna(subset=["Close"])
+            index = frame.index if frame.index.tz is not None else frame.index.tz_localize("UTC")
+            new = np.column_stack(
+                [index.as_unit("s").asi8.astype(np.float64), frame[_COLUMNS].fillna(0).to_numpy(dtype=np.float64)]
+            )
+        # An empty or failed download must not wipe the stored history
+        replace = replace and len(new) > 0
+
+        span = self._span(interval)
+        chunk_keys = (new[:, 0] // span * span).astype(np.int64)
+        rows = []
+        for chunk in np.unique(chunk_keys):
+            values = new[chunk_keys == chunk]
+            if not replace:
+                stored = self._load_chunks(symbol, interval, " AND chunk = ?", (int(chunk),))
+                # Re-sent bars replace the stored ones with the same timestamp
+                values = np.concatenate([stored[~np.isin(stored[:, 0], values[:, 0])], values])
+            values = values[np.argsort(values[:, 0], kind="stable")]
+            rows.append((symbol, interval, int(chunk), len(values), np.ascontiguousarray(values).tobytes()))
+
+        with self._lock:
+            with self._conn:
+                if replace:
+                    self._conn.execute("DELETE FROM chunks WHERE symbol = ? AND interval = ?", (symbol, interval))
+                self._conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?)", rows)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?)",
+                    (symbol, interval, tz, time.time()),
+                )
+
+    def _read(self, symbol: str, interval: str, tz: str, start_ts=None, end_ts=None) -> pd.DataFrame:
+        span = self._span(interval)
+        where, params = "", []
+        if start_ts is not None:
+            where += " AND chunk >= ?"
+            params.append(int(start_ts // span * span))
+        if end_ts is not None:
+            where += " AND chunk < ?"
+            params.append(int(end_ts))
+        values = self._load_chunks(symbol, interval, where + " ORDER BY chunk", params)
+        if start_ts is not None:
+            values = values[values[:, 0] >= start_ts]
+        if end_ts is not None:
+            values = values[values[:, 0] < end_ts]
+
+        index = pd.DatetimeIndex(
+            values[:, 0].astype("int64").astype("datetime64[s]"),
+            name="Datetime" if interval in INTRADAY_INTERVALS else "Date",
+        ).tz_localize("UTC").tz_convert(tz)
+        frame = pd.DataFrame(values[:, 1:], columns=_COLUMNS, index=index)
+        frame["Volume"] = frame["Volume"].astype("int64")
+        return frame
+
+    # -- upstream sync -----------------------------------------------------
+
+    def _stale(self, interval: str, fetched_at: float) -> bool:
+        return time.time() - fetched_at > refresh_seconds(interval)
+
+    def _refresh(self, symbol: str, interval: str) -> str:
+        """Bring the stored series up to date with upstream. Returns its timezone."""
+        key = (symbol, interval)
+        with self._lock:
+            refresh_lock = self._refresh_locks.setdefault(key, threading.Lock())
+        with refresh_lock:
+            series = self._series(symbol, interval)
+            if series and not self._stale(interval, series[1]):
+                return series[0]  # refreshed by another thread while we waited
+
+            if series is None or self._last_ts(symbol, interval) is None:
+                period = INITIAL_PERIODS.get(interval, DEFAULT_INITIAL_PERIOD)
+                self._write(symbol, interval, _download(symbol, interval, period=period), replace=True)
+                return self._series(symbol, interval)[0]
+
+            tz = series[0]
+            # Re-fetch from the bar before the last one: the last bar may still be forming,
+            # the one before it is final and tells us whether upstream re-adjusted history
+            anchor_ts = self._last_ts(symbol, interval, offset=1) or self._last_ts(symbol, interval)
+            anchor = pd.Timestamp(anchor_ts, unit="s", tz="UTC").tz_convert(tz)
+            try:
+                tail = _download(symbol, interval, start=anchor.date() if interval not in INTRADAY_INTERVALS else anchor)
+            except Exception as e:
+                print(f"Error refreshing bars for {symbol} {interval}, serving stored bars: {e}")
+                return tz
+
+            if tail is not None and not tail.empty and self._adjusted(symbol, interval, tz, anchor_ts, tail):
+                period = INITIAL_PERIODS.get(interval, DEFAULT_INITIAL_PERIOD)
+                try:
+                    reloaded = _download(symbol, interval, period=period)
+                except Exception as e:
+                    print(f"Error reloading adjusted bars for {symbol} {interval}, serving stored bars: {e}")
+                    return tz
+                self._write(symbol, interval, reloaded, replace=True)
+            else:
+                self._write(symbol, interval, tail)
+            return tz
+
+    def _adjusted(self, symbol: str, interval: str, tz: str, anchor_ts: int, tail: pd.DataFrame) -> bool:
+        stored = self._read(symbol, interval, tz, start_ts=anchor_ts, end_ts=anchor_ts + 1)
+        index = tail.index if tail.index.tz is not None else tail.index.tz_localize("UTC")
+        fresh = tail[index.as_unit("s").asi8 == anchor_ts]
+        if stored.empty or fresh.empty:
+            return False
+        old_close = float(stored["Close"].iloc[0])
+        new_close = float(fresh["Close"].iloc[0])
+        return old_close != 0 and abs(new_close - old_close) / abs(old_close) > ADJUSTMENT_TOLERANCE
+
+    # -- public API --------------------------------------------------------
+
+    def history(
+        self,
+        symbol: str,
+        period: Optional[str] = "1mo",
+        interval: str = "1d",
+        start=None,
+        end=None,
+    ) -> pd.DataFrame:
+        """Bars for a symbol by period or by [start, end) dates, like yf.Ticker.history."""
+        symbol = symbol.strip().upper()
+        interval = interval.lower()
+        series = self._series(symbol, interval)
+        if series is None or self._stale(interval, series[1]):
+            tz = self._refresh(symbol, interval)
+        else:
+            tz = series[0]
+
+        if start is not None:
+            start_ts = pd.Timestamp(start, tz=tz).timestamp()
+            end_ts = pd.Timestamp(end, tz=tz).timestamp() if end is not None else None
+            return self._read(symbol, interval, tz, start_ts=start_ts, end_ts=end_ts)
+
+        last_ts = self._last_ts(symbol, interval)
+        if last_ts is None:
+            return self._read(symbol, interval, tz)
+        last = pd.Timestamp(last_ts, unit="s", tz="UTC").tz_convert(tz)
+        period = (period or "1mo").lower()
+        period_start = _period_start(period, last)
+        if period.endswith("d") and period != "ytd":
+            # N trading sessions: over-read by calendar days, then keep the last N dates
+            sessions = int(period[:-1])
+            lookback = last.normalize() - timedelta(days=sessions * 2 + 7)
+            frame = self._read(symbol, interval, tz, start_ts=lookback.timestamp())
+            dates = frame.index.normalize()
+            keep = dates.unique()[-sessions:]
+            return frame[dates.isin(keep)]
+        start_ts = period_start.timestamp() if period_start is not None else None
+        return self._read(symbol, interval, tz, start_ts=start_ts)
+
+    def stats(self) -> dict:
+        with self._lock:
+            series, bars = self._conn.execute(
+                "SELECT (SELECT COUNT(*) FROM series), (SELECT COALESCE(SUM(bars), 0) FROM chunks)"
+            ).fetchone()
+        return {"path": self.path, "series": series, "bars": bars}
+
+
+bar_store = BarStore()
@@ -0,0 +1,119 @@
+"""Server-side downsampling of chart history, plus a small cache of the results.
+
+Two methods are available:
+
+- ``lttb``: Largest-Triangle-Three-Buckets on the close series. The selected
+  bars are returned unchanged, and the first and last bars are always kept, so
+  a line chart looks the same with a fraction of the points.
+- ``ohlc``: merges consecutive bars into one per bucket (first open, max high,
+  min low, last close, summed volume), for candlestick-style consumers.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+import numpy as np
+import pandas as pd
+
+METHODS = ("lttb", "ohlc")
+MIN_POINTS = 3
+MAX_POINTS = 5000
+
+# Downsampled payloads kept in memory
+CACHE_SIZE = 512
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the points Largest-Triangle-Three-Buckets keeps out of (x, y)."""
+    n = len(x)
+    if threshold >= n or threshold < MIN_POINTS:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    every = (n - 2) / (threshold - 2)
+    selected = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, n)
+        # Third vertex: the average of the next bucket
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[selected] - avg_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (avg_y - y[selected])
+        )
+        selected = start + int(area.argmax())
+        indices[bucket + 1] = selected
+    return indices
+
+
+def ohlc_buckets(history: pd.DataFrame, max_points: int) -> pd.DataFrame:
+    """Merge consecutive bars into at most ``max_points`` OHLCV bars, timed at each bucket's first bar."""
+    n = len(history)
+    if n <= max_points:
+        return history
+    buckets = np.arange(n) * max_points // n
+    merged = history.groupby(buckets).agg(
+        {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+    )
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    merged.index = history.index[starts]
+    return merged
+
+
+def downsample(history: pd.DataFrame, max_points: int, method: str = "lttb") -> pd.DataFrame:
+    """Reduce a history DataFrame to at most ``max_points`` bars."""
+    if history is None or len(history) <= max_points:
+        return history
+    if method == "ohlc":
+        return ohlc_buckets(history, max_points)
+    index = history.index
+    x = (index if index.tz is not None else index.tz_localize("UTC")).as_unit("s").asi8
+    return history.iloc[lttb_indices(x, history["Close"].to_numpy(), max_points)]
+
+
+class ChartCache:
+    """LRU cache of downsampled chart payloads with per-entry expiry."""
+
+    def __init__(self, size: int = CACHE_SIZE, clock: Callable[[], float] = time.monotonic):
+        self._size = size
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0}
+
+    def get(self, key: Hashable, ttl: float, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self._clock():
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry[1]
+            self._counters["misses"] += 1
+
+        value = loader()
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            for name in self._counters:
+                self._counters[name] = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries)}
+
+
+chart_cache = ChartCache()
@@ -0,0 +1,59 @@
+"""Chart payloads built from OHLCV history DataFrames.
+
+Everything is converted a column at a time (NumPy array -> list) rather than
+row by row with DataFrame.iterrows. The row shape the frontend has always
+received is then zipped together from those columns. The columnar shape
+(``format=columns``) skips the per-bar dicts altogether.
+"""
+import pandas as pd
+
+BAR_FIELDS = ("time", "open", "high", "low", "close", "volume")
+POINT_FIELDS = ("date", "close")
+
+
+def _index_utc(history: pd.DataFrame) -> pd.DatetimeIndex:
+    index = history.index
+    return index if index.tz is not None else index.tz_localize("UTC")
+
+
+def bar_columns(history: pd.DataFrame) -> dict[str, list]:
+    """{time: [...], open: [...], high, low, close, volume} with time in Unix seconds."""
+    if history is None or history.empty:
+        return {field: [] for field in BAR_FIELDS}
+    return {
+        "time": _index_utc(history).as_unit("s").asi8.tolist(),
+        "open": history["Open"].to_numpy(dtype="float64").tolist(),
+        "high": history["High"].to_numpy(dtype="float64").tolist(),
+        "low": history["Low"].to_numpy(dtype="float64").tolist(),
+        "close": history["Close"].to_numpy(dtype="float64").tolist(),
+        "volume": history["Volume"].to_numpy(dtype="int64").tolist(),
+    }
+
+
+def bar_rows(history: pd.DataFrame) -> list[dict]:
+    """[{time, open, high, low, close, volume}, ...], one dict per bar."""
+    return rows_from_columns(bar_columns(history))
+
+
+def point_columns(history: pd.DataFrame) -> dict[str, list]:
+    """{date: [...], close: [...]} with dates in the exchange's local calendar."""
+    if history is None or history.empty:
+        return {field: [] for field in POINT_FIELDS}
+    return {
+        "date": history.index.strftime("%Y-%m-%d").tolist(),
+        "close": history["Close"].to_numpy(dtype="float64").tolist(),
+    }
+
+
+def point_rows(history: pd.DataFrame) -> list[dict]:
+    """[{date, close}, ...], one dict per bar."""
+    return rows_from_columns(point_columns(history))
+
+
+def rows_from_columns(columns: dict[str, list]) -> list[dict]:
+    keys = tuple(columns)
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
+
+def columns_from_rows(rows: list[dict], fields) -> dict[str, list]:
+    return {field: [row[field] for row in rows] for field in fields}
@@ -0,0 +1,153 @@
+"""Fill notifications across processes.
+
+Fill listeners (the portfolio stream, the valuation engine) run after a
+commit, but only in the process that committed. Many fills commit in
+another process:
+
+- the scheduler leader's order processor;
+- the worker that claimed a tick-matched order;
+- a POST served by another worker or host.
+
+Without this relay those fills never reach this process's SSE subscribers,
+and its valuations drift until the next reconcile.
+
+order_execution writes every fill to fill_events in the filling transaction,
+tagged with the process that made it. Each process tails the table and hands
+other processes' fills to its own listeners:
+
+- A commit with fills touches a marker file, so workers on this host poll
+  within TICK_SECONDS.
+- Every process also polls at least every POLL_SECONDS, for other hosts.
+- A poll reads rows created since the previous poll minus POLL_OVERLAP and
+  skips rows it has already delivered, so rows that commit late are not
+  missed.
+
+The leader prunes rows older than RETAIN.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Optional
+
+from .extensions import db
+from .models import FillEvent
+from .order_execution import Fill, add_fill_listener, notify_fill_listeners, process_origin
+from .price_table import default_path
+
+TICK_SECONDS = 0.1
+POLL_SECONDS = 1.0
+POLL_OVERLAP = timedelta(seconds=60)
+RETAIN = timedelta(hours=1)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class FillRelay:
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self.app = None
+        self.marker_path = None
+        self._thread: Optional[threading.Thread] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._stop = threading.Event()
+        self._polled_at: Optional[datetime] = None  # Watermark of the last poll
+        self._seen: dict[int, datetime] = {}  # fill_events id -> created_at, within the overlap
+        self._marker = None
+        self._next_poll = 0.0
+        self._counters = {"polls": 0, "relayed": 0}
+
+    def init_app(self, app) -> None:
+        self.stop()
+        self._reset()
+        self.app = app
+        self.marker_path = os.environ.get("FILL_MARKER_PATH") or f"{default_path()}.fills"
+        add_fill_listener(self._on_local_fills)
+
+    def start(self) -> None:
+        """Tail fill_events on a daemon thread. Rows already in the table are not replayed."""
+        if self._thread is not None:
+            return
+        with self.app.app_context():
+            self.poll(deliver=False)
+        self._thread = threading.Thread(target=self._run, name="fill-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _read_marker(self):
+        try:
+            return os.stat(self.marker_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _on_local_fills(self, fills: list[Fill]) -> None:
+        try:
+            with open(self.marker_path, "a"):
+                pass
+            os.utime(self.marker_path, ns=(time.time_ns(), time.time_ns()))
+        except OSError as e:
+            print(f"Could not signal fills to other workers: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(TICK_SECONDS):
+            now = self._clock()
+            marker = self._read_marker()
+            if marker == self._marker and now < self._next_poll:
+                continue
+            # Read the marker before polling so a fill during the poll triggers another
+            self._marker = marker
+            self._next_poll = now + POLL_SECONDS
+            try:
+                with self.app.app_context():
+                    self.poll()
+                    db.session.remove()
+            except Exception as e:
+                print(f"Error relaying fills: {e}")
+
+    def poll(self, deliver: bool = True) -> int:
+        """Notify this process's listeners of other processes' new fills. Needs an app context. Returns the count."""
+        now = _utcnow()
+        query = FillEvent.query.order_by(FillEvent.id)
+        if self._polled_at is not None:
+            query = query.filter(FillEvent.created_at >= self._polled_at - POLL_OVERLAP)
+        else:
+            query = query.filter(FillEvent.created_at >= now - POLL_OVERLAP)
+        origin = process_origin()
+        fills = []
+        for row in query.all():
+            if row.id in self._seen:
+                continue
+            self._seen[row.id] = row.created_at
+            if row.origin != origin:
+                fills.append(Fill(row.account_id, row.symbol, Decimal(row.price), row.quantity, Decimal(row.avg_price)))
+        cutoff = now - POLL_OVERLAP * 2
+        for key in [key for key, created_at in self._seen.items() if created_at < cutoff]:
+            del self._seen[key]
+        self._polled_at = now
+        self._counters["polls"] += 1
+        if deliver and fills:
+            self._counters["relayed"] += len(fills)
+            notify_fill_listeners(fills, exclude=self._on_local_fills)
+        return len(fills) if deliver else 0
+
+    def prune(self) -> int:
+        """Delete rows every process has had time to read. Needs an app context. Returns the count."""
+        deleted = FillEvent.query.filter(FillEvent.created_at < _utcnow() - RETAIN).delete()
+        db.session.commit()
+        return deleted
+
+    def stats(self) -> dict:
+        return {**self._counters, "tracked": len(self._seen)}
+
+
+fill_relay = FillRelay()
@@ -0,0 +1,253 @@
+"""Leader election for the scheduler jobs.
+
+Every process runs the scheduler, but jobs that write shared state
+(order processing, pruning, security refresh) only run in the process that
+holds the "scheduler" lease. Jobs that rebuild per-process state, such as the
+search index and valuations, run everywhere.
+
+Two lease backends:
+
+- file: a non-blocking flock next to the price table. It covers every worker
+  on one host and is the default for SQLite, which is one host anyway.
+- database: a row in ``scheduler_leases`` that is taken or renewed with a
+  conditional UPDATE and expires after LEASE_SECONDS. It covers several hosts
+  sharing one database and is the default otherwise. Expiries are written
+  and compared on the database's clock, so skew between hosts cannot hand
+  the lease to two of them.
+
+The leader renews every RENEW_SECONDS. A dead leader is replaced within
+LEASE_SECONDS (DB) or RENEW_SECONDS (file). The leader publishes its job
+stats on the lease row, so /api/metrics on any worker can report them.
+"""
+import atexit
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+from .models import SchedulerLease
+from .price_table import default_path
+
+LEASE_NAME = "scheduler"
+LEASE_SECONDS = 10.0
+RENEW_SECONDS = 2.0
+
+
+def _utcnow() -> datetime:
+    # Naive UTC, like the other DateTime columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _db_now() -> datetime:
+    """The database's current time as naive UTC. Needs an app context."""
+    now = db.session.execute(select(func.now())).scalar()
+    if now.tzinfo is not None:
+        now = now.astimezone(timezone.utc).replace(tzinfo=None)
+    return now
+
+
+class FileLease:
+    backend = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._handle = None
+
+    def acquire(self, holder: str) -> bool:
+        if self._handle is not None:
+            return True
+        handle = open(self.path, "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        # Held until the process exits; the OS drops it if we die
+        self._handle = handle
+        return True
+
+    def release(self, holder: str) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+class DatabaseLease:
+    backend = "database"
+
+    def acquire(self, holder: str) -> bool:
+        """Take the lease if it is free or expired, or renew it if we hold it. Needs an app context."""
+        now = _db_now()
+        taken = SchedulerLease.query.filter(
+            SchedulerLease.name == LEASE_NAME,
+            or_(SchedulerLease.holder == holder, SchedulerLease.expires_at < now),
+        ).update(
+            {"holder": holder, "expires_at": now + timedelta(seconds=LEASE_SECONDS)},
+            synchronize_session=False,
+        )
+        if not taken and db.session.get(SchedulerLease, LEASE_NAME) is None:
+            db.session.add(SchedulerLease(
+                name=LEASE_NAME, holder=holder, expires_at=now + timedelta(seconds=LEASE_SECONDS),
+            ))
+            taken = 1
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another process created the row first
+            db.session.rollback()
+            return False
+        return bool(taken)
+
+    def release(self, holder: str) -> None:
+        SchedulerLease.query.filter_by(name=LEASE_NAME, holder=holder).update(
+            # Already past, even at the one-second resolution of SQLite's clock
+            {"expires_at": _db_now() - timedelta(seconds=1)}, synchronize_session=False
+        )
+        db.session.commit()
+
+
+class LeaderElection:
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self.app = None
+        self.lease = None
+        self.identity = f"{socket.gethostname()}:{os.getpid()}"
+        self._reset()
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self.is_leader = False
+        self._valid_until = 0.0
+        self._jobs: dict[str, dict] = {}
+        self._published: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self._reset()
+        self.identity = f"{socket.gethostname()}:{os.getpid()}"
+        backend = os.environ.get("SCHEDULER_LEASE")
+        if backend is None:
+            uri = app.config.get("SQLALCHEMY_DATABASE_URI", "")
+            backend = "file" if uri.startswith("sqlite") else "database"
+        if backend == "file":
+            path = os.environ.get("SCHEDULER_LOCK_PATH") or f"{default_path()}.scheduler"
+            self.lease = FileLease(path)
+        else:
+            self.lease = DatabaseLease()
+
+    # -- election ----------------------------------------------------------
+
+    def campaign(self) -> bool:
+        """Take or renew the lease once. Needs an app context. Returns whether we lead."""
+        started = self._clock()
+        try:
+            leading = self.lease.acquire(self.identity)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Scheduler lease error: {e}")
+            leading = False
+        with self._lock:
+            if leading != self.is_leader:
+                print(f"{'Became' if leading else 'Lost'} scheduler leader ({self.identity}, {self.lease.backend} lease)")
+            self.is_leader = leading
+            # Stop running jobs before anyone else could have taken over
+            self._valid_until = started + LEASE_SECONDS if leading else 0.0
+        if leading:
+            self._publish()
+        return leading
+
+    def start(self) -> None:
+        """Campaign now and then every RENEW_SECONDS on a daemon thread."""
+        if self._thread is not None:
+            return
+
+        def run():
+            while True:
+                with self.app.app_context():
+                    self.campaign()
+                time.sleep(RENEW_SECONDS)
+
+        with self.app.app_context():
+            self.campaign()
+        self._thread = threading.Thread(target=run, daemon=True, name="scheduler-lease")
+        self._thread.start()
+        atexit.register(self.resign)
+
+    def resign(self) -> None:
+        """Hand the lease back so another process takes over without waiting for expiry."""
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        try:
+            with self.app.app_context():
+                self.lease.release(self.identity)
+        except Exception as e:
+            print(f"Scheduler lease release failed: {e}")
+
+    def leading(self) -> bool:
+        with self._lock:
+            return self.is_leader and self._clock() < self._valid_until
+
+    # -- jobs --------------------------------------------------------------
+
+    def run(self, job_id: str, job: Callable[[], object]) -> None:
+        """Run a leader-only job here if we lead, recording how it went."""
+        with self._lock:
+            stats = self._jobs.setdefault(job_id, {"runs": 0, "failures": 0, "skipped": 0})
+        if not self.leading():
+            stats["skipped"] += 1
+            return
+        started = time.monotonic()
+        try:
+            job()
+        except Exception as e:
+            stats["failures"] += 1
+            stats["last_error"] = str(e)
+            print(f"Scheduler job {job_id} failed: {e}")
+        else:
+            stats["runs"] += 1
+        stats["last_run"] = _utcnow().isoformat() + "Z"
+        stats["last_duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+
+    def _publish(self) -> None:
+        with self._lock:
+            job_stats = json.dumps({job_id: {k: v for k, v in stats.items() if k != "skipped"}
+                                    for job_id, stats in self._jobs.items()})
+        if job_stats == self._published:
+            return
+        try:
+            updated = SchedulerLease.query.filter_by(name=LEASE_NAME).update(
+                {"holder": self.identity, "job_stats": job_stats}, synchronize_session=False
+            )
+            if not updated:
+                # File leases have no row until the first leader publishes
+                db.session.add(SchedulerLease(name=LEASE_NAME, holder=self.identity,
+                                              expires_at=_utcnow(), job_stats=job_stats))
+            db.session.commit()
+            self._published = job_stats
+        except Exception as e:
+            db.session.rollback()
+            print(f"Publishing scheduler stats failed: {e}")
+
+    def stats(self) -> dict:
+        """Leader identity and its published job stats. Needs an app context."""
+        row = db.session.get(SchedulerLease, LEASE_NAME)
+        return {
+            "backend": self.lease.backend if self.lease else None,
+            "identity": self.identity,
+            "is_leader": self.leading(),
+            "leader": row.holder if row else None,
+            "jobs": json.loads(row.job_stats) if row and row.job_stats else {},
+        }
+
+
+leader = LeaderElection()
@@ -0,0 +1,330 @@
+"""Offline exchange trading calendar.
+
+Answers "is this symbol's market open right now?" from a symbol -> exchange
+mapping plus each exchange's session hours, holidays and early closes, with
+no network I/O. Holiday tables are computed per exchange and year and cached.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Callable, Iterable, Optional
+from zoneinfo import ZoneInfo
+
+# Sentinel for "regular trading day" in holiday lookups
+_REGULAR = object()
+
+
+def _easter(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th ``weekday`` (Mon=0) of a month; n=-1 is the last one."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day: date) -> date:
+    """US-style observance: Saturday holidays move to Friday, Sunday ones to Monday."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def _observed_monday(day: date, taken: Iterable[date] = ()) -> date:
+    """UK/Commonwealth-style observance: weekend holidays move to the next free weekday."""
+    while day.weekday() >= 5 or day in taken:
+        day += timedelta(days=1)
+    return day
+
+
+def _nyse_holidays(year: int) -> dict:
+    holidays = {}
+    new_year = date(year, 1, 1)
+    # NYSE does not observe a Saturday New Year's Day on the preceding Friday
+    if new_year.weekday() != 5:
+        holidays[_observed(new_year)] = None
+    holidays[_nth_weekday(year, 1, 0, 3)] = None  # Martin Luther King Jr. Day
+    holidays[_nth_weekday(year, 2, 0, 3)] = None  # Washington's Birthday
+    holidays[_easter(year) - timedelta(days=2)] = None  # Good Friday
+    holidays[_nth_weekday(year, 5, 0, -1)] = None  # Memorial Day
+    if year >= 2022:
+        holidays[_observed(date(year, 6, 19))] = None  # Juneteenth
+    holidays[_observed(date(year, 7, 4))] = None  # Independence Day
+    holidays[_nth_weekday(year, 9, 0, 1)] = None  # Labor Day
+    thanksgiving = _nth_weekday(year, 11, 3, 4)
+    holidays[thanksgiving] = None
+    holidays[_observed(date(year, 12, 25))] = None  # Christmas
+
+    early_close = time(13, 0)
+    for day in (date(year, 7, 3), thanksgiving + timedelta(days=1), date(year, 12, 24)):
+        if day.weekday() < 5 and day not in holidays:
+            if day.month == 7 and date(year, 7, 4).weekday() >= 5:
+                continue
+            holidays[day] = early_close
+    return holidays
+
+
+def _lse_holidays(year: int) -> dict:
+    easter = _easter(year)
+    christmas = _observed_monday(date(year, 12, 25))
+    holidays = {
+        _observed_monday(date(year, 1, 1)): None,
+        easter - timedelta(days=2): None,
+        easter + timedelta(days=1): None,
+        _nth_weekday(year, 5, 0, 1): None,  # Early May bank holiday
+        _nth_weekday(year, 5, 0, -1): None,  # Spring bank holiday
+        _nth_weekday(year, 8, 0, -1): None,  # Summer bank holiday
+        christmas: None,
+        _observed_monday(date(year, 12, 26), taken=(christmas,)): None,
+    }
+    for day in (date(year, 12, 24), date(year, 12, 31)):
+        if day.weekday() < 5 and day not in holidays:
+            holidays[day] = time(12, 30)
+    return holidays
+
+
+def _tsx_holidays(year: int) -> dict:
+    christmas = _observed_monday(date(year, 12, 25))
+    holidays = {
+        _observed_monday(date(year, 1, 1)): None,
+        _nth_weekday(year, 2, 0, 3): None,  # Family Day
+        _easter(year) - timedelta(days=2): None,
+        date(year, 5, 24) - timedelta(days=date(year, 5, 24).weekday()): None,  # Victoria Day
+        _observed_monday(date(year, 7, 1)): None,  # Canada Day
+        _nth_weekday(year, 8, 0, 1): None,  # Civic Holiday
+        _nth_weekday(year, 9, 0, 1): None,  # Labour Day
+        _nth_weekday(year, 10, 0, 2): None,  # Thanksgiving
+        christmas: None,
+        _observed_monday(date(year, 12, 26), taken=(christmas,)): None,
+    }
+    if date(year, 12, 24).weekday() < 5:
+        holidays.setdefault(date(year, 12, 24), time(13, 0))
+    return holidays
+
+
+def _xetra_holidays(year: int) -> dict:
+    easter = _easter(year)
+    return {
+        date(year, 1, 1): None,
+        easter - timedelta(days=2): None,
+        easter + timedelta(days=1): None,
+        date(year, 5, 1): None,
+        date(year, 12, 24): None,
+        date(year, 12, 25): None,
+        date(year, 12, 26): None,
+        date(year, 12, 31): None,
+    }
+
+
+def _euronext_holidays(year: int) -> dict:
+    easter = _easter(year)
+    holidays = {
+        date(year, 1, 1): None,
+        easter - timedelta(days=2): None,
+        easter + timedelta(days=1): None,
+        date(year, 5, 1): None,
+        date(year, 12, 25): None,
+        date(year, 12, 26): None,
+    }
+    for day in (date(year, 12, 24), date(year, 12, 31)):
+        if day.weekday() < 5:
+            holidays[day] = time(14, 5)
+    return holidays
+
+
+def _asx_holidays(year: int) -> dict:
+    easter = _easter(year)
+    christmas = _observed_monday(date(year, 12, 25))
+    holidays = {
+        _observed_monday(date(year, 1, 1)): None,
+        _observed_monday(date(year, 1, 26)): None,  # Australia Day
+        easter - timedelta(days=2): None,
+        easter + timedelta(days=1): None,
+        date(year, 4, 25): None,  # Anzac Day
+        _nth_weekday(year, 6, 0, 2): None,  # King's Birthday
+        christmas: None,
+        _observed_monday(date(year, 12, 26), taken=(christmas,)): None,
+    }
+    for day in (date(year, 12, 24), date(year, 12, 31)):
+        if day.weekday() < 5 and day not in holidays:
+            holidays[day] = time(14, 10)
+    return holidays
+
+
+def _fixed_holidays(*month_days: tuple) -> Callable[[int], dict]:
+    """Holiday table made only of fixed calendar dates (lunisolar holidays are not modelled)."""
+    def holidays(year: int) -> dict:
+        return {date(year, month, day): None for month, day in month_days}
+    return holidays
+
+
+class Exchange:
+    """Trading sessions of one exchange, in the exchange's local time zone."""
+
+    def __init__(
+        self,
+        code: str,
+        tz: str,
+        sessions: list,
+        holidays: Optional[Callable[[int], dict]] = None,
+        always_open: bool = False,
+    ):
+        self.code = code
+        self.tz = ZoneInfo(tz)
+        self.sessions = sessions
+        self.always_open = always_open
+        self._holidays = lru_cache(maxsize=16)(holidays) if holidays else None
+
+    def holidays(self, year: int) -> dict:
+        """Map of date -> None (closed all day) or early close time."""
+        return self._holidays(year) if self._holidays else {}
+
+    def is_open(self, at: datetime) -> bool:
+        if self.always_open:
+            return True
+        local = at.astimezone(self.tz)
+        if local.weekday() >= 5:
+            return False
+        special = self.holidays(local.year).get(local.date(), _REGULAR)
+        if special is None:
+            return False
+        now = local.time()
+        for start, end in self.sessions:
+            if special is not _REGULAR and special < end:
+                end = special
+            if start <= now < end:
+                return True
+        return False
+
+    def __repr__(self):
+        return f"<Exchange {self.code}>"
+
+
+class _RollingWeekExchange(Exchange):
+    """Markets that trade continuously from Sunday evening to Friday evening (FX, futures)."""
+
+    def __init__(self, code: str, tz: str, open_at: time):
+        super().__init__(code, tz, sessions=[])
+        self.open_at = open_at
+
+    def is_open(self, at: datetime) -> bool:
+        local = at.astimezone(self.tz)
+        weekday = local.weekday()
+        if weekday == 5:
+            return False
+        if weekday == 6:
+            return local.time() >= self.open_at
+        if weekday == 4:
+            return local.time() < self.open_at
+        return True
+
+
+EXCHANGES = {
+    "US": Exchange("US", "America/New_York", [(time(9, 30), time(16, 0))], _nyse_holidays),
+    "LSE": Exchange("LSE", "Europe/London", [(time(8, 0), time(16, 30))], _lse_holidays),
+    "TSX": Exchange("TSX", "America/Toronto", [(time(9, 30), time(16, 0))], _tsx_holidays),
+    "XETRA": Exchange("XETRA", "Europe/Berlin", [(time(9, 0), time(17, 30))], _xetra_holidays),
+    "EURONEXT": Exchange("EURONEXT", "Europe/Paris", [(time(9, 0), time(17, 30))], _euronext_holidays),
+    "ASX": Exchange("ASX", "Australia/Sydney", [(time(10, 0), time(16, 0))], _asx_holidays),
+    "HKEX": Exchange(
+        "HKEX",
+        "Asia/Hong_Kong",
+        [(time(9, 30), time(12, 0)), (time(13, 0), time(16, 0))],
+        _fixed_holidays((1, 1), (5, 1), (7, 1), (10, 1), (12, 25), (12, 26)),
+    ),
+    "TSE": Exchange(
+        "TSE",
+        "Asia/Tokyo",
+        [(time(9, 0), time(11, 30)), (time(12, 30), time(15, 30))],
+        _fixed_holidays((1, 1), (1, 2), (1, 3), (2, 11), (2, 23), (4, 29), (5, 3), (5, 4), (5, 5), (11, 3), (11, 23), (12, 31)),
+    ),
+    "FX": _RollingWeekExchange("FX", "America/New_York", time(17, 0)),
+    "CRYPTO": Exchange("CRYPTO", "UTC", [], always_open=True),
+}
+
+DEFAULT_EXCHANGE = "US"
+
+# Yahoo ticker suffix -> exchange
+SUFFIX_EXCHANGES = {
+    "L": "LSE",
+    "IL": "LSE",
+    "TO": "TSX",
+    "V": "TSX",
+    "NE": "TSX",
+    "DE": "XETRA",
+    "F": "XETRA",
+    "PA": "EURONEXT",
+    "AS": "EURONEXT",
+    "BR": "EURONEXT",
+    "LS": "EURONEXT",
+    "AX": "ASX",
+    "HK": "HKEX",
+    "T": "TSE",
+}
+
+# Yahoo exchange codes (as stored on Order.exchange) -> exchange
+YAHOO_EXCHANGE_CODES = {
+    "NMS": "US", "NGM": "US", "NCM": "US", "NYQ": "US", "ASE": "US", "PCX": "US", "BTS": "US", "PNK": "US",
+    "LSE": "LSE", "IOB": "LSE",
+    "TOR": "TSX", "VAN": "TSX", "NEO": "TSX",
+    "GER": "XETRA", "FRA": "XETRA",
+    "PAR": "EURONEXT", "AMS": "EURONEXT", "BRU": "EURONEXT", "LIS": "EURONEXT",
+    "ASX": "ASX",
+    "HKG": "HKEX",
+    "JPX": "TSE",
+    "CCY": "FX", "CMX": "FX", "NYM": "FX", "CME": "FX", "CBT": "FX",
+    "CCC": "CRYPTO",
+}
+
+_CRYPTO_QUOTE_CURRENCIES = {"USD", "USDT", "USDC", "EUR", "GBP", "BTC", "ETH"}
+
+
+@lru_cache(maxsize=4096)
+def exchange_for_symbol(symbol: str, exchange_code: Optional[str] = None) -> Exchange:
+    """Resolve the exchange a symbol trades on, from a Yahoo exchange code or the ticker's shape."""
+    if exchange_code and exchange_code.upper() in YAHOO_EXCHANGE_CODES:
+        return EXCHANGES[YAHOO_EXCHANGE_CODES[exchange_code.upper()]]
+    symbol = symbol.strip().upper()
+    if symbol.endswith("=X") or symbol.endswith("=F"):
+        return EXCHANGES["FX"]
+    base, _, currency = symbol.rpartition("-")
+    if base and currency in _CRYPTO_QUOTE_CURRENCIES:
+        return EXCHANGES["CRYPTO"]
+    base, dot, suffix = symbol.rpartition(".")
+    if base and dot and suffix in SUFFIX_EXCHANGES:
+        return EXCHANGES[SUFFIX_EXCHANGES[suffix]]
+    return EXCHANGES[DEFAULT_EXCHANGE]
+
+
+def is_open(symbol: str, at: Optional[datetime] = None) -> bool:
+    """Whether the symbol's regular session is open at ``at`` (default: now)."""
+    return exchange_for_symbol(symbol).is_open(at or datetime.now(timezone.utc))
+
+
+def open_symbols(symbols: Iterable[str], at: Optional[datetime] = None) -> dict[str, bool]:
+    """Vectorized is_open: each distinct exchange is evaluated once for all of its symbols."""
+    at = at or datetime.now(timezone.utc)
+    by_exchange: dict[str, bool] = {}
+    result = {}
+    for symbol in symbols:
+        exchange = exchange_for_symbol(symbol)
+        if exchange.code not in by_exchange:
+            by_exchange[exchange.code] = exchange.is_open(at)
+        result[symbol] = by_exchange[exchange.code]
+    return result
@@ -1,10 +1,27 @@
 import math
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime, timedelta, timezone
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
-import requests
-import yfinance as yf
+import pandas as pd
+
+from . import chart_format, market_calendar, upstream
+from .bar_store import bar_store, refresh_seconds
+from .chart_downsample import chart_cache, downsample
+from .quote_cache import quote_cache
+
+# Upper bound on concurrent upstream quote lookups issued by fetch_quotes
+QUOTE_FANOUT_WORKERS = 8
+_quote_pool = ThreadPoolExecutor(max_workers=QUOTE_FANOUT_WORKERS, thread_name_prefix="quotes")
+
+# Independent upstream calls behind one stock page, issued side by side
+SNAPSHOT_PART_WORKERS = 16
+# Seconds each part may take, counted from when the snapshot starts
+SNAPSHOT_PART_TIMEOUTS = {"info": 8.0, "history": 5.0, "calendar": 4.0, "fast_info": 4.0}
+_snapshot_pool = ThreadPoolExecutor(max_workers=SNAPSHOT_PART_WORKERS, thread_name_prefix="snapshot")
 
 def _mock_price(symbol: str) -> float:
     base = 100 + (sum(ord(char) for char in symbol.upper()) % 500) / 10
@@ -72,7 +89,13 @@ def _get_info_value(info: dict, *keys: str, default: Any = None) -> Any:
 
 def fetch_company_name(symbol: str) -> str:
     normalized_symbol = _normalize_symbol(symbol)
-    info = yf.Ticker(normalized_symbol).info or {}
+    return quote_cache.get(
+        "company_name", normalized_symbol, lambda: _load_company_name(normalized_symbol), fallback=True
+    )
+
+
+def _load_company_name(normalized_symbol: str) -> str:
+    info = upstream.ticker(normalized_symbol, upstream.REFERENCE_MAX_AGE).info or {}
     return info.get("longName") or info.get("shortName") or normalized_symbol
 
 
@@ -82,14 +105,13 @@ def search_stocks(query: str, max_results: int = 10) -> list[dict]:
     if not query:
         return []
     try:
-        if hasattr(yf, "Search"):
-            search = yf.Search(query, max_results=max_results, enable_fuzzy_query=True)
+        if upstream.HAS_SEARCH:
+            search = upstream.search(query, max_results)
             raw_quotes = search.quotes or []
         else:
-            resp = requests.get(
+            resp = upstream.get(
                 "https://query1.finance.yahoo.com/v1/finance/search",
                 params={"q": query, "quotesCount": max_results, "enableFuzzyQuery": True},
-                timeout=10,
             )
             data = resp.json() if resp.ok else {}
             raw_quotes = data.get("quotes", [])
@@ -103,26 +125,40 @@ def search_stocks(query: str, max_results: int = 10) -> list[dict]:
             for q in raw_quotes
             if q.get("symbol")
         ]
+    except upstream.UpstreamUnavailable:
+        raise
     except Exception:
         return []
 
-def fetch_quote(symbol: str) -> dict:
+def fetch_quote(symbol: str, allow_stale: bool = False) -> dict:
+    """Quote for one symbol, served from the shared quote cache (see quote_cache.FIELD_TTLS).
+
+    ``allow_stale`` serves quotes past their TTL while they refresh, and the last good quote,
+    marked stale=True, while upstream is failing. Display paths only: orders must never fill
+    at such a price, so without it the quote is at most the "quote" TTL old.
+    """
+    symbol = _normalize_symbol(symbol)
+    return dict(quote_cache.get(
+        "quote", symbol, lambda: _load_quote(symbol), fallback=allow_stale, serve_stale=allow_stale
+    ))
+
+
+def _load_quote(symbol: str) -> dict:
     if os.environ.get("MARKET_DATA_MOCK", "false").lower() == "true":
-        symbol = _normalize_symbol(symbol)
         price = _mock_price(symbol)
         previous_close = round(price - 1.25, 2)
         change = round(price - previous_close, 2)
         change_percent = round(change / previous_close * 100, 2)
         return {
             "symbol": symbol.upper(),
+            "name": symbol.upper(),
             "price": price,
             "previous_close": previous_close,
             "change": change,
             "change_percent": change_percent,
         }
 
-    symbol = _normalize_symbol(symbol)
-    ticker = yf.Ticker(symbol)
+    ticker = upstream.ticker(symbol)
     info = ticker.info or {}
     fast_info = getattr(ticker, "fast_info", {}) or {}
     price_value = info.get("regularMarketPrice") or fast_info.get("last_price")
@@ -154,10 +190,35 @@ def fetch_quote(symbol: str) -> dict:
         "change_percent": change_percent,
         "exchange": info.get("exchange") or fast_info.get("exchange"),
         "currency": info.get("currency") or fast_info.get("currency"),
+        "name": info.get("longName") or info.get("shortName") or symbol,
+        "fifty_two_week_low": _safe_float(info.get("fiftyTwoWeekLow")),
+        "fifty_two_week_high": _safe_float(info.get("fiftyTwoWeekHigh")),
     }
 
 
-def fetch_chart(symbol: str, range_value: str) -> dict:
+def fetch_quotes(symbols: list[str], allow_stale: bool = False) -> dict[str, dict]:
+    """Quotes for many symbols keyed by normalized symbol.
+
+    Cached symbols are answered immediately; the rest are fetched with one bounded
+    parallel fan-out. Symbols whose lookup fails are left out of the result.
+    ``allow_stale`` is as for fetch_quote.
+    """
+    unique_symbols = list(dict.fromkeys(_normalize_symbol(symbol) for symbol in symbols if symbol))
+    futures = {symbol: _quote_pool.submit(fetch_quote, symbol, allow_stale) for symbol in unique_symbols}
+    quotes = {}
+    for symbol, future in futures.items():
+        try:
+            quotes[symbol] = future.result()
+        except Exception as e:
+            print(f"Error fetching quote for {symbol}: {e}")
+    return quotes
+
+
+def fetch_chart(symbol: str, range_value: str, columnar: bool = False, max_points: Optional[int] = None) -> dict:
+    """Close prices for a range. ``columnar`` returns points as {date: [...], close: [...]}.
+
+    ``max_points`` downsamples the series with LTTB; those results are cached.
+    """
     if os.environ.get("MARKET_DATA_MOCK", "false").lower() == "true":
         points = []
         today = datetime.now(timezone.utc).date()
@@ -167,6 +228,8 @@ def fetch_chart(symbol: str, range_value: str) -> dict:
             points.append(
                 {"date": date_value.isoformat(), "close": _mock_price(symbol) + index * 0.2}
             )
+        if columnar:
+            points = chart_format.columns_from_rows(points, chart_format.POINT_FIELDS)
         return {"symbol": symbol.upper(), "points": points}
 
     symbol = _normalize_symbol(symbol)
@@ -192,12 +255,18 @@ def fetch_chart(symbol: str, range_value: str) -> dict:
     else:
         period = "1mo"
         interval = "1d"
-    history = yf.Ticker(symbol).history(period=period, interval=interval)
-    points = []
-    if history is not None and not history.empty:
-        for timestamp, row in history.iterrows():
-            date_value = timestamp.date().isoformat()
-            points.append({"date": date_value, "close": float(row["Close"])})
+
+    def load_points():
+        history = bar_store.history(symbol, period=period, interval=interval)
+        if max_points:
+            history = downsample(history, max_points)
+        return chart_format.point_columns(history) if columnar else chart_format.point_rows(history)
+
+    if max_points:
+        key = ("points", symbol, period, interval, max_points, columnar)
+        points = chart_cache.get(key, refresh_seconds(interval), load_points)
+    else:
+        points = load_points()
     return {"symbol": symbol.upper(), "points": points}
 
 
@@ -211,7 +280,7 @@ def fetch_basic_financials(symbol: str, metric: str) -> dict:
         }
 
     symbol = _normalize_symbol(symbol)
-    info = yf.Ticker(symbol).info or {}
+    info = upstream.ticker(symbol, upstream.REFERENCE_MAX_AGE).info or {}
     metric_payload = {
         "10DayAverageTradingVolume": info.get("averageDailyVolume10Day")
         or info.get("averageVolume10days"),
@@ -279,18 +348,19 @@ def fetch_watchlist(limit: int = 20, symbols: Optional[list[str]] = None) -> lis
         symbols = DEFAULT_WATCHLIST_SYMBOLS[:limit]
     else:
         symbols = [_normalize_symbol(symbol) for symbol in symbols if symbol]
+    quotes = fetch_quotes(symbols, allow_stale=True)
     items = []
     for symbol in symbols:
         normalized_symbol = _normalize_symbol(symbol)
-        info = yf.Ticker(normalized_symbol).info or {}
-        price = info.get("regularMarketPrice") or 0
-        change_value = info.get("regularMarketChange") or 0
-        range_low = info.get("fiftyTwoWeekLow") or price * 0.8
-        range_high = info.get("fiftyTwoWeekHigh") or price * 1.2
+        quote = quotes.get(normalized_symbol) or {}
+        price = quote.get("price") or 0
+        change_value = quote.get("change") or 0
+        range_low = quote.get("fifty_two_week_low") or price * 0.8
+        range_high = quote.get("fifty_two_week_high") or price * 1.2
         items.append(
             {
                 "ticker": normalized_symbol,
-                "company_name": info.get("longName") or info.get("shortName") or normalized_symbol,
+                "company_name": quote.get("name") or normalized_symbol,
                 "value": round(float(price), 2),
                 "change_1d": round(float(change_value), 2),
                 "52w_range": [round(float(range_low), 2), round(float(range_high), 2)],
@@ -301,16 +371,42 @@ def fetch_watchlist(limit: int = 20, symbols: Optional[list[str]] = None) -> lis
 
 def fetch_company_profile(symbol: str) -> dict:
     symbol = _normalize_symbol(symbol)
-    info = yf.Ticker(symbol).info or {}
+    if os.environ.get("MARKET_DATA_MOCK", "false").lower() == "true":
+        return {
+            "symbol": symbol,
+            "name": symbol,
+            "exchange": "NMS",
+            "currency": "USD",
+            "sector": None,
+            "industry": None,
+            "website": None,
+        }
+
+    info = upstream.ticker(symbol, upstream.REFERENCE_MAX_AGE).info or {}
     return {
         "symbol": symbol,
         "name": info.get("longName") or info.get("shortName"),
         "exchange": info.get("exchange") or info.get("fullExchangeName"),
+        "currency": info.get("currency"),
+        "sector": info.get("sector"),
         "industry": info.get("industry"),
         "website": info.get("website"),
     }
 
 
+def fetch_company_profiles(symbols: list[str]) -> dict[str, dict]:
+    """Profiles for many symbols with the same bounded fan-out as fetch_quotes. Failures are left out."""
+    unique_symbols = list(dict.fromkeys(_normalize_symbol(symbol) for symbol in symbols if symbol))
+    futures = {symbol: _quote_pool.submit(fetch_company_profile, symbol) for symbol in unique_symbols}
+    profiles = {}
+    for symbol, future in futures.items():
+        try:
+            profiles[symbol] = future.result()
+        except Exception as e:
+            print(f"Error fetching profile for {symbol}: {e}")
+    return profiles
+
+
 def _extract_ceo(info: dict) -> Optional[str]:
     """Extract CEO name from companyOfficers if available."""
     officers = info.get("companyOfficers")
@@ -325,157 +421,257 @@ def _extract_ceo(info: dict) -> Optional[str]:
     return None
 
 
-def fetch_company_snapshot(symbol: str) -> dict:
-    normalized = _normalize_symbol(symbol)
-    ticker = yf.Ticker(normalized)
-    info = ticker.info or {}
+def _range_label(low: Optional[float], high: Optional[float]) -> Optional[str]:
+    if low is None and high is None:
+        return None
+    return f"{f'{low:.2f}' if low is not None else '—'} - {f'{high:.2f}' if high is not None else '—'}"
+
+
+def _fast_info_values(ticker) -> dict:
     fast_info = getattr(ticker, "fast_info", None)
-    if callable(fast_info):
-        fast_info = {}
-    elif fast_info is None:
-        fast_info = {}
-
-    market_state = info.get("marketState") or (fast_info.get("market_state") if isinstance(fast_info, dict) else None)
-    market_status = "Market Open" if str(market_state or "").upper() == "REGULAR" else "Market Closed"
-
-    current_price = _safe_float(_get_info_value(info, "regularMarketPrice", "currentPrice") or (fast_info.get("last_price") if isinstance(fast_info, dict) else None))
-    change_absolute_raw = _safe_float(info.get("regularMarketChange"))
-    change_percentage_raw = _safe_float(info.get("regularMarketChangePercent"))
-    change_absolute = round(change_absolute_raw, 2) if change_absolute_raw is not None else None
-    change_percentage = round(change_percentage_raw, 2) if change_percentage_raw is not None else None
-
-    day_low = _safe_float(_get_info_value(info, "regularMarketDayLow", "dayLow"))
-    day_high = _safe_float(_get_info_value(info, "regularMarketDayHigh", "dayHigh"))
-    week_low = _safe_float(_get_info_value(info, "fiftyTwoWeekLow"))
-    week_high = _safe_float(_get_info_value(info, "fiftyTwoWeekHigh"))
-
-    prev_close = _safe_float(_get_info_value(info, "regularMarketPreviousClose", "previousClose"))
-
-    market_cap = _get_info_value(info, "marketCap")
-    volume_avg = _get_info_value(info, "averageVolume", "averageDailyVolume10Day")
-    pe_ratio = _safe_float(_get_info_value(info, "trailingPE", "forwardPE"))
-    revenue_ttm = _get_info_value(info, "totalRevenue")
-    eps = _safe_float(_get_info_value(info, "trailingEps", "forwardEps"))
-    dividend_yield_raw = _safe_float(_get_info_value(info, "dividendYield", "trailingAnnualDividendYield"))
-    dividend_yield_pct = None
-    if dividend_yield_raw is not None:
-        dividend_yield_pct = dividend_yield_raw * 100 if dividend_yield_raw < 0.1 else dividend_yield_raw
-    beta = _safe_float(_get_info_value(info, "beta"))
-    fifty_two_week_change = _safe_float(_get_info_value(info, "52WeekChange"))
+    if fast_info is None or callable(fast_info):
+        return {}
+    return {key: fast_info.get(key) for key in ("last_price", "market_state")}
+
+
+def _quote_section(symbol: str, info: dict, fast_info: Callable[[], Optional[dict]]) -> dict:
+    """``fast_info`` is only called when info lacks the price or market state."""
+    market_state = info.get("marketState")
+    current_price = _get_info_value(info, "regularMarketPrice", "currentPrice")
+    if market_state is None or current_price is None:
+        fallback = fast_info() or {}
+        market_state = market_state or fallback.get("market_state")
+        current_price = current_price if current_price is not None else fallback.get("last_price")
+    change_absolute = _safe_float(info.get("regularMarketChange"))
+    change_percentage = _safe_float(info.get("regularMarketChangePercent"))
+    return {
+        "company_name": info.get("longName") or info.get("shortName") or symbol,
+        "market_status": "Market Open" if str(market_state or "").upper() == "REGULAR" else "Market Closed",
+        "quote": {
+            "current_price": _safe_float(current_price),
+            "currency": info.get("currency") or "USD",
+            "change_absolute": round(change_absolute, 2) if change_absolute is not None else None,
+            "change_percentage": round(change_percentage, 2) if change_percentage is not None else None,
+            "trading_mode": str(market_state).title() if market_state else None,
+        },
+    }
+
 
-    history = ticker.history(period="5d")
+def _performance_metrics_section(info: dict, history) -> dict:
     past_week_growth = None
-    if history is not None and not history.empty:
+    if isinstance(history, pd.DataFrame) and not history.empty:
         first_close = history["Close"].iloc[0]
         last_close = history["Close"].iloc[-1]
-        if first_close and not (hasattr(first_close, "__float__") and math.isnan(float(first_close))):
+        if first_close and not math.isnan(float(first_close)):
             past_week_growth = _format_percent(((float(last_close) - float(first_close)) / float(first_close)) * 100)
+    return {
+        "past_week_growth": past_week_growth,
+        "market_cap": _format_compact_number(_get_info_value(info, "marketCap")),
+        "volume_3m_avg": _format_compact_number(_get_info_value(info, "averageVolume", "averageDailyVolume10Day")),
+        "pe_ratio": _safe_float(_get_info_value(info, "trailingPE", "forwardPE")),
+        "revenue_ttm": _format_compact_number(_get_info_value(info, "totalRevenue")),
+        "day_range": {
+            "low": _safe_float(_get_info_value(info, "regularMarketDayLow", "dayLow")),
+            "high": _safe_float(_get_info_value(info, "regularMarketDayHigh", "dayHigh")),
+        },
+        "52w_range": {
+            "low": _safe_float(_get_info_value(info, "fiftyTwoWeekLow")),
+            "high": _safe_float(_get_info_value(info, "fiftyTwoWeekHigh")),
+        },
+    }
+
 
-    day_range_str = None
-    if day_low is not None and day_high is not None:
-        day_range_str = f"{day_low:.2f} - {day_high:.2f}"
-    elif day_low is not None:
-        day_range_str = f"{day_low:.2f} - —"
-    elif day_high is not None:
-        day_range_str = f"— - {day_high:.2f}"
-
-    year_range_str = None
-    if week_low is not None and week_high is not None:
-        year_range_str = f"{week_low:.2f} - {week_high:.2f}"
-    elif week_low is not None:
-        year_range_str = f"{week_low:.2f} - —"
-    elif week_high is not None:
-        year_range_str = f"— - {week_high:.2f}"
-
-    one_year_return = _format_percent(fifty_two_week_change * 100) if fifty_two_week_change is not None else None
-
-    sector = info.get("sector") or None
-    industry = info.get("industry") or None
+def _profile_section(info: dict) -> dict:
     employees = info.get("fullTimeEmployees")
     if employees is not None:
         try:
-            employees = int(employees) if not (hasattr(employees, "__float__") and math.isnan(float(employees))) else None
+            employees = int(employees) if not math.isnan(float(employees)) else None
         except (TypeError, ValueError):
             employees = None
-    ceo = _extract_ceo(info)
+    return {
+        "sector": info.get("sector") or None,
+        "industry": info.get("industry") or None,
+        "ceo": _extract_ceo(info),
+        "employees": employees,
+    }
+
 
-    upcoming_event = {
-        "event_type": None,
-        "fiscal_period": None,
-        "date": None,
-        "timing": None,
+def _financials_section(info: dict) -> dict:
+    dividend_yield = _safe_float(_get_info_value(info, "dividendYield", "trailingAnnualDividendYield"))
+    if dividend_yield is not None and dividend_yield < 0.1:
+        dividend_yield *= 100
+    fifty_two_week_change = _safe_float(_get_info_value(info, "52WeekChange"))
+    return {
+        "prev_close": _safe_float(_get_info_value(info, "regularMarketPreviousClose", "previousClose")),
+        "market_cap": _format_compact_number(_get_info_value(info, "marketCap")),
+        "day_range": _range_label(
+            _safe_float(_get_info_value(info, "regularMarketDayLow", "dayLow")),
+            _safe_float(_get_info_value(info, "regularMarketDayHigh", "dayHigh")),
+        ),
+        "year_range": _range_label(
+            _safe_float(_get_info_value(info, "fiftyTwoWeekLow")),
+            _safe_float(_get_info_value(info, "fiftyTwoWeekHigh")),
+        ),
+        "volume_3m": _format_compact_number(_get_info_value(info, "averageVolume", "averageDailyVolume10Day")),
+        "revenue": _format_compact_number(_get_info_value(info, "totalRevenue")),
+        "eps": _safe_float(_get_info_value(info, "trailingEps", "forwardEps")),
+        "dividend_yield": dividend_yield,
+        "beta": _safe_float(_get_info_value(info, "beta")),
+        "one_year_return": _format_percent(fifty_two_week_change * 100) if fifty_two_week_change is not None else None,
     }
-    calendar = getattr(ticker, "calendar", None)
-    if calendar is not None:
-        try:
-            if hasattr(calendar, "empty") and not calendar.empty:
-                earnings = calendar.get("Earnings Date")
-                if earnings is not None and len(earnings):
-                    upcoming_event["event_type"] = "Earnings Report"
-                    upcoming_event["date"] = earnings[0].strftime("%Y-%m-%d")
-            elif isinstance(calendar, dict):
-                earnings = calendar.get("Earnings Date")
-                if earnings:
-                    upcoming_event["event_type"] = "Earnings Report"
-                    if hasattr(earnings, "strftime"):
-                        upcoming_event["date"] = earnings.strftime("%Y-%m-%d")
-        except Exception:
-            pass
 
+
+def _upcoming_events_section(calendar) -> dict:
+    event = {"event_type": None, "fiscal_period": None, "date": None, "timing": None}
+    try:
+        if hasattr(calendar, "empty") and not calendar.empty:
+            earnings = calendar.get("Earnings Date")
+            if earnings is not None and len(earnings):
+                event["event_type"] = "Earnings Report"
+                event["date"] = earnings[0].strftime("%Y-%m-%d")
+        elif isinstance(calendar, dict):
+            earnings = calendar.get("Earnings Date")
+            if isinstance(earnings, list):
+                earnings = earnings[0] if earnings else None
+            if earnings:
+                event["event_type"] = "Earnings Report"
+                if hasattr(earnings, "strftime"):
+                    event["date"] = earnings.strftime("%Y-%m-%d")
+    except Exception:
+        pass
+    return event
+
+
+def _analyst_forecast_section(info: dict) -> dict:
     return {
-        "ticker": normalized,
-        "company_name": info.get("longName") or info.get("shortName") or normalized,
-        "market_status": market_status,
-        "quote": {
-            "current_price": current_price,
-            "currency": info.get("currency") or "USD",
-            "change_absolute": change_absolute,
-            "change_percentage": change_percentage,
-            "trading_mode": str(market_state).title() if market_state else None,
-        },
-        "performance_metrics": {
-            "past_week_growth": past_week_growth,
-            "market_cap": _format_compact_number(market_cap),
-            "volume_3m_avg": _format_compact_number(volume_avg),
-            "pe_ratio": pe_ratio,
-            "revenue_ttm": _format_compact_number(revenue_ttm),
-            "day_range": {"low": day_low, "high": day_high},
-            "52w_range": {"low": week_low, "high": week_high},
-        },
-        "profile": {
-            "sector": sector,
-            "industry": industry,
-            "ceo": ceo,
-            "employees": employees,
-        },
-        "financials": {
-            "prev_close": prev_close,
-            "market_cap": _format_compact_number(market_cap),
-            "day_range": day_range_str,
-            "year_range": year_range_str,
-            "volume_3m": _format_compact_number(volume_avg),
-            "revenue": _format_compact_number(revenue_ttm),
-            "eps": eps,
-            "dividend_yield": dividend_yield_pct,
-            "beta": beta,
-            "one_year_return": one_year_return,
-        },
-        "upcoming_events": upcoming_event,
-        "analyst_forecast": {
-            "consensus": info.get("recommendationKey"),
-            "price_target": _safe_float(info.get("targetMeanPrice")),
-            "analyst_count": info.get("numberOfAnalystOpinions"),
-        },
-        "metadata": {
-            "source_screenshot_date": datetime.now(timezone.utc).date().isoformat(),
-            "primary_exchange": info.get("exchange") or info.get("fullExchangeName"),
-        },
+        "consensus": info.get("recommendationKey"),
+        "price_target": _safe_float(info.get("targetMeanPrice")),
+        "analyst_count": info.get("numberOfAnalystOpinions"),
     }
 
-def is_market_open(symbol: str) -> bool:
+
+def _metadata_section(info: dict) -> dict:
+    return {
+        "source_screenshot_date": datetime.now(timezone.utc).date().isoformat(),
+        "primary_exchange": info.get("exchange") or info.get("fullExchangeName"),
+    }
+
+
+# section -> (upstream parts it needs, builder returning its top-level keys)
+SNAPSHOT_SECTIONS: dict[str, tuple[tuple[str, ...], Callable[[str, dict], dict]]] = {
+    # fast_info is fetched on demand, only when info comes back without a price
+    "quote": (("info",), lambda symbol, parts: _quote_section(symbol, parts["info"], lambda: parts["fast_info"])),
+    "performance_metrics": (
+        ("info", "history"),
+        lambda symbol, parts: {"performance_metrics": _performance_metrics_section(parts["info"], parts["history"])},
+    ),
+    "profile": (("info",), lambda symbol, parts: {"profile": _profile_section(parts["info"])}),
+    "financials": (("info",), lambda symbol, parts: {"financials": _financials_section(parts["info"])}),
+    "upcoming_events": (
+        ("calendar",),
+        lambda symbol, parts: {"upcoming_events": _upcoming_events_section(parts["calendar"])},
+    ),
+    "analyst_forecast": (
+        ("info",),
+        lambda symbol, parts: {"analyst_forecast": _analyst_forecast_section(parts["info"])},
+    ),
+    "metadata": (("info",), lambda symbol, parts: {"metadata": _metadata_section(parts["info"])}),
+}
+
+
+def _gather(parts: dict[str, Callable[[], Any]], timeouts: dict[str, float]) -> dict[str, Any]:
+    """Run independent calls on the snapshot pool. A failed part yields its exception, an overrun one None."""
+    started = time.monotonic()
+    futures = {name: _snapshot_pool.submit(call) for name, call in parts.items()}
+    results = {}
+    for name, future in futures.items():
+        remaining = max(0.0, timeouts[name] - (time.monotonic() - started))
+        try:
+            results[name] = future.result(timeout=remaining)
+        except FutureTimeout:
+            print(f"Snapshot part {name} timed out")
+            results[name] = None
+        except Exception as e:
+            print(f"Snapshot part {name} failed: {e}")
+            results[name] = e
+    return results
+
+
+class _SnapshotParts:
+    """Upstream data behind a snapshot, fetched on first use.
+
+    The first access fetches every part the pending sections need in one
+    concurrent round; later accesses (e.g. a stale section refreshing in the
+    background) fetch what is still missing.
+    """
+
+    def __init__(self, symbol: str, wanted: set[str], max_age: float):
+        self.symbol = symbol
+        self.wanted = wanted
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._values: dict[str, Any] = {}
+
+    def __getitem__(self, name: str) -> Any:
+        with self._lock:
+            if name not in self._values:
+                self._fetch(self.wanted - set(self._values) | {name})
+        value = self._values[name]
+        # Without info there is nothing to show; the cache falls back to the last good section
+        if name == "info":
+            if isinstance(value, Exception):
+                raise value
+            if value is None:
+                raise TimeoutError(f"Timed out loading {self.symbol}")
+        elif isinstance(value, Exception):
+            return None
+        return value
+
+    def _fetch(self, names: set[str]) -> None:
+        ticker = upstream.ticker(self.symbol, self.max_age)
+        calls = {
+            "info": lambda: ticker.info or {},
+            "history": lambda: ticker.history(period="5d"),
+            "calendar": lambda: ticker.calendar,
+            "fast_info": lambda: _fast_info_values(ticker),
+        }
+        self._values.update(_gather({name: calls[name] for name in names}, SNAPSHOT_PART_TIMEOUTS))
+
+
+def fetch_company_snapshot(symbol: str, sections: Optional[list[str]] = None) -> dict:
+    """Stock page payload, built only for the requested sections (default: all).
+
+    Each section is cached on its own (quote_cache field ``snapshot_<section>``), so
+    refreshing the quote does not re-fetch fundamentals or the earnings calendar.
+    While upstream is failing, the last good sections are served with stale=True.
+    """
     normalized = _normalize_symbol(symbol)
-    ticker = yf.Ticker(normalized)
-    info = ticker.info or {}
-    fast_info = getattr(ticker, "fast_info", {}) or {}
-    market_state = info.get("marketState") or fast_info.get("market_state")
-    return str(market_state).upper() == "REGULAR" 
\ No newline at end of file
+    sections = list(SNAPSHOT_SECTIONS) if sections is None else sections
+    unknown = [section for section in sections if section not in SNAPSHOT_SECTIONS]
+    if unknown:
+        raise ValueError(f"Unknown sections: {', '.join(unknown)}")
+
+    due = [section for section in sections if quote_cache.needs_load(f"snapshot_{section}", normalized)]
+    wanted = {part for section in due for part in SNAPSHOT_SECTIONS[section][0]}
+    # A Ticker's cached info may be as old as the shortest-lived section it feeds
+    max_age = min((quote_cache.ttl(f"snapshot_{section}") for section in due), default=upstream.TICKER_MAX_AGE)
+    parts = _SnapshotParts(normalized, wanted, max_age)
+
+    snapshot = {"ticker": normalized}
+    for section in sections:
+        build = SNAPSHOT_SECTIONS[section][1]
+        snapshot.update(quote_cache.get(
+            f"snapshot_{section}", normalized, lambda build=build: build(normalized, parts), fallback=True
+        ))
+    return snapshot
+
+
+def is_market_open(symbol: str) -> bool:
+    """Whether the symbol's regular session is open now, answered offline from the exchange calendar."""
+    return market_calendar.is_open(_normalize_symbol(symbol))
+
+
+def markets_open(symbols: list[str]) -> dict[str, bool]:
+    """Vectorized is_market_open keyed by the symbols as given."""
+    open_by_symbol = market_calendar.open_symbols(_normalize_symbol(symbol) for symbol in symbols)
+    return {symbol: open_by_symbol[_normalize_symbol(symbol)] for symbol in symbols}
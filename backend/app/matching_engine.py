@@ -0,0 +1,174 @@
+"""In-process matching of resting LIMIT and STOP orders against live ticks.
+
+Each symbol keeps four price-sorted books:
+
+- BUY LIMIT fills when price <= limit
+- SELL LIMIT fills when price >= limit
+- BUY STOP fills when price >= stop
+- SELL STOP fills when price <= stop
+
+so a tick from ws_manager only visits the orders it crosses. Matched orders
+are filled at the tick price through order_execution.fill_order, the same path
+the pending-order processor uses. The books are rebuilt from the database on
+startup.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Optional
+
+from . import market_data
+from .extensions import db
+from .models import Account, Order
+from .order_execution import fill_order, run_with_retry
+from .price_levels import PriceLevels
+from .trigger_engine import trigger_book
+from .websocket_manager import ws_manager
+
+ORDER_TYPES = {"MARKET", "LIMIT", "STOP"}
+
+
+class _SymbolBook:
+    __slots__ = ("buy_limits", "sell_limits", "buy_stops", "sell_stops")
+
+    def __init__(self):
+        self.buy_limits = PriceLevels()
+        self.sell_limits = PriceLevels()
+        self.buy_stops = PriceLevels()
+        self.sell_stops = PriceLevels()
+
+    def levels_for(self, side: str, order_type: str) -> PriceLevels:
+        if order_type == "LIMIT":
+            return self.buy_limits if side == "BUY" else self.sell_limits
+        return self.buy_stops if side == "BUY" else self.sell_stops
+
+    def match(self, price: float) -> list[int]:
+        return (
+            self.buy_limits.pop_at_or_above(price)
+            + self.sell_limits.pop_at_or_below(price)
+            + self.buy_stops.pop_at_or_below(price)
+            + self.sell_stops.pop_at_or_above(price)
+        )
+
+
+def trigger_price(order: Order) -> Optional[Decimal]:
+    """The price that makes a LIMIT or STOP order executable."""
+    return order.limit_price if order.order_type == "LIMIT" else order.stop_price
+
+
+def is_marketable(side: str, order_type: str, trigger: float, price: float) -> bool:
+    """Whether a LIMIT/STOP order would execute immediately at ``price``."""
+    if order_type == "LIMIT":
+        return price <= trigger if side == "BUY" else price >= trigger
+    return price >= trigger if side == "BUY" else price <= trigger
+
+
+class MatchingEngine:
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._books: dict[str, _SymbolBook] = {}
+        self._orders: dict[int, tuple[str, str, str]] = {}  # order_id -> (symbol, side, order_type)
+        # Fills run off the WebSocket thread, one at a time
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="matching")
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self.clear()
+        ws_manager.add_listener(self.on_tick)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._books.clear()
+            self._orders.clear()
+
+    def __len__(self):
+        return len(self._orders)
+
+    def load(self) -> int:
+        """Rebuild the books from resting PENDING orders. Needs an app context."""
+        orders = Order.query.filter(
+            Order.status == "PENDING", Order.order_type.in_(["LIMIT", "STOP"])
+        ).all()
+        self.clear()
+        for order in orders:
+            self.add(order.id, order.symbol, order.side, order.order_type, trigger_price(order))
+        return len(orders)
+
+    def symbols(self) -> set[str]:
+        with self._lock:
+            return {symbol for symbol, _, _ in self._orders.values()}
+
+    def add(self, order_id: int, symbol: str, side: str, order_type: str, price) -> None:
+        with self._lock:
+            self._remove_locked(order_id)
+            book = self._books.setdefault(symbol, _SymbolBook())
+            book.levels_for(side, order_type).add(order_id, float(price))
+            self._orders[order_id] = (symbol, side, order_type)
+
+    def remove(self, order_id: int) -> None:
+        with self._lock:
+            self._remove_locked(order_id)
+
+    def _remove_locked(self, order_id: int) -> None:
+        entry = self._orders.pop(order_id, None)
+        if entry is None:
+            return
+        symbol, side, order_type = entry
+        self._books[symbol].levels_for(side, order_type).remove(order_id)
+
+    def match(self, symbol: str, price: float) -> list[int]:
+        """Pop and return the ids of resting orders this price makes executable."""
+        with self._lock:
+            book = self._books.get(symbol)
+            if book is None:
+                return []
+            matched = book.match(price)
+            for order_id in matched:
+                del self._orders[order_id]
+            return matched
+
+    def on_tick(self, symbol: str, price: float) -> None:
+        """ws_manager listener: O(log n) match here, fills on the executor thread."""
+        # Out-of-session ticks leave the book untouched; the calendar check is offline
+        if not market_data.is_market_open(symbol):
+            return
+        matched = self.match(symbol, price)
+        if matched and self.app is not None:
+            self._executor.submit(self._execute_in_app, matched, price)
+
+    def _execute_in_app(self, order_ids: list[int], price: float) -> None:
+        with self.app.app_context():
+            try:
+                self.execute(order_ids, price)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error executing matched orders {order_ids}: {e}")
+
+    def execute(self, order_ids: list[int], price: float) -> list[Order]:
+        """Fill matched orders at ``price``. Needs an app context. Returns the orders that filled."""
+        filled_orders = []
+        for order_id in order_ids:
+            order = db.session.get(Order, order_id)
+            # The order may have been filled or cancelled since it was indexed
+            if not order or order.status != "PENDING":
+                continue
+            if not market_data.is_market_open(order.symbol):
+                # The session closed between the tick and the fill: keep the order resting
+                self.add(order.id, order.symbol, order.side, order.order_type, trigger_price(order))
+                continue
+            account = db.session.get(Account, order.account_id)
+            if not account:
+                continue
+            filled, _ = run_with_retry(lambda: fill_order(
+                order, account, account.positions.filter_by(symbol=order.symbol).first(), Decimal(str(price))
+            ))
+            if filled:
+                if order.side == "BUY" and (order.stop_loss_price or order.take_profit_price):
+                    trigger_book.upsert(order.id, order.symbol, order.stop_loss_price, order.take_profit_price)
+                print(f"{order.order_type} {order.side} order {order.id} filled ({order.symbol} @ {price:.2f})")
+                filled_orders.append(order)
+        return filled_orders
+
+
+matching_engine = MatchingEngine()
@@ -0,0 +1,190 @@
+"""Versioned schema migrations, applied in order at startup.
+
+Each migration runs in its own transaction and records its version in
+``schema_migrations``. Migrations must be idempotent, because databases
+built by the old ``db.create_all()`` already have some of the schema.
+
+Concurrent starts are safe. Workers on one host take a file lock first. A
+process on another host that races for the same version fails to insert
+the version row, rolls back and moves on.
+
+Add a migration by appending a ``@migration(next_version, "what it does")``
+function. Also update models.py, which the test suite and fresh databases
+build from.
+"""
+import fcntl
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Callable
+
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+from .price_table import default_path
+
+MIGRATIONS: list[tuple[int, str, Callable]] = []
+
+
+def migration(version: int, name: str):
+    def register(fn):
+        MIGRATIONS.append((version, name, fn))
+        return fn
+    return register
+
+
+@migration(1, "create tables")
+def _create_tables(conn):
+    db.metadata.create_all(conn, checkfirst=True)
+
+
+@migration(2, "add LIMIT/STOP order columns")
+def _order_type_columns(conn):
+    columns = {column["name"] for column in inspect(conn).get_columns("orders")}
+    if "order_type" not in columns:
+        conn.execute(text("ALTER TABLE orders ADD COLUMN order_type VARCHAR(8) NOT NULL DEFAULT 'MARKET'"))
+    if "limit_price" not in columns:
+        conn.execute(text("ALTER TABLE orders ADD COLUMN limit_price NUMERIC(14, 4)"))
+    if "stop_price" not in columns:
+        conn.execute(text("ALTER TABLE orders ADD COLUMN stop_price NUMERIC(14, 4)"))
+
+
+@migration(3, "index hot order and position queries")
+def _hot_path_indexes(conn):
+    # Merge duplicate positions so the unique index can be built
+    duplicates = conn.execute(text(
+        "SELECT account_id, symbol FROM positions GROUP BY account_id, symbol HAVING COUNT(*) > 1"
+    )).all()
+    for account_id, symbol in duplicates:
+        rows = conn.execute(text(
+            "SELECT id, quantity, avg_price FROM positions WHERE account_id = :account_id AND symbol = :symbol ORDER BY id"
+        ), {"account_id": account_id, "symbol": symbol}).all()
+        quantity = sum(row.quantity for row in rows)
+        cost = sum(Decimal(str(row.avg_price)) * row.quantity for row in rows)
+        avg_price = cost / quantity if quantity else Decimal("0")
+        conn.execute(text("UPDATE positions SET quantity = :quantity, avg_price = :avg_price WHERE id = :id"),
+                     {"quantity": quantity, "avg_price": avg_price, "id": rows[0].id})
+        conn.execute(text("DELETE FROM positions WHERE account_id = :account_id AND symbol = :symbol AND id != :id"),
+                     {"account_id": account_id, "symbol": symbol, "id": rows[0].id})
+        print(f"Merged {len(rows)} positions in {symbol} for account {account_id}")
+
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS ix_orders_status ON orders (status)",
+        "CREATE INDEX IF NOT EXISTS ix_orders_account_status ON orders (account_id, status)",
+        "CREATE INDEX IF NOT EXISTS ix_orders_account_id ON orders (account_id, id)",
+        "CREATE INDEX IF NOT EXISTS ix_orders_account_symbol_side_status_text"
+        " ON orders (account_id, symbol, side, status_text)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_positions_account_symbol ON positions (account_id, symbol)",
+    ):
+        conn.execute(text(statement))
+    # Refresh planner statistics for the new indexes
+    conn.execute(text("ANALYZE"))
+
+
+@migration(4, "add tax lots")
+def _lots(conn):
+    from .models import Lot
+
+    Lot.__table__.create(conn, checkfirst=True)
+    columns = {column["name"] for column in inspect(conn).get_columns("orders")}
+    for name, ddl in (("lot_id", "INTEGER"), ("lot_method", "VARCHAR(4)"), ("realized_pnl", "NUMERIC(14, 2)")):
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE orders ADD COLUMN {name} {ddl}"))
+
+    # Open lots for existing holdings. Partial sells were never recorded, so
+    # assume FIFO: the newest OPEN buys still hold the position's shares, and
+    # older ones were sold. Any shortfall becomes a lot at the position's
+    # average price.
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    positions = conn.execute(text(
+        "SELECT account_id, symbol, quantity, avg_price FROM positions p WHERE quantity > 0 AND NOT EXISTS "
+        "(SELECT 1 FROM lots l WHERE l.account_id = p.account_id AND l.symbol = p.symbol)"
+    )).all()
+    insert_lot = text(
+        "INSERT INTO lots (account_id, symbol, buy_order_id, quantity, remaining, price, opened_at) "
+        "VALUES (:account_id, :symbol, :buy_order_id, :quantity, :remaining, :price, :opened_at)"
+    )
+    for account_id, symbol, held, avg_price in positions:
+        buys = conn.execute(text(
+            "SELECT id, quantity, price, created_at FROM orders WHERE account_id = :account_id AND symbol = :symbol "
+            "AND side = 'BUY' AND status = 'FILLED' AND status_text = 'OPEN' ORDER BY id DESC"
+        ), {"account_id": account_id, "symbol": symbol}).all()
+        lots, sold_out = [], []
+        for buy in buys:
+            if held <= 0:
+                sold_out.append(buy.id)
+                continue
+            remaining = min(buy.quantity, held)
+            held -= remaining
+            lots.append({"buy_order_id": buy.id, "quantity": buy.quantity, "remaining": remaining,
+                         "price": buy.price, "opened_at": buy.created_at})
+        if held > 0:
+            lots.append({"buy_order_id": None, "quantity": held, "remaining": held, "price": avg_price, "opened_at": now})
+        for lot in reversed(lots):
+            conn.execute(insert_lot, {"account_id": account_id, "symbol": symbol, **lot})
+        if sold_out:
+            conn.execute(
+                text("UPDATE orders SET status_text = 'CLOSED' WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                {"ids": sold_out},
+            )
+
+
+@migration(5, "add fill events")
+def _fill_events(conn):
+    from .models import FillEvent
+
+    FillEvent.__table__.create(conn, checkfirst=True)
+
+
+@contextmanager
+def _host_lock():
+    path = os.environ.get("MIGRATIONS_LOCK_PATH") or f"{default_path()}.migrations"
+    with open(path, "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def applied_versions(engine=None) -> set[int]:
+    engine = engine or db.engine
+    with engine.connect() as conn:
+        if not inspect(conn).has_table("schema_migrations"):
+            return set()
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def migrate(engine=None) -> list[int]:
+    """Apply pending migrations. Returns the versions applied by this call."""
+    engine = engine or db.engine
+    applied = []
+    with _host_lock():
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "version INTEGER PRIMARY KEY, name VARCHAR(128) NOT NULL, applied_at TIMESTAMP NOT NULL)"
+            ))
+        done = applied_versions(engine)
+        for version, name, fn in sorted(MIGRATIONS, key=lambda item: item[0]):
+            if version in done:
+                continue
+            claimed = False
+            try:
+                with engine.begin() as conn:
+                    # Claim the version first: a racing process blocks here, then fails and skips
+                    conn.execute(
+                        text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :now)"),
+                        {"version": version, "name": name, "now": datetime.now(timezone.utc).replace(tzinfo=None)},
+                    )
+                    claimed = True
+                    fn(conn)
+            except IntegrityError:
+                if claimed:
+                    raise
+                continue
+            print(f"Applied migration {version}: {name}")
+            applied.append(version)
+    return applied
@@ -36,6 +36,7 @@ class Account(db.Model):
 
 class Position(db.Model):
     __tablename__ = "positions"
+    __table_args__ = (db.Index("uq_positions_account_symbol", "account_id", "symbol", unique=True),)
 
     id = db.Column(db.Integer, primary_key=True)
     account_id = db.Column(db.Integer, db.ForeignKey("accounts.id"), nullable=False)
@@ -55,6 +56,13 @@ class Position(db.Model):
 
 class Order(db.Model):
     __tablename__ = "orders"
+    # Hot paths: pending scans, per-account history, open BUY lots per symbol
+    __table_args__ = (
+        db.Index("ix_orders_status", "status"),
+        db.Index("ix_orders_account_status", "account_id", "status"),
+        db.Index("ix_orders_account_id", "account_id", "id"),
+        db.Index("ix_orders_account_symbol_side_status_text", "account_id", "symbol", "side", "status_text"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     account_id = db.Column(db.Integer, db.ForeignKey("accounts.id"), nullable=False)
@@ -69,6 +77,13 @@ class Order(db.Model):
     exchange = db.Column(db.String(16), nullable=True) # Optional
     currency = db.Column(db.String(16), nullable=True) # Optional
     status_text = db.Column(db.String(16), nullable=True, default="OPEN")
+    order_type = db.Column(db.String(8), nullable=False, default="MARKET", server_default="MARKET")
+    limit_price = db.Column(db.Numeric(14, 4), nullable=True) # LIMIT orders only
+    stop_price = db.Column(db.Numeric(14, 4), nullable=True) # STOP orders only
+    # SELL orders: which lots to close (see order_execution.consume_lots) and the P&L they realized
+    lot_id = db.Column(db.Integer, nullable=True)  # sell this lot first (specific ID)
+    lot_method = db.Column(db.String(4), nullable=True)  # FIFO (default) or LIFO
+    realized_pnl = db.Column(db.Numeric(14, 2), nullable=True)
 
     account = db.relationship("Account", back_populates="orders")
 
@@ -86,6 +101,56 @@ class Order(db.Model):
             "exchange": self.exchange,
             "currency": self.currency,
             "status_text": self.status_text,
+            "order_type": self.order_type,
+            "limit_price": float(self.limit_price) if self.limit_price else None,
+            "stop_price": float(self.stop_price) if self.stop_price else None,
+            "realized_pnl": float(self.realized_pnl) if self.realized_pnl is not None else None,
+        }
+
+
+class Lot(db.Model):
+    """Shares still held from one BUY fill, and their cost basis. Sells consume open lots."""
+    __tablename__ = "lots"
+    # Open lots (closed_at IS NULL) of a holding in fill order; closed lots stay behind as history
+    __table_args__ = (db.Index("ix_lots_open", "account_id", "symbol", "closed_at", "id"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey("accounts.id"), nullable=False)
+    symbol = db.Column(db.String(16), nullable=False)
+    # None for lots backfilled from positions without matching BUY orders
+    buy_order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), nullable=True, unique=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    remaining = db.Column(db.Integer, nullable=False)
+    price = db.Column(db.Numeric(14, 4), nullable=False)
+    opened_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    closed_at = db.Column(db.DateTime, nullable=True)  # set when remaining reaches 0
+
+    buy_order = db.relationship("Order")
+
+
+class Security(db.Model):
+    """Static reference data per symbol. Filled lazily and refreshed in bulk by the scheduler."""
+    __tablename__ = "securities"
+
+    id = db.Column(db.Integer, primary_key=True)
+    symbol = db.Column(db.String(16), unique=True, nullable=False)
+    name = db.Column(db.String(255), nullable=True)
+    exchange = db.Column(db.String(16), nullable=True)
+    currency = db.Column(db.String(16), nullable=True)
+    sector = db.Column(db.String(128), nullable=True)
+    industry = db.Column(db.String(128), nullable=True)
+    website = db.Column(db.String(255), nullable=True)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    def to_dict(self):
+        return {
+            "symbol": self.symbol,
+            "name": self.name,
+            "exchange": self.exchange,
+            "currency": self.currency,
+            "sector": self.sector,
+            "industry": self.industry,
+            "website": self.website,
         }
 
 
@@ -126,3 +191,29 @@ class PriceAlert(db.Model):
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
 
     user = db.relationship("User", backref=db.backref("price_alerts", lazy="dynamic"))
+
+
+class SchedulerLease(db.Model):
+    """Which process runs the scheduler jobs (see leader.py), and its latest job stats."""
+    __tablename__ = "scheduler_leases"
+
+    name = db.Column(db.String(64), primary_key=True)
+    holder = db.Column(db.String(128), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    job_stats = db.Column(db.Text, nullable=True)  # JSON, published by the leader
+
+
+class FillEvent(db.Model):
+    """A committed fill, kept briefly so other processes can notify their listeners (see fill_relay.py)."""
+    __tablename__ = "fill_events"
+
+    id = db.Column(db.Integer, primary_key=True)
+    origin = db.Column(db.String(128), nullable=False)  # host:pid of the process that filled it
+    account_id = db.Column(db.Integer, nullable=False)
+    symbol = db.Column(db.String(16), nullable=False)
+    price = db.Column(db.Numeric(14, 4), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)  # Position after the fill
+    avg_price = db.Column(db.Numeric(14, 4), nullable=False)
+    created_at = db.Column(
+        db.DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None), nullable=False, index=True
+    )
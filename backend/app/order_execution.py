@@ -0,0 +1,388 @@
+"""Fill bookkeeping shared by the API routes and the background processors.
+
+Cash, position and lot balances change only through conditional UPDATEs,
+so concurrent fills on one account cannot overdraw it or oversell. This
+holds across threads, workers and hosts. Examples:
+
+    cash_balance = cash_balance - :cost WHERE cash_balance >= :cost
+    quantity = quantity - :qty WHERE quantity >= :qty
+
+An UPDATE that matches no row raises FillRejected before anything else
+changes. Queued orders are claimed with ``status = 'PENDING'`` in the WHERE
+clause, so only one process fills each. The in-memory ORM objects are
+synced from RETURNING, never written back.
+
+Callers own the transaction. Use ``run_with_retry`` to re-run a fill from
+scratch when a racing transaction forces a rollback (lock timeout,
+serialization failure, duplicate insert).
+
+Every fill is also recorded on the session, and fill listeners (the portfolio
+stream, the valuation engine) are called with the session's fills once it
+commits. The fill is also written to fill_events in the same transaction,
+so fill_relay can notify the listeners in every other process.
+
+Each BUY fill opens a Lot. A SELL consumes open lots: the order's ``lot_id``
+first (specific ID), then FIFO or LIFO per its ``lot_method``. It only reads
+the lots it closes, and records the realized P&L on the sell order. A BUY
+order's status_text turns CLOSED once its lot is used up.
+"""
+import os
+import random
+import socket
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Callable, NamedTuple, Optional, TypeVar
+
+from sqlalchemy import delete, event, insert, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .extensions import db
+from .models import Account, FillEvent, Lot, Order, Position
+
+_SESSION_FILLS_KEY = "order_execution_fills"
+
+LOT_METHODS = ("FIFO", "LIFO")
+
+# Attempts for a transaction that keeps losing races, and the first backoff in seconds
+FILL_RETRIES = 8
+FILL_RETRY_BACKOFF = 0.005
+
+T = TypeVar("T")
+
+
+class FillRejected(Exception):
+    """The account lacks the cash or shares for a fill. Nothing was changed."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Fill(NamedTuple):
+    """A committed change to a position: the position's state after the fill."""
+    account_id: int
+    symbol: str
+    price: Decimal
+    quantity: int
+    avg_price: Decimal
+
+
+_fill_listeners: list[Callable[[list[Fill]], None]] = []
+
+
+def process_origin() -> str:
+    """This process's tag on fill_events rows; read per call so forked workers get their own."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def add_fill_listener(listener: Callable[[list[Fill]], None]) -> None:
+    """Call listener(fills) after each commit that applied fills."""
+    if listener not in _fill_listeners:
+        _fill_listeners.append(listener)
+
+
+def _record_fill(account: Account, symbol: str, price: Decimal, position: Optional[Position]) -> None:
+    fill = Fill(
+        account.id,
+        symbol,
+        price,
+        position.quantity if position else 0,
+        Decimal(position.avg_price) if position else Decimal("0"),
+    )
+    db.session.info.setdefault(_SESSION_FILLS_KEY, []).append(fill)
+    db.session.add(FillEvent(origin=process_origin(), **fill._asdict()))
+
+
+def notify_fill_listeners(fills: list[Fill], exclude: Optional[Callable] = None) -> None:
+    for listener in _fill_listeners:
+        if listener == exclude:
+            continue
+        try:
+            listener(fills)
+        except Exception as e:
+            print(f"Error in fill listener: {e}")
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_fill_listeners(session):
+    fills = session.info.pop(_SESSION_FILLS_KEY, None)
+    if fills:
+        notify_fill_listeners(fills)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_fills(session):
+    session.info.pop(_SESSION_FILLS_KEY, None)
+
+
+def _debit_cash(account: Account, amount: Decimal) -> None:
+    balance = db.session.execute(
+        update(Account)
+        .where(Account.id == account.id, Account.cash_balance >= amount)
+        .values(cash_balance=Account.cash_balance - amount)
+        .returning(Account.cash_balance)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if balance is None:
+        raise FillRejected("Insufficient cash")
+    set_committed_value(account, "cash_balance", balance)
+
+
+def _credit_cash(account: Account, amount: Decimal) -> None:
+    balance = db.session.execute(
+        update(Account)
+        .where(Account.id == account.id)
+        .values(cash_balance=Account.cash_balance + amount)
+        .returning(Account.cash_balance)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    set_committed_value(account, "cash_balance", balance)
+
+
+def apply_buy_fill(
+    account: Account,
+    position: Optional[Position],
+    symbol: str,
+    quantity: int,
+    price: Decimal,
+    order: Optional[Order] = None,
+) -> Position:
+    """Debit the cost, add the shares to the position (creating it if needed) and open a lot.
+
+    Returns the position. Raises FillRejected if the cash is not there.
+    """
+    order_cost = price * Decimal(quantity)
+    _debit_cash(account, order_cost)
+
+    row = db.session.execute(
+        update(Position)
+        .where(Position.account_id == account.id, Position.symbol == symbol)
+        .values(
+            # Both right-hand sides see the old row
+            avg_price=(Position.avg_price * Position.quantity + order_cost) / (Position.quantity + quantity),
+            quantity=Position.quantity + quantity,
+        )
+        .returning(Position.id, Position.quantity, Position.avg_price)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        # No holding yet; a racing first buy trips the unique index and the caller retries
+        position_id = db.session.execute(
+            insert(Position).values(account_id=account.id, symbol=symbol, quantity=quantity, avg_price=price)
+            .returning(Position.id)
+        ).scalar()
+        row = (position_id, quantity, price)
+    if position is None or position.id != row[0]:
+        position = db.session.get(Position, row[0])
+    set_committed_value(position, "quantity", row[1])
+    set_committed_value(position, "avg_price", row[2])
+
+    db.session.add(Lot(
+        account_id=account.id, symbol=symbol, buy_order=order, quantity=quantity, remaining=quantity, price=price,
+    ))
+    _record_fill(account, symbol, price, position)
+    return position
+
+
+def open_lots(account_id: int, symbol: str, method: str = "FIFO"):
+    """Query for a holding's open lots in the order a sell would consume them."""
+    query = Lot.query.filter(Lot.account_id == account_id, Lot.symbol == symbol, Lot.closed_at.is_(None))
+    return query.order_by(Lot.id.desc() if method == "LIFO" else Lot.id)
+
+
+def consume_lots(
+    account_id: int, symbol: str, quantity: int, price: Decimal, method: Optional[str] = None, lot_id: Optional[int] = None
+) -> Decimal:
+    """Take ``quantity`` shares out of open lots: ``lot_id`` first, then by ``method``. Returns the realized P&L."""
+    realized = Decimal("0")
+    to_sell = quantity
+    if lot_id is not None:
+        lot = db.session.get(Lot, lot_id)
+        if lot and lot.account_id == account_id and lot.symbol == symbol and lot.closed_at is None:
+            taken = _take(lot, to_sell)
+            realized += (price - Decimal(lot.price)) * taken
+            to_sell -= taken
+    while to_sell > 0:
+        lots = open_lots(account_id, symbol, method or "FIFO").limit(8).all()
+        if not lots:
+            break
+        for lot in lots:
+            taken = _take(lot, to_sell)
+            realized += (price - Decimal(lot.price)) * taken
+            to_sell -= taken
+            if to_sell == 0:
+                break
+    return realized
+
+
+def _take(lot: Lot, wanted: int) -> int:
+    """Take up to ``wanted`` shares from a lot, closing it when empty. Returns how many were taken."""
+    while True:
+        taken = min(lot.remaining, wanted)
+        remaining = db.session.execute(
+            update(Lot)
+            .where(Lot.id == lot.id, Lot.remaining >= taken)
+            .values(remaining=Lot.remaining - taken)
+            .returning(Lot.remaining)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if remaining is not None:
+            break
+        # Another sell got to this lot first; retry with what is left
+        db.session.refresh(lot)
+    set_committed_value(lot, "remaining", remaining)
+    if remaining == 0 and lot.closed_at is None:
+        lot.closed_at = datetime.now(timezone.utc)
+        if lot.buy_order is not None:
+            lot.buy_order.status_text = "CLOSED"
+    return taken
+
+
+def apply_sell_fill(
+    account: Account, position: Position, quantity: int, price: Decimal, order: Optional[Order] = None
+) -> Optional[Position]:
+    """Remove the shares, credit the proceeds and close lots per the sell order.
+
+    Returns the position, or None once it is closed out. Raises FillRejected
+    if the shares are not there.
+    """
+    held = db.session.execute(
+        update(Position)
+        .where(Position.id == position.id, Position.quantity >= quantity)
+        .values(quantity=Position.quantity - quantity)
+        .returning(Position.quantity)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if held is None:
+        raise FillRejected("Insufficient shares")
+    set_committed_value(position, "quantity", held)
+    _credit_cash(account, price * Decimal(quantity))
+
+    realized = consume_lots(
+        account.id, position.symbol, quantity, price,
+        method=order.lot_method if order else None, lot_id=order.lot_id if order else None,
+    )
+    if order is not None:
+        order.realized_pnl = realized
+    if held == 0:
+        # Only if no buy has added shares meanwhile
+        db.session.execute(
+            delete(Position).where(Position.id == position.id, Position.quantity == 0)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.expunge(position)
+        _record_fill(account, position.symbol, price, None)
+        return None
+    _record_fill(account, position.symbol, price, position)
+    return position
+
+
+def claim_order(order: Order) -> bool:
+    """Take a PENDING order for this transaction. False if another process already filled or cancelled it."""
+    claimed = db.session.execute(
+        update(Order)
+        .where(Order.id == order.id, Order.status == "PENDING")
+        .values(status="FILLING")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        db.session.refresh(order)
+        return False
+    set_committed_value(order, "status", "FILLING")
+    return True
+
+
+def run_with_retry(work: Callable[[], T]) -> T:
+    """Run ``work()`` and commit, re-running it from scratch when a racing transaction forces a rollback."""
+    for attempt in range(FILL_RETRIES):
+        try:
+            result = work()
+            db.session.commit()
+            return result
+        except (IntegrityError, OperationalError):
+            # Lock timeouts, serialization failures, deadlocks, a racing first buy of a symbol
+            db.session.rollback()
+            if attempt == FILL_RETRIES - 1:
+                raise
+            time.sleep(random.uniform(0, FILL_RETRY_BACKOFF * 2 ** attempt))
+
+
+def fill_order(
+    order: Order,
+    account: Account,
+    position: Optional[Position],
+    price: Decimal,
+) -> tuple[bool, Optional[Position]]:
+    """Fill a queued order at ``price``, or reject it for lack of cash or shares.
+
+    Returns (filled, position after the fill). Also (False, position) when
+    another process claimed the order first; its status is then left alone.
+    """
+    if not claim_order(order):
+        return False, position
+    try:
+        if order.side == "BUY":
+            position = apply_buy_fill(account, position, order.symbol, order.quantity, price, order)
+        else:
+            if not position:
+                raise FillRejected("Insufficient shares")
+            position = apply_sell_fill(account, position, order.quantity, price, order)
+    except FillRejected as e:
+        order.status = "REJECTED"
+        order.status_text = e.reason
+        return False, position
+
+    order.status = "FILLED"
+    order.price = price
+    order.status_text = "OPEN" if order.side == "BUY" else "CLOSED"
+    return True, position
+
+
+def sell_against_buy_order(
+    account: Account,
+    position: Position,
+    buy_order: Order,
+    quantity: int,
+    price: Decimal,
+    market_open: bool,
+) -> Order:
+    """Sell shares out of ``buy_order``'s lot. See sell_from_lot."""
+    lot = Lot.query.filter_by(buy_order_id=buy_order.id).first()
+    return sell_from_lot(account, position, lot, quantity, price, market_open, buy_order)
+
+
+def sell_from_lot(
+    account: Account,
+    position: Position,
+    lot: Optional[Lot],
+    quantity: int,
+    price: Decimal,
+    market_open: bool,
+    buy_order: Optional[Order] = None,
+) -> Order:
+    """Sell shares out of ``lot``, then other lots FIFO if it holds fewer.
+
+    Fills now when the market is open; otherwise records a PENDING sell for the
+    order processor, which closes the same lot. Returns the sell order.
+    """
+    buy_order = buy_order or (lot.buy_order if lot else None)
+    sell_order = Order(
+        account_id=account.id,
+        symbol=position.symbol,
+        side="SELL",
+        quantity=quantity,
+        price=price,
+        status="FILLED" if market_open else "PENDING",
+        status_text="CLOSED" if market_open else "PENDING_CLOSE",
+        # Inherit from the original order; lots carried over by migration 4 have none
+        exchange=buy_order.exchange if buy_order else None,
+        currency=buy_order.currency if buy_order else None,
+        lot_id=lot.id if lot else None,
+    )
+    db.session.add(sell_order)
+    if market_open:
+        apply_sell_fill(account, position, quantity, price, sell_order)
+    return sell_order
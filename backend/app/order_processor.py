@@ -1,104 +1,139 @@
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
 from decimal import Decimal
+
 from app.extensions import db
 from app.models import Order, Position, Account
-from app.market_data import is_market_open, fetch_quote
+from app.market_data import markets_open, fetch_quotes
+from app.order_execution import fill_order
+from app.trigger_engine import trigger_book
+
+# Orders applied per transaction; a failed chunk is retried one order at a time
+CHUNK_SIZE = 500
+
+# Timing and outcome counters of the most recent run (see /api/metrics)
+last_run_stats: dict = {}
+
+
+def _execute_chunk(orders: list, prices: dict) -> tuple[int, int]:
+    """Apply a chunk of orders with bulk-loaded accounts and positions, then commit once.
+
+    Returns (filled, rejected).
+    """
+    account_ids = {order.account_id for order in orders}
+    symbols = {order.symbol for order in orders}
+    accounts = {
+        account.id: account
+        for account in Account.query.filter(Account.id.in_(account_ids)).all()
+    }
+    positions = {
+        (position.account_id, position.symbol): position
+        for position in Position.query.filter(
+            Position.account_id.in_(account_ids), Position.symbol.in_(symbols)
+        ).all()
+    }
+
+    filled = rejected = 0
+    new_triggers = []
+    for order in orders:
+        account = accounts.get(order.account_id)
+        if not account:
+            continue
+
+        key = (account.id, order.symbol)
+        order_filled, positions[key] = fill_order(order, account, positions.get(key), prices[order.symbol])
+        if not order_filled:
+            # Not counted if another process claimed it first
+            rejected += order.status == "REJECTED"
+            continue
+
+        if order.side == "BUY" and (order.stop_loss_price or order.take_profit_price):
+            new_triggers.append((order.id, order.symbol, order.stop_loss_price, order.take_profit_price))
+        filled += 1
+
+    db.session.commit()
+
+    # Thresholds set while the buy was pending become live once it fills
+    for trigger in new_triggers:
+        trigger_book.upsert(*trigger)
+    return filled, rejected
+
 
 def process_pending_orders():
     """
     Process all PENDING orders for symbols where market is now open.
     Run this periodically (e.g., every minute via scheduler).
+
+    Orders are grouped by (symbol, exchange): market state and price are resolved
+    once per group, accounts and positions are loaded in bulk, and fills are
+    committed in chunks of CHUNK_SIZE.
     """
+    global last_run_stats
+    started = time.perf_counter()
 
-    pending_orders = Order.query.filter_by(status="PENDING").all()
-    
-    processed_count = 0
-    
+    # LIMIT and STOP orders rest in the matching engine until a tick crosses them
+    pending_orders = Order.query.filter_by(status="PENDING", order_type="MARKET").order_by(Order.id).all()
+
+    groups = defaultdict(list)
     for order in pending_orders:
-        if not is_market_open(order.symbol):
-            continue
-        
+        groups[(order.symbol, order.exchange)].append(order)
+
+    symbols = list({symbol for symbol, _ in groups})
+    open_by_symbol = markets_open(symbols)
+    open_groups = {key: orders for key, orders in groups.items() if open_by_symbol.get(key[0])}
+
+    quotes_started = time.perf_counter()
+    quotes = fetch_quotes(list({symbol for symbol, _ in open_groups})) if open_groups else {}
+    prices = {}
+    for symbol, quote in quotes.items():
         try:
-            quote = fetch_quote(order.symbol)
-            current_price = Decimal(str(quote["price"]))
+            prices[symbol] = Decimal(str(quote["price"]))
         except Exception as e:
-            print(f"Error fetching quote for {order.symbol}: {e}")
-            continue
-        
-        account = Account.query.get(order.account_id)
-        if not account:
-            continue
-        
-        order_cost = current_price * Decimal(order.quantity)
-        position = account.positions.filter_by(symbol=order.symbol).first()
-        
+            print(f"Error fetching quote for {symbol}: {e}")
+    quotes_ms = (time.perf_counter() - quotes_started) * 1000
+
+    # Keep each symbol's orders together so chunk preloads stay narrow
+    executable = [
+        order
+        for (symbol, _), orders in sorted(open_groups.items(), key=lambda item: item[1][0].id)
+        if symbol in prices
+        for order in orders
+    ]
+
+    processed_count = 0
+    rejected_count = 0
+    error_count = 0
+    for start in range(0, len(executable), CHUNK_SIZE):
+        chunk = executable[start:start + CHUNK_SIZE]
         try:
-            if order.side == "BUY":
-                if account.cash_balance < order_cost:
-                    order.status = "REJECTED"
-                    order.status_text = "Insufficient cash"
-                    db.session.commit()
-                    continue
-                
-                account.cash_balance -= order_cost
-                
-                if position:
-                    total_shares = position.quantity + order.quantity
-                    total_cost = (Decimal(position.avg_price) * Decimal(position.quantity)) + order_cost
-                    position.avg_price = total_cost / Decimal(total_shares)
-                    position.quantity = total_shares
-                else:
-                    position = Position(
-                        account_id=account.id,
-                        symbol=order.symbol,
-                        quantity=order.quantity,
-                        avg_price=current_price,
-                    )
-                    db.session.add(position)
-                
-                order.status = "FILLED"
-                order.price = current_price
-                order.status_text = "OPEN"
-            
-            else:  # SELL
-                if not position or position.quantity < order.quantity:
-                    order.status = "REJECTED"
-                    order.status_text = "Insufficient shares"
-                    db.session.commit()
-                    continue
-                
-                account.cash_balance += order_cost
-                position.quantity -= order.quantity
-                
-                if position.quantity == 0:
-                    db.session.delete(position)
-                
-                # Find and mark the original buy order as closed
-                buy_orders = Order.query.filter_by(
-                    account_id=account.id,
-                    symbol=order.symbol,
-                    side="BUY",
-                    status_text="OPEN"
-                ).all()
-                
-                remaining_qty = order.quantity
-                for buy_order in buy_orders:
-                    if remaining_qty <= 0:
-                        break
-                    if buy_order.quantity <= remaining_qty:
-                        buy_order.status_text = "CLOSED"
-                        remaining_qty -= buy_order.quantity
-                    else:
-                        break
-                
-                order.status = "FILLED"
-                order.price = current_price
-                order.status_text = "CLOSED"
-            
-            db.session.commit()
-            processed_count += 1
-            
+            filled, rejected = _execute_chunk(chunk, prices)
         except Exception as e:
             db.session.rollback()
-            print(f"Error processing order {order.id}: {e}")
-    
-    return processed_count
\ No newline at end of file
+            print(f"Error processing order chunk, retrying orders individually: {e}")
+            filled = rejected = 0
+            for order in chunk:
+                try:
+                    order_filled, order_rejected = _execute_chunk([order], prices)
+                    filled += order_filled
+                    rejected += order_rejected
+                except Exception as e:
+                    db.session.rollback()
+                    error_count += 1
+                    print(f"Error processing order {order.id}: {e}")
+        processed_count += filled
+        rejected_count += rejected
+
+    last_run_stats = {
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "pending": len(pending_orders),
+        "groups": len(groups),
+        "open_groups": len(open_groups),
+        "filled": processed_count,
+        "rejected": rejected_count,
+        "errors": error_count,
+        "quote_ms": round(quotes_ms, 2),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+    return processed_count
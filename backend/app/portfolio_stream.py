@@ -0,0 +1,142 @@
+"""Fan-out of portfolio events to Server-Sent Events subscribers.
+
+Two kinds of events are published:
+
+- ``tick``: a new price for a symbol, from ws_manager. Only subscribers holding
+  the symbol are woken.
+- ``fill``: an account's cash or positions changed. Published from the
+  order_execution fill listener, so every fill path (API, processor, matching
+  engine, triggers) is covered.
+
+Every event gets an id of the form ``<boot>-<seq>``, where boot is unique to
+the process (workers keep separate sequences). The last REPLAY_BUFFER
+events are kept so a reconnecting client that sends Last-Event-ID can be sent
+just what it missed; otherwise it gets a fresh snapshot.
+"""
+import itertools
+import queue
+import threading
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .order_execution import add_fill_listener
+from .websocket_manager import ws_manager
+
+REPLAY_BUFFER = 4096
+HEARTBEAT_SECONDS = 15.0
+
+
+@dataclass
+class Subscriber:
+    account_id: int
+    symbols: set[str]
+    queue: "queue.Queue[tuple]" = field(default_factory=queue.Queue)
+
+
+class PortfolioStream:
+    def __init__(self):
+        self.heartbeat_seconds = HEARTBEAT_SECONDS
+        self._lock = threading.Lock()
+        self._boot = uuid.uuid4().hex
+        self._seq = itertools.count(1)
+        self._last_seq = 0
+        self._evicted_seq = 0
+        self._events: deque[tuple[int, str, object, object]] = deque()
+        self._last_prices: dict[str, float] = {}
+        self._subscribers: dict[int, list[Subscriber]] = {}
+
+    def init_app(self, app) -> None:
+        with self._lock:
+            self._events.clear()
+            self._last_prices.clear()
+            self._subscribers.clear()
+            self._evicted_seq = self._last_seq
+        ws_manager.add_listener(self.on_tick)
+        add_fill_listener(self.on_fills)
+
+    def event_id(self, seq: int) -> str:
+        return f"{self._boot}-{seq}"
+
+    def _parse_event_id(self, event_id: Optional[str]) -> Optional[int]:
+        if not event_id:
+            return None
+        boot, _, seq = event_id.partition("-")
+        if boot != self._boot or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def _append_locked(self, kind: str, key, value) -> int:
+        seq = next(self._seq)
+        self._last_seq = seq
+        if len(self._events) >= REPLAY_BUFFER:
+            self._evicted_seq = self._events.popleft()[0]
+        self._events.append((seq, kind, key, value))
+        return seq
+
+    def subscribe(
+        self, account_id: int, symbols, last_event_id: Optional[str] = None
+    ) -> tuple[Subscriber, str, Optional[list[tuple]]]:
+        """Register a subscriber.
+
+        Returns (subscriber, id of the latest event, missed events). Missed events
+        are None when the client has to start over from a snapshot.
+        """
+        subscriber = Subscriber(account_id, set(symbols))
+        last_seq = self._parse_event_id(last_event_id)
+        with self._lock:
+            self._subscribers.setdefault(account_id, []).append(subscriber)
+            replay = None
+            if last_seq is not None and self._evicted_seq <= last_seq <= self._last_seq:
+                replay = [
+                    (kind, seq, key, value)
+                    for seq, kind, key, value in self._events
+                    if seq > last_seq
+                    and (
+                        (kind == "tick" and key in subscriber.symbols)
+                        or (kind == "fill" and key == account_id)
+                    )
+                ]
+            return subscriber, self.event_id(self._last_seq), replay
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.account_id, [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+            if not subscribers:
+                self._subscribers.pop(subscriber.account_id, None)
+
+    def set_symbols(self, subscriber: Subscriber, symbols) -> None:
+        with self._lock:
+            subscriber.symbols = set(symbols)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def on_tick(self, symbol: str, price: float) -> None:
+        """ws_manager listener: record the tick and wake the subscribers holding the symbol."""
+        with self._lock:
+            if self._last_prices.get(symbol) == price:
+                return
+            self._last_prices[symbol] = price
+            seq = self._append_locked("tick", symbol, price)
+            for subscribers in self._subscribers.values():
+                for subscriber in subscribers:
+                    if symbol in subscriber.symbols:
+                        subscriber.queue.put(("tick", seq, symbol, price))
+
+    def on_fills(self, fills) -> None:
+        self.publish_fills({fill.account_id for fill in fills})
+
+    def publish_fills(self, account_ids) -> None:
+        with self._lock:
+            for account_id in account_ids:
+                seq = self._append_locked("fill", account_id, None)
+                for subscriber in self._subscribers.get(account_id, []):
+                    subscriber.queue.put(("fill", seq, account_id, None))
+
+
+portfolio_stream = PortfolioStream()
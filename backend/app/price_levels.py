@@ -0,0 +1,52 @@
+"""Price-sorted index of resting entries (price triggers, limit orders) for one symbol and side."""
+import bisect
+from typing import Optional
+
+_INF = float("inf")
+
+
+class PriceLevels:
+    """Entries kept sorted by price, so a tick finds every entry it crosses in O(log n)."""
+
+    def __init__(self):
+        self._keys: list[tuple[float, int]] = []  # (price, entry_id), sorted
+        self._prices: dict[int, float] = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, entry_id: int) -> bool:
+        return entry_id in self._prices
+
+    def add(self, entry_id: int, price: float) -> None:
+        """Insert an entry, replacing any existing one with the same id."""
+        self.remove(entry_id)
+        bisect.insort(self._keys, (price, entry_id))
+        self._prices[entry_id] = price
+
+    def remove(self, entry_id: int) -> bool:
+        price = self._prices.pop(entry_id, None)
+        if price is None:
+            return False
+        del self._keys[bisect.bisect_left(self._keys, (price, entry_id))]
+        return True
+
+    def price_of(self, entry_id: int) -> Optional[float]:
+        return self._prices.get(entry_id)
+
+    def pop_at_or_below(self, price: float) -> list[int]:
+        """Remove and return ids of entries priced <= price, lowest first."""
+        index = bisect.bisect_right(self._keys, (price, _INF))
+        return self._pop_slice(0, index)
+
+    def pop_at_or_above(self, price: float) -> list[int]:
+        """Remove and return ids of entries priced >= price, highest first."""
+        index = bisect.bisect_left(self._keys, (price, -_INF))
+        return self._pop_slice(index, len(self._keys))[::-1]
+
+    def _pop_slice(self, start: int, end: int) -> list[int]:
+        popped = self._keys[start:end]
+        del self._keys[start:end]
+        for _, entry_id in popped:
+            del self._prices[entry_id]
+        return [entry_id for _, entry_id in popped]
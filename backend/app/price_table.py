@@ -0,0 +1,177 @@
+"""Price table shared by every gunicorn worker on the host.
+
+A fixed-size file (under /dev/shm where available) mapped into each process:
+
+    header     magic, capacity, symbol count, tick counter
+    directory  capacity x 16-byte symbols, append-only
+    slots      capacity x (seq, price, updated_at)
+
+Only the feeder process (whoever holds the feeder lock, see ws_manager)
+writes prices. Each slot is a seqlock: the writer makes ``seq`` odd, writes
+price and time, then makes it even again. Readers retry while ``seq`` is odd
+or changed underneath them, so reads never take a lock. Any process can add
+symbols to the directory, under a short file lock; the feeder picks them up
+and subscribes them upstream.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+MAGIC = b"FPT1"
+CAPACITY = 4096
+SYMBOL_BYTES = 16
+
+_HEADER = struct.Struct("<4sIIxxxxQ")  # magic, capacity, count, tick counter
+_SLOT = struct.Struct("<Qdd")  # seq, price, updated_at (Unix seconds)
+_HEADER_SIZE = 64
+_TICKS_OFFSET = 16
+_COUNT_OFFSET = 8
+
+# Give up on a slot being rewritten after this many attempts
+_READ_RETRIES = 100
+
+
+def default_path() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "fortune-prices")
+
+
+class SharedPriceTable:
+    def __init__(self, path: str, capacity: int = CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self._directory_offset = _HEADER_SIZE
+        self._slots_offset = _HEADER_SIZE + capacity * SYMBOL_BYTES
+        size = self._slots_offset + capacity * _SLOT.size
+        self._lock_path = f"{path}.lock"
+
+        with self._directory_lock():
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if os.fstat(fd).st_size != size:
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, size)
+                self._map = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+            magic, stored_capacity, _, _ = _HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or stored_capacity != capacity:
+                self._map[:size] = bytes(size)
+                _HEADER.pack_into(self._map, 0, MAGIC, capacity, 0, 0)
+
+        # Per-process view of the append-only directory
+        self._index: dict[str, int] = {}
+        self._indexed = 0
+        self._index_lock = threading.Lock()
+
+    @contextmanager
+    def _directory_lock(self):
+        with open(self._lock_path, "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    # -- directory ---------------------------------------------------------
+
+    def count(self) -> int:
+        return struct.unpack_from("<I", self._map, _COUNT_OFFSET)[0]
+
+    def ticks(self) -> int:
+        """Counter bumped after every price write; cheap to poll for changes."""
+        return struct.unpack_from("<Q", self._map, _TICKS_OFFSET)[0]
+
+    def _refresh_index(self) -> None:
+        count = self.count()
+        if count == self._indexed:
+            return
+        with self._index_lock:
+            for index in range(self._indexed, count):
+                offset = self._directory_offset + index * SYMBOL_BYTES
+                symbol = self._map[offset:offset + SYMBOL_BYTES].rstrip(b"\0").decode("ascii")
+                self._index[symbol] = index
+            self._indexed = max(self._indexed, count)
+
+    def symbols(self) -> list[str]:
+        self._refresh_index()
+        return sorted(self._index, key=self._index.get)
+
+    def index_of(self, symbol: str) -> Optional[int]:
+        self._refresh_index()
+        return self._index.get(symbol)
+
+    def register(self, symbol: str) -> int:
+        """Slot index for a symbol, adding it to the directory if needed."""
+        index = self.index_of(symbol)
+        if index is not None:
+            return index
+        encoded = symbol.encode("ascii")
+        if len(encoded) > SYMBOL_BYTES:
+            raise ValueError(f"Symbol too long for the price table: {symbol}")
+        with self._directory_lock():
+            self._refresh_index()  # another process may have added it meanwhile
+            if symbol in self._index:
+                return self._index[symbol]
+            index = self.count()
+            if index >= self.capacity:
+                raise RuntimeError("Price table is full")
+            offset = self._directory_offset + index * SYMBOL_BYTES
+            self._map[offset:offset + SYMBOL_BYTES] = encoded.ljust(SYMBOL_BYTES, b"\0")
+            struct.pack_into("<I", self._map, _COUNT_OFFSET, index + 1)
+        self._refresh_index()
+        return index
+
+    # -- prices ------------------------------------------------------------
+
+    def _slot_offset(self, index: int) -> int:
+        return self._slots_offset + index * _SLOT.size
+
+    def write(self, symbol: str, price: float, updated_at: Optional[float] = None) -> None:
+        """Publish a price. Only the feeder process may call this."""
+        offset = self._slot_offset(self.register(symbol))
+        seq = struct.unpack_from("<Q", self._map, offset)[0]
+        seq += seq & 1  # a writer that died mid-update left it odd
+        struct.pack_into("<Q", self._map, offset, seq + 1)
+        struct.pack_into("<dd", self._map, offset + 8, float(price), updated_at or time.time())
+        struct.pack_into("<Q", self._map, offset, seq + 2)
+        struct.pack_into("<Q", self._map, _TICKS_OFFSET, self.ticks() + 1)
+
+    def read_slot(self, index: int) -> tuple[int, float, float]:
+        """(seq, price, updated_at) for a slot, consistent without locking."""
+        offset = self._slot_offset(index)
+        for _ in range(_READ_RETRIES):
+            seq, price, updated_at = _SLOT.unpack_from(self._map, offset)
+            if seq & 1:
+                continue
+            if struct.unpack_from("<Q", self._map, offset)[0] == seq:
+                return seq, price, updated_at
+        raise RuntimeError(f"Price slot {index} kept changing while being read")
+
+    def read(self, symbol: str) -> tuple[float, Optional[float]]:
+        """(price, updated_at) for a symbol; (0.0, None) if it has never ticked."""
+        index = self.index_of(symbol)
+        if index is None:
+            return 0.0, None
+        seq, price, updated_at = self.read_slot(index)
+        return (price, updated_at) if seq else (0.0, None)
+
+    def changed_since(self, seen: dict[int, int]) -> list[tuple[str, float]]:
+        """(symbol, price) for slots written since ``seen`` (index -> seq), which is updated in place."""
+        self._refresh_index()
+        changed = []
+        for symbol, index in list(self._index.items()):
+            seq, price, _ = self.read_slot(index)
+            if seq and seen.get(index) != seq:
+                seen[index] = seq
+                changed.append((symbol, price))
+        return changed
+
+    def close(self) -> None:
+        self._map.close()
@@ -0,0 +1,205 @@
+"""Process-wide TTL cache for upstream market data.
+
+Entries are keyed by ``(field, key)`` where ``field`` names the kind of data
+(``"quote"``, ``"company_name"``, ...) and picks its TTL. Concurrent misses
+for the same entry are coalesced into a single upstream call, and entries that
+are only slightly past their TTL are served stale while one background
+refresh runs; callers that price fills pass ``serve_stale=False`` to wait for
+a fresh value instead. When a load fails (for example while the upstream circuit
+breaker is open), callers that pass ``fallback=True`` get the last good value
+instead, however old; that is for display only, never for pricing a fill.
+
+Fields keyed by user input (``"search"``) are capped at FIELD_MAX_ENTRIES and
+evict their least recently used entries.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# field -> (fresh seconds, extra seconds an expired entry may be served stale)
+FIELD_TTLS: Dict[str, Tuple[float, float]] = {
+    "quote": (5.0, 55.0),
+    "company_name": (24 * 60 * 60.0, 7 * 24 * 60 * 60.0),
+    # Upstream symbol search results, keyed by lowercased query
+    "search": (60 * 60.0, 0.0),
+    # /api/market/<symbol> sections, from the live quote to slow-moving reference data
+    "snapshot_quote": (5.0, 0.0),
+    "snapshot_performance_metrics": (60.0, 4 * 60.0),
+    "snapshot_financials": (15 * 60.0, 45 * 60.0),
+    "snapshot_analyst_forecast": (6 * 60 * 60.0, 18 * 60 * 60.0),
+    "snapshot_upcoming_events": (6 * 60 * 60.0, 18 * 60 * 60.0),
+    "snapshot_profile": (24 * 60 * 60.0, 6 * 24 * 60 * 60.0),
+    "snapshot_metadata": (60 * 60.0, 0.0),
+}
+DEFAULT_TTL: Tuple[float, float] = (5.0, 0.0)
+# field -> most entries kept; other fields are bounded by the symbols in use
+FIELD_MAX_ENTRIES: Dict[str, int] = {"search": 2048}
+
+
+class _Entry:
+    __slots__ = ("value", "fetched_at")
+
+    def __init__(self, value: Any, fetched_at: float):
+        self.value = value
+        self.fetched_at = fetched_at
+
+
+class _Flight:
+    """An upstream load in progress; waiters block on ``event``."""
+
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class QuoteCache:
+    def __init__(
+        self,
+        ttls: Optional[Dict[str, Tuple[float, float]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        max_entries: Optional[Dict[str, int]] = None,
+    ):
+        self._ttls = dict(FIELD_TTLS if ttls is None else ttls)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, Hashable], _Entry] = {}
+        self._max_entries = dict(FIELD_MAX_ENTRIES if max_entries is None else max_entries)
+        # Capped field -> its keys, least recently used first
+        self._recency: Dict[str, "OrderedDict[Hashable, None]"] = {field: OrderedDict() for field in self._max_entries}
+        self._flights: Dict[Tuple[str, Hashable], _Flight] = {}
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "stale": 0,
+            "coalesced": 0,
+            "errors": 0,
+            "fallbacks": 0,
+            "evicted": 0,
+        }
+
+    def get(
+        self, field: str, key: Hashable, loader: Callable[[], Any], fallback: bool = False, serve_stale: bool = True
+    ) -> Any:
+        """Return the cached value for ``(field, key)``, calling ``loader`` at most once per miss.
+
+        Without ``serve_stale``, an entry past its TTL is a miss rather than served while it refreshes.
+        If the load fails, its error is raised, or with ``fallback`` the last good value is returned.
+        """
+        cache_key = (field, key)
+        ttl, stale_ttl = self._ttls.get(field, DEFAULT_TTL)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            age = self._clock() - entry.fetched_at if entry is not None else None
+            if entry is not None:
+                self._touch_locked(field, key)
+            if age is not None and age < ttl:
+                self._counters["hits"] += 1
+                return entry.value
+            if serve_stale and age is not None and age < ttl + stale_ttl:
+                # Stale-while-revalidate: answer now, refresh once in the background
+                self._counters["stale"] += 1
+                if cache_key in self._flights:
+                    return entry.value
+                refresh = self._flights[cache_key] = _Flight()
+                threading.Thread(
+                    target=self._load, args=(cache_key, refresh, loader), daemon=True
+                ).start()
+                return entry.value
+            flight = self._flights.get(cache_key)
+            if flight is not None:
+                self._counters["coalesced"] += 1
+                leader = False
+            else:
+                self._counters["misses"] += 1
+                flight = self._flights[cache_key] = _Flight()
+                leader = True
+
+        if leader:
+            self._load(cache_key, flight, loader)
+        else:
+            flight.event.wait()
+        if flight.error is not None:
+            if not fallback:
+                raise flight.error
+            return self._fallback(cache_key, flight.error)
+        return flight.value
+
+    def _touch_locked(self, field: str, key: Hashable) -> None:
+        """Mark an entry of a capped field as used, evicting the least recently used past the cap."""
+        recency = self._recency.get(field)
+        if recency is None:
+            return
+        recency[key] = None
+        recency.move_to_end(key)
+        while len(recency) > self._max_entries[field]:
+            oldest, _ = recency.popitem(last=False)
+            self._entries.pop((field, oldest), None)
+            self._counters["evicted"] += 1
+
+    def _fallback(self, cache_key, error: BaseException) -> Any:
+        """Last good value for a failed load, however old. Dicts are marked ``stale``."""
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                raise error
+            self._counters["fallbacks"] += 1
+        if isinstance(entry.value, dict):
+            return {**entry.value, "stale": True}
+        return entry.value
+
+    def _load(self, cache_key, flight: _Flight, loader: Callable[[], Any]) -> None:
+        try:
+            flight.value = loader()
+        except Exception as exc:
+            flight.error = exc
+            with self._lock:
+                self._counters["errors"] += 1
+        else:
+            with self._lock:
+                self._entries[cache_key] = _Entry(flight.value, self._clock())
+                self._touch_locked(*cache_key)
+        finally:
+            with self._lock:
+                self._flights.pop(cache_key, None)
+            flight.event.set()
+
+    def ttl(self, field: str) -> float:
+        return self._ttls.get(field, DEFAULT_TTL)[0]
+
+    def needs_load(self, field: str, key: Hashable) -> bool:
+        """Whether get() would call its loader for this entry (missing, or too old to serve stale)."""
+        ttl, stale_ttl = self._ttls.get(field, DEFAULT_TTL)
+        with self._lock:
+            entry = self._entries.get((field, key))
+            return entry is None or self._clock() - entry.fetched_at >= ttl + stale_ttl
+
+    def peek(self, field: str, key: Hashable) -> Any:
+        """Return the last stored value regardless of age, or None."""
+        with self._lock:
+            entry = self._entries.get((field, key))
+            return entry.value if entry is not None else None
+
+    def invalidate(self, field: str, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop((field, key), None)
+            if field in self._recency:
+                self._recency[field].pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            for recency in self._recency.values():
+                recency.clear()
+            for name in self._counters:
+                self._counters[name] = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries), "in_flight": len(self._flights)}
+
+
+quote_cache = QuoteCache()
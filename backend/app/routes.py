@@ -1,8 +1,11 @@
-from decimal import Decimal
-import yfinance as yf
-from datetime import date, datetime, timezone
-
-from flask import Blueprint, jsonify, request
+import json
+import queue
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+from datetime import date, datetime, timedelta, timezone
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token,
@@ -12,24 +15,66 @@ from flask_jwt_extended import (
     set_refresh_cookies,
     unset_jwt_cookies,
 )
-
+from sqlalchemy import select
+
+from . import order_processor, upstream
+from .bar_store import bar_store, refresh_seconds
+from .chart_downsample import (
+    MAX_POINTS,
+    MIN_POINTS,
+    METHODS as DOWNSAMPLE_METHODS,
+    chart_cache,
+    downsample,
+)
+from .chart_format import bar_columns, bar_rows
 from .extensions import bcrypt, db
+from .fill_relay import fill_relay
+from .leader import leader
 from .market_data import (
+    SNAPSHOT_SECTIONS,
     fetch_basic_financials,
     fetch_chart,
     fetch_company_snapshot,
     fetch_forex_symbols,
     fetch_quote,
+    fetch_quotes,
     fetch_watchlist,
-    fetch_company_name,
     is_market_open,
-    search_stocks,
+    markets_open,
 )
-from .models import Account, Order, Position, RevokedToken, User, WatchlistItem  # PriceAlert commented out
+from .matching_engine import ORDER_TYPES, is_marketable, matching_engine
+from .models import Account, Lot, Order, Position, User, WatchlistItem  # PriceAlert commented out
+from .order_execution import (
+    LOT_METHODS,
+    FillRejected,
+    apply_buy_fill,
+    apply_sell_fill,
+    open_lots,
+    run_with_retry,
+    sell_from_lot,
+)
+from .portfolio_stream import portfolio_stream
+from .quote_cache import quote_cache
+from .security_master import company_names, record_security
+from .symbol_index import search_symbols, symbol_index
+from .token_blocklist import token_blocklist
+from .trigger_engine import trigger_book
+from .valuation_engine import valuation_engine
 from .websocket_manager import ws_manager
 
 api = Blueprint("api", __name__, url_prefix="/api")
 
+# /api/orders page size: default and cap
+ORDERS_PAGE_SIZE = 100
+ORDERS_PAGE_MAX = 500
+# Rows fetched per round trip when streaming an NDJSON export
+ORDERS_EXPORT_BATCH = 500
+# Most orders accepted by one /api/orders/batch call
+ORDERS_BATCH_MAX = 100
+
+# EventSource reconnect delay sent to /api/portfolio/stream clients
+STREAM_RETRY_MS = 3000
+
 
 def _normalize_watchlist_symbol(symbol: str) -> str:
     return symbol.strip().upper()
@@ -47,39 +92,37 @@ def _get_account_for_user(user_id: int) -> Account:
 
 
 def _account_summary(account: Account) -> dict:
-    equity_value = Decimal("0")
-    for position in account.positions.all():
-        quote = fetch_quote(position.symbol)
-        equity_value += Decimal(str(quote["price"])) * Decimal(position.quantity)
-    total_value = equity_value + account.cash_balance
-    return {
-        "id": account.id,
-        "starting_balance": float(account.starting_balance),
-        "cash_balance": float(account.cash_balance),
-        "equity_value": float(equity_value),
-        "total_value": float(total_value),
-    }
-
-def get_current_price(symbol: str) -> float:
-    """Get the current price for a symbol from the WebSocket cache or fetch from API"""
+    return valuation_engine.summary(account)
 
-    # Try WebSocket cache first
+def _fresh_ws_price(symbol: str) -> float:
+    """WebSocket price for a symbol if it was updated within the last 5 seconds, else 0.0"""
     ws_price = ws_manager.get_price(symbol)
 
     if ws_price and ws_price > 0:
         last_update = ws_manager.get_last_update(symbol)
 
-        if last_update and (datetime.now() - last_update).total_seconds() < 5:
+        if last_update and (datetime.now(timezone.utc) - last_update).total_seconds() < 5:
             return ws_price
+    return 0.0
+
+
+def get_current_price(symbol: str) -> float:
+    """Get the current price for a symbol from the WebSocket cache or the shared quote cache.
+
+    Used to price fills, so a quote served stale while upstream is failing counts as no price (0.0).
+    """
+
+    # Try WebSocket cache first
+    ws_price = _fresh_ws_price(symbol)
+    if ws_price:
+        return ws_price
 
     try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-        price = info.get("regularMarketPrice")
+        quote = fetch_quote(symbol)
+        if quote.get("stale"):
+            return 0.0
+        price = quote["price"]
         if price and price > 0:
-            # Update cache for next time
-            ws_manager.price_cache[symbol] = float(price)
-            ws_manager.last_update[symbol] = datetime.now()
             return float(price)
 
     except Exception as e:
@@ -87,9 +130,32 @@ def get_current_price(symbol: str) -> float:
         return 0.0
 
     # Simply return the cached price even if stale
+    ws_price = ws_manager.get_price(symbol)
     return ws_price if ws_price > 0 else 0.0
 
 
+def get_current_prices(symbols: list[str]) -> dict[str, float]:
+    """Batch form of get_current_price: fresh WebSocket prices first, one fetch_quotes call for the rest"""
+    prices = {}
+    missing = []
+    for symbol in symbols:
+        ws_price = _fresh_ws_price(symbol)
+        if ws_price:
+            prices[symbol] = ws_price
+        else:
+            missing.append(symbol)
+
+    # Valuation only, so a stale quote beats no price
+    quotes = fetch_quotes(missing, allow_stale=True) if missing else {}
+    for symbol in missing:
+        price = (quotes.get(symbol) or {}).get("price") or 0.0
+        if price <= 0:
+            # Fall back to the stale WebSocket price, if any
+            price = ws_manager.get_price(symbol)
+        prices[symbol] = float(price)
+    return prices
+
+
 @api.post("/auth/register")
 def register():
     payload = request.get_json() or {}
@@ -153,9 +219,7 @@ def _revoke_token_jti(jti, exp):
     if not jti:
         return
     expires_at = datetime.fromtimestamp(exp, tz=timezone.utc) if exp else datetime.now(timezone.utc)
-    if RevokedToken.query.filter_by(jti=jti).first() is None:
-        db.session.add(RevokedToken(jti=jti, expires_at=expires_at))
-        db.session.commit()
+    token_blocklist.revoke(jti, expires_at)
 
 
 @api.post("/auth/logout")
@@ -237,9 +301,19 @@ def remove_watchlist(symbol):
 
 @api.get("/market/<symbol>")
 def market_symbol(symbol):
+    # ?sections=quote,profile (or fields=) limits the payload, and the upstream work, to those sections
+    raw_sections = request.args.get("sections") or request.args.get("fields")
+    sections = None
+    if raw_sections:
+        sections = [section.strip() for section in raw_sections.split(",") if section.strip()]
+        unknown = [section for section in sections if section not in SNAPSHOT_SECTIONS]
+        if unknown:
+            return jsonify({"error": f"Unknown sections: {', '.join(unknown)}", "sections": list(SNAPSHOT_SECTIONS)}), 400
     try:
-        snapshot = fetch_company_snapshot(symbol)
+        snapshot = fetch_company_snapshot(symbol, sections)
         return jsonify({"data": snapshot})
+    except upstream.UpstreamUnavailable as exc:
+        return jsonify({"error": str(exc)}), 503
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
 
@@ -250,13 +324,25 @@ def account():
     account = _get_account_for_user(user_id)
     return jsonify({"account": _account_summary(account)})
 
-@api.get("/portfolio")
-@jwt_required()
-def portfolio():
-    user_id = int(get_jwt_identity())
-    account = _get_account_for_user(user_id)
+
+def _position_row(symbol: str, company_name: str, price, quantity, avg_price) -> dict:
+    unrealized = (Decimal(str(price)) - Decimal(str(avg_price))) * Decimal(str(quantity))
+    unrealized_percentage = unrealized / (Decimal(str(avg_price)) * Decimal(str(quantity))) * 100
+    return {
+        "symbol": symbol,
+        "company_name": company_name,
+        "market_price": round(float(price), 2),
+        "quantity": int(quantity),
+        "avg_price": float(avg_price),
+        "unrealized_pnl": round(float(unrealized), 2),
+        "unrealized_pnl_percentage": round(float(unrealized_percentage), 2),
+        "net_value": round(float(price) * int(quantity), 2),
+    }
+
+
+def _portfolio_payload(account: Account) -> dict:
     positions = Position.query.filter_by(account_id=account.id).all()
-    
+
     portfolio_payload = {
         "account_cash": float(account.cash_balance),
         "portfolio": []
@@ -266,24 +352,129 @@ def portfolio():
         if position.symbol not in ws_manager.subscribed_symbols:
             ws_manager.subscribe(position.symbol)
 
-        price = get_current_price(position.symbol)
-        company_name = fetch_company_name(position.symbol)
-        unrealized = (Decimal(str(price)) - Decimal(str(position.avg_price))) * Decimal(str(position.quantity))
-        unrealized_percentage = unrealized / (Decimal(str(position.avg_price)) * Decimal(str(position.quantity))) * 100
+    prices = get_current_prices([position.symbol for position in positions])
+    names = company_names([position.symbol for position in positions])
 
+    for position in positions:
         portfolio_payload["portfolio"].append(
-            {
-                "symbol": position.symbol,
-                "company_name": company_name,
-                "market_price": round(float(price), 2),
-                "quantity": int(position.quantity),
-                "avg_price": float(position.avg_price),
-                "unrealized_pnl": round(float(unrealized), 2),
-                "unrealized_pnl_percentage": round(float(unrealized_percentage), 2),
-                "net_value": round(float(price * position.quantity), 2),
-            }
+            _position_row(
+                position.symbol,
+                names.get(position.symbol, position.symbol),
+                prices[position.symbol],
+                position.quantity,
+                position.avg_price,
+            )
         )
-    return jsonify(portfolio_payload)
+    return portfolio_payload
+
+
+@api.get("/portfolio")
+@jwt_required()
+def portfolio():
+    user_id = int(get_jwt_identity())
+    account = _get_account_for_user(user_id)
+    return jsonify(_portfolio_payload(account))
+
+
+def _sse(event: str, data, event_id: Optional[str] = None) -> str:
+    message = f"event: {event}\n"
+    if event_id:
+        message += f"id: {event_id}\n"
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+@api.get("/portfolio/stream")
+@jwt_required()
+def portfolio_stream_events():
+    """Server-Sent Events feed of the portfolio.
+
+    Sends a ``snapshot`` event (the /api/portfolio payload) on connect and after
+    every fill, and a ``position`` event with the repriced row whenever a held
+    symbol ticks. Clients resume with Last-Event-ID (or ?last_event_id=).
+    """
+    user_id = int(get_jwt_identity())
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    account = _get_account_for_user(user_id)
+    account_id = account.id
+    symbols = [position.symbol for position in account.positions]
+
+    def load_rows() -> tuple[dict, dict]:
+        payload = _portfolio_payload(db.session.get(Account, account_id))
+        # Release the connection between events; the stream may stay open for hours
+        db.session.remove()
+        return payload, {row["symbol"]: row for row in payload["portfolio"]}
+
+    def generate():
+        # Subscribe before reading the portfolio so no fill can slip in between
+        subscriber, event_id, replay = portfolio_stream.subscribe(account_id, symbols, last_event_id)
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            snapshot, rows = load_rows()
+            pending = replay or []
+            if replay is None or any(kind == "fill" for kind, *_ in pending):
+                # New client, missed a fill or too much history: start from a snapshot
+                yield _sse("snapshot", snapshot, event_id)
+                pending = [item for item in pending if item[0] == "tick"]
+
+            while True:
+                if not pending:
+                    try:
+                        pending = [subscriber.queue.get(timeout=portfolio_stream.heartbeat_seconds)]
+                    except queue.Empty:
+                        yield ": heartbeat\n\n"
+                        continue
+                # Take whatever queued up meanwhile so ticks coalesce to one event per symbol
+                while True:
+                    try:
+                        pending.append(subscriber.queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                last_id = portfolio_stream.event_id(pending[-1][1])
+                if any(kind == "fill" for kind, *_ in pending):
+                    snapshot, rows = load_rows()
+                    portfolio_stream.set_symbols(subscriber, rows)
+                    yield _sse("snapshot", snapshot, last_id)
+                else:
+                    latest = {symbol: price for _, _, symbol, price in pending}
+                    for symbol, price in latest.items():
+                        row = rows.get(symbol)
+                        if row is None:
+                            continue
+                        rows[symbol] = _position_row(
+                            symbol, row["company_name"], price, row["quantity"], row["avg_price"]
+                        )
+                        yield _sse("position", rows[symbol], last_id)
+                pending = []
+        finally:
+            portfolio_stream.unsubscribe(subscriber)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _search_boosts() -> set[str]:
+    """Symbols the signed-in user holds or watches; empty for anonymous searches."""
+    from flask_jwt_extended import verify_jwt_in_request
+
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        return set()
+    if identity is None:
+        return set()
+    user_id = int(identity)
+    watched = db.session.query(WatchlistItem.symbol).filter_by(user_id=user_id)
+    held = (
+        db.session.query(Position.symbol)
+        .join(Account, Position.account_id == Account.id)
+        .filter(Account.user_id == user_id, Position.quantity > 0)
+    )
+    return {symbol for (symbol,) in watched.union(held)}
 
 
 @api.get("/search")
@@ -291,7 +482,9 @@ def search():
     q = (request.args.get("q") or "").strip()
     if not q:
         return jsonify({"results": []})
-    results = search_stocks(q, max_results=10)
+    if not symbol_index.built:
+        symbol_index.load()
+    results = search_symbols(q, max_results=10, boosted=_search_boosts())
     return jsonify({"results": results})
 
 
@@ -300,7 +493,18 @@ def quote():
     symbol = request.args.get("symbol", "").upper()
     if not symbol:
         return jsonify({"error": "Symbol required"}), 400
-    return jsonify(fetch_quote(symbol))
+    return jsonify(fetch_quote(symbol, allow_stale=True))
+
+
+def _max_points_arg() -> Optional[int]:
+    """The max_points query argument, capped at MAX_POINTS. Raises ValueError if invalid."""
+    raw = request.args.get("max_points")
+    if not raw:
+        return None
+    max_points = int(raw)
+    if max_points < MIN_POINTS:
+        raise ValueError(raw)
+    return min(max_points, MAX_POINTS)
 
 
 @api.get("/chart")
@@ -309,7 +513,13 @@ def chart():
     range_value = request.args.get("range", "1M").upper()
     if not symbol:
         return jsonify({"error": "Symbol required"}), 400
-    return jsonify(fetch_chart(symbol, range_value))
+    try:
+        max_points = _max_points_arg()
+    except ValueError:
+        return jsonify({"error": f"max_points must be an integer >= {MIN_POINTS}"}), 400
+    return jsonify(
+        fetch_chart(symbol, range_value, columnar=request.args.get("format") == "columns", max_points=max_points)
+    )
 
 
 @api.get("/stock/metric")
@@ -350,6 +560,21 @@ def stock_metric():
 #     return jsonify({"alert": {"id": alert.id, "symbol": symbol, "base_price": float(alert.base_price), "threshold_percent": float(threshold_percent)}}), 201
 
 
+@api.get("/metrics")
+def metrics():
+    """Process-local counters for monitoring."""
+    return jsonify({
+        "quote_cache": quote_cache.stats(),
+        "chart_cache": chart_cache.stats(),
+        "upstream": upstream.stats(),
+        "order_processor": order_processor.last_run_stats,
+        "scheduler": leader.stats(),
+        "fill_relay": fill_relay.stats(),
+        "token_blocklist": token_blocklist.stats(),
+        "valuation": {"accounts": len(valuation_engine), **valuation_engine.last_reconcile_stats},
+    })
+
+
 @api.get("/forex/symbol")
 def forex_symbol():
     exchange = request.args.get("exchange", "").lower()
@@ -358,71 +583,236 @@ def forex_symbol():
     return jsonify(fetch_forex_symbols(exchange))
 
 
-@api.post("/orders")
-@jwt_required()
-def create_order():
-    payload = request.get_json() or {}
-    symbol = payload.get("symbol", "").upper()
-    side = payload.get("side", "").upper()
-    quantity = int(payload.get("quantity", 0))
+def _parse_order(payload: dict) -> dict:
+    """Validate an order payload for /api/orders. Raises ValueError with the message for the client."""
+    symbol = str(payload.get("symbol") or "").strip().upper()
+    side = str(payload.get("side") or "").upper()
+    try:
+        quantity = int(payload.get("quantity", 0))
+    except (TypeError, ValueError):
+        quantity = 0
+    order_type = str(payload.get("order_type") or "MARKET").upper()
+    lot_method = str(payload.get("lot_method") or "FIFO").upper()
+
+    if not symbol or side not in {"BUY", "SELL"} or quantity <= 0 or order_type not in ORDER_TYPES:
+        raise ValueError("Invalid order payload")
+    if lot_method not in LOT_METHODS:
+        raise ValueError(f"lot_method must be one of {', '.join(LOT_METHODS)}")
+
+    trigger = None
+    if order_type != "MARKET":
+        price_field = "limit_price" if order_type == "LIMIT" else "stop_price"
+        try:
+            trigger = Decimal(str(payload.get(price_field)))
+        except (InvalidOperation, ValueError):
+            trigger = None
+        if trigger is None or not trigger.is_finite() or trigger <= 0:
+            raise ValueError(f"{price_field} must be a positive number")
 
-    if not symbol or side not in {"BUY", "SELL"} or quantity <= 0:
-        return jsonify({"error": "Invalid order payload"}), 400
+    return {
+        "symbol": symbol, "side": side, "quantity": quantity,
+        "order_type": order_type, "lot_method": lot_method, "trigger": trigger,
+    }
 
-    user_id = int(get_jwt_identity())
-    account = _get_account_for_user(user_id)
-    quote = fetch_quote(symbol)
-    price = Decimal(str(quote["price"]))
-    order_cost = price * Decimal(quantity)
 
-    market_open = is_market_open(symbol)
-    status = "FILLED" if market_open else "PENDING"
+def _price_order(spec: dict, quote: dict, market_open: bool) -> None:
+    """Add the fill price, whether it fills now, and the price its cash check uses.
 
-    if side == "BUY":
-        if account.cash_balance < order_cost:
-            return jsonify({"error": "Insufficient cash"}), 400
-    else:
-        position = account.positions.filter_by(symbol=symbol).first()
-        if not position or position.quantity < quantity:
-            return jsonify({"error": "Insufficient shares"}), 400
+    Raises ValueError for a quote that cannot price a fill (stale or missing).
+    """
+    if quote.get("stale") or not quote.get("price") or quote["price"] <= 0:
+        raise ValueError("Failed to get current price")
+    price = Decimal(str(quote["price"]))
+    trigger = spec["trigger"]
+    # LIMIT and STOP orders only fill now if the current price already qualifies
+    executable = market_open and (
+        trigger is None or is_marketable(spec["side"], spec["order_type"], float(trigger), float(price))
+    )
+    # A resting buy may fill above today's price, up to its limit or beyond its stop
+    check_price = price if executable or trigger is None else max(price, trigger)
+    spec.update(quote=quote, price=price, executable=executable, check_price=check_price)
 
-    if market_open:
-        position = account.positions.filter_by(symbol=symbol).first()
-        if side == "BUY":
-            account.cash_balance -= order_cost
-            if position:
-                total_shares = position.quantity + quantity
-                total_cost = (Decimal(position.avg_price) * Decimal(position.quantity)) + order_cost
-                position.avg_price = total_cost / Decimal(total_shares)
-                position.quantity = total_shares
-            else:
-                position = Position(
-                    account_id=account.id,
-                    symbol=symbol,
-                    quantity=quantity,
-                    avg_price=price,
-                )
-                db.session.add(position)
-        else:  # SELL
-            account.cash_balance += order_cost
-            position.quantity -= quantity
-            if position.quantity == 0:
-                db.session.delete(position)
 
+def _place_order(account: Account, spec: dict) -> Order:
+    """Add the order and fill it if it is executable. Runs inside the caller's transaction."""
+    symbol, side, quantity, price = spec["symbol"], spec["side"], spec["quantity"], spec["price"]
+    quote = spec["quote"]
     order = Order(
         account_id=account.id,
         symbol=symbol,
         side=side,
         quantity=quantity,
         price=price,
-        status=status,
+        status="FILLED" if spec["executable"] else "PENDING",
+        order_type=spec["order_type"],
+        limit_price=spec["trigger"] if spec["order_type"] == "LIMIT" else None,
+        stop_price=spec["trigger"] if spec["order_type"] == "STOP" else None,
         exchange=quote.get("exchange", ""),
         currency=quote.get("currency", ""),
+        lot_method=spec["lot_method"] if side == "SELL" else None,
     )
     db.session.add(order)
-    db.session.commit()
 
-    return jsonify({"order": order.to_dict(), "account": _account_summary(account)})
+    if spec["executable"]:
+        position = account.positions.filter_by(symbol=symbol).first()
+        if side == "BUY":
+            apply_buy_fill(account, position, symbol, quantity, price, order)
+        else:  # SELL
+            if not position:
+                raise FillRejected("Insufficient shares")
+            apply_sell_fill(account, position, quantity, price, order)
+            order.status_text = "CLOSED"
+    record_security(
+        symbol,
+        name=quote.get("name"),
+        exchange=quote.get("exchange"),
+        currency=quote.get("currency"),
+    )
+    return order
+
+
+def _rest_order(order: Order, spec: dict) -> Optional[str]:
+    """Hand a committed LIMIT/STOP order that did not fill to the matching engine. Returns the client message."""
+    if order.status != "PENDING" or spec["trigger"] is None:
+        return None
+    matching_engine.add(order.id, order.symbol, order.side, order.order_type, spec["trigger"])
+    if order.symbol not in ws_manager.subscribed_symbols:
+        ws_manager.subscribe(order.symbol)
+    return f"{order.order_type.title()} order resting at {spec['trigger']:.2f}."
+
+
+@api.post("/orders")
+@jwt_required()
+def create_order():
+    try:
+        spec = _parse_order(request.get_json() or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    user_id = int(get_jwt_identity())
+    account = _get_account_for_user(user_id)
+    symbol = spec["symbol"]
+    try:
+        _price_order(spec, fetch_quote(symbol), is_market_open(symbol))
+    except Exception as e:
+        print(f"Error pricing order for {symbol}: {e}")
+        return jsonify({"error": "Failed to get current price"}), 503
+
+    if spec["side"] == "BUY":
+        if account.cash_balance < spec["check_price"] * Decimal(spec["quantity"]):
+            return jsonify({"error": "Insufficient cash"}), 400
+    else:
+        position = account.positions.filter_by(symbol=symbol).first()
+        if not position or position.quantity < spec["quantity"]:
+            return jsonify({"error": "Insufficient shares"}), 400
+
+    # The checks above are advisory; a concurrent fill may have spent the cash or shares since
+    try:
+        order = run_with_retry(lambda: _place_order(account, spec))
+    except FillRejected as e:
+        db.session.rollback()
+        return jsonify({"error": e.reason}), 400
+
+    response_message = {"order": order.to_dict(), "account": _account_summary(account)}
+    message = _rest_order(order, spec)
+    if message:
+        response_message["message"] = message
+
+    return jsonify(response_message)
+
+
+@api.post("/orders/batch")
+@jwt_required()
+def create_orders_batch():
+    """Place a basket of orders, e.g. a rebalance, in one transaction: all of them or none.
+
+    Quotes and market state are resolved once per distinct symbol. Sells that
+    fill now fund the buys, and the basket is checked as a whole. Responds
+    with one result per order, in request order, and a single account summary.
+    A rejected basket gets a 400 whose results carry each order's error.
+    """
+    payload = request.get_json() or {}
+    items = payload.get("orders")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "orders must be a non-empty list"}), 400
+    if len(items) > ORDERS_BATCH_MAX:
+        return jsonify({"error": f"At most {ORDERS_BATCH_MAX} orders per batch"}), 400
+
+    specs = []
+    errors: list[Optional[str]] = []
+    for item in items:
+        try:
+            specs.append(_parse_order(item if isinstance(item, dict) else {}))
+            errors.append(None)
+        except ValueError as e:
+            specs.append(None)
+            errors.append(str(e))
+
+    def rejected(error: str, status: int = 400):
+        results = [{"error": message} if message else {} for message in errors]
+        return jsonify({"error": error, "results": results}), status
+
+    if any(errors):
+        return rejected("Invalid order payload")
+
+    user_id = int(get_jwt_identity())
+    account = _get_account_for_user(user_id)
+    symbols = list(dict.fromkeys(spec["symbol"] for spec in specs))
+    quotes = fetch_quotes(symbols)
+    open_by_symbol = markets_open(symbols)
+    for index, spec in enumerate(specs):
+        try:
+            _price_order(spec, quotes.get(spec["symbol"]) or {}, open_by_symbol[spec["symbol"]])
+        except ValueError as e:
+            errors[index] = str(e)
+    if any(errors):
+        return rejected("Failed to get current price", 503)
+
+    # Buying power of the whole basket; only sells that fill now add cash
+    held = {
+        position.symbol: position.quantity
+        for position in account.positions.filter(Position.symbol.in_(symbols))
+    }
+    selling = defaultdict(int)
+    cash = account.cash_balance
+    for spec in specs:
+        if spec["side"] == "SELL":
+            selling[spec["symbol"]] += spec["quantity"]
+            if spec["executable"]:
+                cash += spec["price"] * Decimal(spec["quantity"])
+        else:
+            cash -= spec["check_price"] * Decimal(spec["quantity"])
+    for index, spec in enumerate(specs):
+        if spec["side"] == "SELL" and selling[spec["symbol"]] > held.get(spec["symbol"], 0):
+            errors[index] = "Insufficient shares"
+        elif spec["side"] == "BUY" and cash < 0:
+            errors[index] = "Insufficient cash"
+    if any(errors):
+        return rejected(next(error for error in errors if error))
+
+    # Sells first so their proceeds are in the account before the buys debit it
+    sequence = sorted(range(len(specs)), key=lambda index: specs[index]["side"] != "SELL")
+
+    def place_basket():
+        orders = [None] * len(specs)
+        for index in sequence:
+            orders[index] = _place_order(account, specs[index])
+        return orders
+
+    try:
+        orders = run_with_retry(place_basket)
+    except FillRejected as e:
+        db.session.rollback()
+        return jsonify({"error": e.reason}), 400
+
+    results = []
+    for order, spec in zip(orders, specs):
+        result = {"order": order.to_dict()}
+        message = _rest_order(order, spec)
+        if message:
+            result["message"] = message
+        results.append(result)
+    return jsonify({"results": results, "account": _account_summary(account)})
 
 
 @api.get("/orders/pending")
@@ -434,10 +824,11 @@ def pending_orders():
         order for order in account.orders.order_by(Order.id.desc())
         if order.status == "PENDING"
     ]
+    names = company_names([order.symbol for order in pending])
     orders_payload = []
     for order in pending:
         d = order.to_dict()
-        d["company_name"] = fetch_company_name(order.symbol)
+        d["company_name"] = names.get(order.symbol, order.symbol)
         orders_payload.append(d)
     return jsonify({"orders": orders_payload})
 
@@ -447,8 +838,88 @@ def pending_orders():
 def orders():
     user_id = int(get_jwt_identity())
     account = _get_account_for_user(user_id)
-    orders_payload = [order.to_dict() for order in account.orders.order_by(Order.id.desc())]
-    return jsonify({"orders": orders_payload})
+    try:
+        query = _order_history_query(account.id)
+        limit = _orders_limit_arg()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if request.args.get("format") == "ndjson":
+        # Export: every matching order, newest first, streamed from a server-side cursor
+        if limit:
+            query = query.limit(limit)
+
+        def generate():
+            rows = db.session.execute(query.execution_options(yield_per=ORDERS_EXPORT_BATCH)).scalars()
+            for order in rows:
+                yield json.dumps(order.to_dict()) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    limit = limit or ORDERS_PAGE_SIZE
+    # One extra row tells us whether there is another page
+    page = db.session.execute(query.limit(limit + 1)).scalars().all()
+    has_more = len(page) > limit
+    page = page[:limit]
+    return jsonify({
+        "orders": [order.to_dict() for order in page],
+        "next_before_id": page[-1].id if has_more else None,
+    })
+
+
+def _orders_limit_arg() -> Optional[int]:
+    raw = request.args.get("limit")
+    if not raw:
+        return None
+    if not raw.isdigit() or int(raw) < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(int(raw), ORDERS_PAGE_MAX)
+
+
+def _datetime_arg(name: str) -> Optional[datetime]:
+    """An ISO date or datetime query argument as naive UTC, like the DateTime columns."""
+    raw = request.args.get(name)
+    if not raw:
+        return None
+    try:
+        value = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date or datetime")
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _order_history_query(account_id: int):
+    """Orders for /api/orders, newest first, keyset-paginated by ``before_id``. Raises ValueError on bad arguments."""
+    query = select(Order).where(Order.account_id == account_id)
+    before_id = request.args.get("before_id")
+    if before_id:
+        if not before_id.isdigit():
+            raise ValueError("before_id must be an order id")
+        query = query.where(Order.id < int(before_id))
+    symbol = request.args.get("symbol", "").strip().upper()
+    if symbol:
+        query = query.where(Order.symbol == symbol)
+    side = request.args.get("side", "").strip().upper()
+    if side:
+        if side not in ("BUY", "SELL"):
+            raise ValueError("side must be BUY or SELL")
+        query = query.where(Order.side == side)
+    status = request.args.get("status", "").strip().upper()
+    if status:
+        query = query.where(Order.status == status)
+    start = _datetime_arg("start")
+    if start:
+        query = query.where(Order.created_at >= start)
+    end = _datetime_arg("end")
+    if end:
+        if len(request.args["end"]) == 10:
+            # A bare date covers that whole day
+            query = query.where(Order.created_at < end + timedelta(days=1))
+        else:
+            query = query.where(Order.created_at <= end)
+    return query.order_by(Order.id.desc())
 
 
 @api.post("/sell")
@@ -469,8 +940,6 @@ def sell_stock():
     if current_price <= 0:
         return jsonify({"error": "Failed to get current price"}), 400
 
-    sale_value = Decimal(str(current_price)) * Decimal(str(quantity))
-
     account = _get_account_for_user(user_id)
     position = account.positions.filter_by(symbol=symbol).first()
     
@@ -478,38 +947,34 @@ def sell_stock():
     if not position or position.quantity < quantity:
         return jsonify({"error": "Insufficient shares"}), 400
 
-    # Get the original buy order to mark as closed
-    original_order = Order.query.filter_by(id=data.get("id")).first()
-    if not original_order:
-        return jsonify({"error": "Order not found"}), 404
+    # The lot to sell from: by lot_id, or by its buy order's id. Lots carried
+    # over without a buy order only have a lot_id
+    if data.get("lot_id") is not None:
+        lot = Lot.query.filter_by(id=data.get("lot_id"), account_id=account.id, symbol=symbol).first()
+        if not lot:
+            return jsonify({"error": "Lot not found"}), 404
+    else:
+        original_order = Order.query.filter_by(id=data.get("id"), account_id=account.id).first()
+        if not original_order:
+            return jsonify({"error": "Order not found"}), 404
+        lot = Lot.query.filter_by(buy_order_id=original_order.id).first()
+    lot_id = lot.id if lot else None
+
+    # Only execute the sale if market is open; otherwise the sell order is queued
+    def sell():
+        position = account.positions.filter_by(symbol=symbol).first()
+        if not position:
+            raise FillRejected("Insufficient shares")
+        return sell_from_lot(
+            account, position, db.session.get(Lot, lot_id) if lot_id else None,
+            quantity, Decimal(str(current_price)), market_open,
+        )
 
-    # Determine order status based on market hours
-    status = "FILLED" if market_open else "PENDING"
-
-    # Only execute the sale if market is open
-    if market_open:
-        account.cash_balance += sale_value
-        position.quantity -= quantity
-        if position.quantity == 0:
-            db.session.delete(position)
-        
-        # Mark original buy order as closed
-        original_order.status_text = "CLOSED"
-
-    # Create sell order record (regardless of market status)
-    sell_order = Order(
-        account_id=account.id,
-        symbol=symbol,
-        side="SELL",
-        quantity=quantity,
-        price=Decimal(str(current_price)),
-        status=status,
-        status_text="CLOSED" if market_open else "PENDING_CLOSE",
-        exchange=original_order.exchange,  # Inherit from original order
-        currency=original_order.currency,  # Inherit from original order
-    )
-    db.session.add(sell_order)
-    db.session.commit()
+    try:
+        sell_order = run_with_retry(sell)
+    except FillRejected as e:
+        db.session.rollback()
+        return jsonify({"error": e.reason}), 400
 
     response_message = {
         "order": sell_order.to_dict(), 
@@ -527,32 +992,37 @@ def sell_stock():
 def portfolio_breakdown(symbol):
     user_id = int(get_jwt_identity())
     account = _get_account_for_user(user_id)
-    order_history_with_symbol: list[Order] = Order.query.filter_by(account_id=account.id, symbol=symbol, side="BUY", status_text="OPEN", status="FILLED").all()
+    symbol = symbol.strip().upper()
+    lots = open_lots(account.id, symbol).all()
 
     order_history_payload = []
+    company_name = company_names([symbol]).get(symbol, symbol)
+    price = get_current_price(symbol) if lots else 0
+
+    for lot in lots:
+        # Lots backfilled from a bare position have no BUY order behind them
+        order = lot.buy_order
+        cost = Decimal(str(lot.price)) * Decimal(lot.remaining)
+        unrealized = Decimal(str(price)) * Decimal(lot.remaining) - cost
+        unrealized_percentage = unrealized / cost * 100 if cost else Decimal("0")
+        net_value = price * lot.remaining
 
-    for order in order_history_with_symbol:
-        price = get_current_price(order.symbol)
-        company_name = fetch_company_name(order.symbol)
-        unrealized = (Decimal(str(price)) - Decimal(str(order.price))) * Decimal(str(order.quantity))
-        unrealized_percentage = unrealized / (Decimal(str(order.price)) * Decimal(str(order.quantity))) * 100
-        net_value = price * order.quantity
-        
         order_history_payload.append({
-            "id": order.id,
-            "created_at": order.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-            "symbol": order.symbol,
+            "id": order.id if order else None,
+            "lot_id": lot.id,
+            "created_at": lot.opened_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "symbol": symbol,
             "company_name": company_name,
             "market_price": round(float(price), 2),
-            "quantity": int(order.quantity),
-            "price": float(order.price),
+            "quantity": int(lot.remaining),
+            "price": float(lot.price),
             "unrealized_pnl": round(float(unrealized), 2),
             "unrealized_pnl_percentage": round(float(unrealized_percentage), 2),
             "net_value": round(float(net_value), 2),
-            "stop_loss_price": float(order.stop_loss_price) if order.stop_loss_price else None,
-            "take_profit_price": float(order.take_profit_price) if order.take_profit_price else None,
-            "exchange": order.exchange,
-            "currency": order.currency,
+            "stop_loss_price": float(order.stop_loss_price) if order and order.stop_loss_price else None,
+            "take_profit_price": float(order.take_profit_price) if order and order.take_profit_price else None,
+            "exchange": order.exchange if order else None,
+            "currency": order.currency if order else None,
         })
 
     return jsonify({"order_history": order_history_payload})
@@ -571,6 +1041,11 @@ def set_thresholds():
     order.stop_loss_price = Decimal(str(payload.get("stop_loss_price")))
     order.take_profit_price = Decimal(str(payload.get("take_profit_price")))
     db.session.commit()
+    if order.status == "FILLED":
+        # Pending buys are indexed by the order processor once they fill
+        trigger_book.upsert(order.id, order.symbol, order.stop_loss_price, order.take_profit_price)
+    if order.symbol not in ws_manager.subscribed_symbols:
+        ws_manager.subscribe(order.symbol)
     return jsonify({"message": "Thresholds set successfully"}), 200
 
 @api.get("/market/status")
@@ -588,27 +1063,34 @@ def get_chart(symbol):
     interval = request.args.get('interval', '1d')
     start = request.args.get('start')
     end = request.args.get('end')
-
+    columnar = request.args.get('format') == 'columns'
+    method = request.args.get('downsample', 'lttb')
     try:
-        ticker = yf.Ticker(symbol)
+        max_points = _max_points_arg()
+    except ValueError:
+        return jsonify({'error': f'max_points must be an integer >= {MIN_POINTS}'}), 400
+    if method not in DOWNSAMPLE_METHODS:
+        return jsonify({'error': f"downsample must be one of {', '.join(DOWNSAMPLE_METHODS)}"}), 400
+    # Custom date range: use start/end, default end to today
+    end_date = (end if end else str(date.today())) if start else None
+
+    def load_chart_data():
         if start:
-            # Custom date range: use start/end, default end to today
-            end_date = end if end else str(date.today())
-            hist = ticker.history(start=start, end=end_date, interval=interval or '1d')
+            hist = bar_store.history(symbol, start=start, end=end_date, interval=interval or '1d')
         else:
-            hist = ticker.history(period=period, interval=interval)
-        
-        chart_data = []
-        for timestamp, row in hist.iterrows():
-            chart_data.append({
-                'time': int(timestamp.timestamp()),  # Unix timestamp
-                'open': float(row['Open']),
-                'high': float(row['High']),
-                'low': float(row['Low']),
-                'close': float(row['Close']),
-                'volume': int(row['Volume'])
-            })
-        
+            hist = bar_store.history(symbol, period=period, interval=interval)
+        if max_points:
+            hist = downsample(hist, max_points, method)
+        # Unix-second timestamps; format=columns returns {time: [...], open: [...], ...}
+        return bar_columns(hist) if columnar else bar_rows(hist)
+
+    try:
+        if max_points:
+            key = ('bars', symbol.upper(), period, interval, start, end_date, max_points, method, columnar)
+            chart_data = chart_cache.get(key, refresh_seconds(interval or '1d'), load_chart_data)
+        else:
+            chart_data = load_chart_data()
+
         return jsonify({
             'symbol': symbol,
             'period': period,
@@ -627,25 +1109,6 @@ def close_all_trades():
     symbol = data.get("symbol", "").upper()
     account = _get_account_for_user(user_id)
 
-    sell_orders = Order.query.filter_by(account_id=account.id, symbol=symbol, side="BUY", status_text="OPEN", status="FILLED").all()
-
-    # Create sell orders
-    for sell_order in sell_orders:
-        new_sell_order = Order(
-            account_id=account.id,
-            symbol=symbol,
-            side="SELL",
-            quantity=sell_order.quantity,
-            price=sell_order.price,
-            status="PENDING",
-            status_text="PENDING_CLOSE",
-            exchange=sell_order.exchange,
-            currency=sell_order.currency,
-        )
-        db.session.add(new_sell_order)
-        db.session.commit()
-
-    # Process sell orders
     market_open = is_market_open(symbol)
 
     # Get reliable current price for the sale
@@ -654,24 +1117,36 @@ def close_all_trades():
     if current_price <= 0:
         return jsonify({"error": "Failed to get current price"}), 400
 
-    total_quantity = sum(sell_order.quantity for sell_order in sell_orders)
-    sale_value = Decimal(str(current_price)) * Decimal(str(total_quantity))
+    # One sell per open lot; queued sells close the same lot when the processor fills them
+    price = Decimal(str(current_price))
 
-    position = account.positions.filter_by(symbol=symbol).first()
-    if not position or position.quantity < total_quantity:
-        return jsonify({"error": "Insufficient shares"}), 400
+    def close_lots():
+        lots = open_lots(account.id, symbol).all()
+        position = account.positions.filter_by(symbol=symbol).first()
+        if lots and (not position or position.quantity < sum(lot.remaining for lot in lots)):
+            raise FillRejected("Insufficient shares")
+        for lot in lots:
+            buy_order = lot.buy_order
+            sell_order = Order(
+                account_id=account.id,
+                symbol=symbol,
+                side="SELL",
+                quantity=lot.remaining,
+                price=price,
+                status="FILLED" if market_open else "PENDING",
+                status_text="CLOSED" if market_open else "PENDING_CLOSE",
+                exchange=buy_order.exchange if buy_order else None,
+                currency=buy_order.currency if buy_order else None,
+                lot_id=lot.id,
+            )
+            db.session.add(sell_order)
+            if market_open:
+                position = apply_sell_fill(account, position, lot.remaining, price, sell_order)
 
-    if market_open:
-        account.cash_balance += sale_value
-        position.quantity -= total_quantity
-        if position.quantity == 0:
-            db.session.delete(position)
-
-        # Get the original buy orders to mark as closed
-        original_buy_orders = Order.query.filter_by(account_id=account.id, symbol=symbol, side="BUY", status_text="OPEN", status="FILLED").all()
-        for original_buy_order in original_buy_orders:
-            original_buy_order.status_text = "CLOSED"
-            original_buy_order.status = "FILLED"
-            db.session.commit()
+    try:
+        run_with_retry(close_lots)
+    except FillRejected as e:
+        db.session.rollback()
+        return jsonify({"error": e.reason}), 400
 
     return jsonify({"message": "Sell orders created successfully", "account": _account_summary(account)})
\ No newline at end of file
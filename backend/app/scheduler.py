@@ -2,15 +2,52 @@ from datetime import datetime, timezone
 
 from flask_apscheduler import APScheduler
 from app.extensions import db
+from app.fill_relay import fill_relay
+from app.leader import leader
 from app.models import RevokedToken
+from app import order_processor
 from app.order_processor import process_pending_orders
+from app.security_master import refresh_securities
+from app.symbol_index import symbol_index
+from app.valuation_engine import valuation_engine
 # from app.price_alert_processor import process_price_alerts  # Price alerts disabled
 
 scheduler = APScheduler()
 
 
+def _prune_revoked_tokens():
+    deleted = db.session.query(RevokedToken).filter(
+        RevokedToken.expires_at < datetime.now(timezone.utc)
+    ).delete()
+    db.session.commit()
+    if deleted:
+        print(f"Pruned {deleted} expired revoked token(s)")
+
+
+def _prune_fill_events():
+    deleted = fill_relay.prune()
+    if deleted:
+        print(f"Pruned {deleted} relayed fill event(s)")
+
+
+def _refresh_securities():
+    updated = refresh_securities()
+    if updated:
+        print(f"Refreshed {updated} securities")
+
+
+def _process_pending_orders():
+    count = process_pending_orders()
+    print(f"Processed {count} pending orders: {order_processor.last_run_stats}")
+
+
 def init_scheduler(app):
-    """Initialize scheduler with Flask app"""
+    """Initialize scheduler with Flask app.
+
+    Jobs that write shared state go through leader.run, so only one process
+    runs them; jobs that rebuild this process's in-memory state run everywhere.
+    """
+    leader.start()
     scheduler.init_app(app)
     scheduler.start()
 
@@ -18,19 +55,39 @@ def init_scheduler(app):
     def prune_revoked_tokens():
         """Remove expired revoked tokens to keep table small"""
         with scheduler.app.app_context():
-            deleted = db.session.query(RevokedToken).filter(
-                RevokedToken.expires_at < datetime.now(timezone.utc)
-            ).delete()
-            db.session.commit()
-            if deleted:
-                print(f"Pruned {deleted} expired revoked token(s)")
+            leader.run('prune_revoked_tokens', _prune_revoked_tokens)
+
+    @scheduler.task('interval', id='prune_fill_events', minutes=10)
+    def prune_fill_events():
+        """Drop fill events every worker has relayed"""
+        with scheduler.app.app_context():
+            leader.run('prune_fill_events', _prune_fill_events)
+
+    @scheduler.task('interval', id='refresh_securities', hours=6)
+    def refresh_securities_job():
+        """Re-fetch stale company names, exchanges and sectors in bulk"""
+        with scheduler.app.app_context():
+            leader.run('refresh_securities', _refresh_securities)
+
+    @scheduler.task('interval', id='rebuild_symbol_index', minutes=10)
+    def rebuild_symbol_index_job():
+        """Pick up new securities and holdings in the search index and its ranking"""
+        with scheduler.app.app_context():
+            symbol_index.load()
+
+    @scheduler.task('interval', id='reconcile_valuations', minutes=1)
+    def reconcile_valuations_job():
+        """Rebuild in-memory account valuations from the database and fresh quotes"""
+        with scheduler.app.app_context():
+            drifted = valuation_engine.reconcile()
+            if drifted:
+                print(f"Corrected drifted valuations: {valuation_engine.last_reconcile_stats}")
 
     @scheduler.task('interval', id='process_pending_orders', minutes=1)
     def scheduled_job():
         """This automatically runs with app context"""
         with scheduler.app.app_context():
-            count = process_pending_orders()
-            print(f"Processed {count} pending orders")
+            leader.run('process_pending_orders', _process_pending_orders)
     
     # Price alerts disabled
     # @scheduler.task('interval', id='process_price_alerts', minutes=2)
@@ -0,0 +1,162 @@
+"""Security master: static per-symbol metadata (name, exchange, currency, sector).
+
+Reads come from an in-memory map backed by the ``securities`` table, so listing
+endpoints make no upstream calls for data that almost never changes. Symbols
+seen for the first time are filled lazily; the scheduler refreshes old rows in
+bulk via refresh_securities.
+"""
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .market_data import fetch_company_profiles
+from .models import Security
+
+# Rows older than this are re-fetched by refresh_securities
+REFRESH_AFTER = timedelta(days=7)
+# Rows still without a name (their lookup failed) are retried this often
+RETRY_AFTER = timedelta(days=1)
+# updated_at for rows no lookup has filled yet, so the next refresh picks them up
+_NEVER = datetime(1970, 1, 1)
+REFRESH_BATCH_SIZE = 200
+
+_FIELDS = ("name", "exchange", "currency", "sector", "industry", "website")
+
+_lock = threading.Lock()
+_securities: dict[str, dict] = {}
+
+
+def init_app(app) -> None:
+    """Drop the in-memory map; it is rebuilt from the app's database on demand."""
+    with _lock:
+        _securities.clear()
+
+
+def _utcnow() -> datetime:
+    # Naive UTC, like the other DateTime columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _normalize(symbols: Iterable[str]) -> list[str]:
+    return list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol))
+
+
+def _remember(row: Security) -> dict:
+    security = row.to_dict()
+    with _lock:
+        _securities[row.symbol] = security
+    return security
+
+
+def get_securities(symbols: Iterable[str]) -> dict[str, dict]:
+    """Metadata for many symbols: memory first, then one SELECT, then upstream for unseen symbols only."""
+    wanted = _normalize(symbols)
+    with _lock:
+        result = {symbol: _securities[symbol] for symbol in wanted if symbol in _securities}
+    missing = [symbol for symbol in wanted if symbol not in result]
+    if not missing:
+        return result
+
+    # On sessions of their own: this is a read helper, and must not flush, commit
+    # or roll back whatever the caller has pending on db.session
+    with Session(db.engine) as session:
+        for row in session.query(Security).filter(Security.symbol.in_(missing)).all():
+            result[row.symbol] = _remember(row)
+
+    unseen = [symbol for symbol in missing if symbol not in result]
+    if not unseen:
+        return result
+
+    # Symbols whose lookup fails still get a row; refresh_securities fills it in later
+    profiles = fetch_company_profiles(unseen)
+    rows = [
+        Security(
+            symbol=symbol,
+            updated_at=_utcnow() if profiles.get(symbol) else _NEVER,
+            **{field: profiles.get(symbol, {}).get(field) for field in _FIELDS},
+        )
+        for symbol in unseen
+    ]
+    with Session(db.engine, expire_on_commit=False) as session:
+        session.add_all(rows)
+        try:
+            session.commit()
+        except IntegrityError:
+            # Another request filled the same symbols first
+            session.rollback()
+            rows = session.query(Security).filter(Security.symbol.in_(unseen)).all()
+    for row in rows:
+        result[row.symbol] = _remember(row)
+    return result
+
+
+def get_security(symbol: str) -> dict:
+    return get_securities([symbol]).get(symbol.strip().upper(), {})
+
+
+def company_names(symbols: Iterable[str]) -> dict[str, str]:
+    """Display name per symbol, falling back to the symbol itself."""
+    return {
+        symbol: security.get("name") or symbol
+        for symbol, security in get_securities(symbols).items()
+    }
+
+
+def record_security(symbol: str, **fields: Optional[str]) -> None:
+    """Create the row for a symbol from data already in hand (e.g. a quote), without an upstream call.
+
+    Existing rows are left alone; refresh_securities owns updates. Does not commit.
+    """
+    symbol = symbol.strip().upper()
+    with _lock:
+        if symbol in _securities:
+            return
+    if Security.query.filter_by(symbol=symbol).first() is not None:
+        return
+    # An old updated_at makes the refresh job fill in sector, industry etc. on its next run
+    db.session.add(
+        Security(
+            symbol=symbol,
+            updated_at=_NEVER,
+            **{field: fields.get(field) or None for field in _FIELDS},
+        )
+    )
+
+
+def refresh_securities(batch_size: int = REFRESH_BATCH_SIZE) -> int:
+    """Re-fetch the stalest rows in one bulk fan-out. Returns the number of rows updated.
+
+    Rows whose lookup fails are marked as tried too, so they back off to RETRY_AFTER.
+    """
+    now = _utcnow()
+    rows = (
+        Security.query.filter(db.or_(
+            Security.updated_at < now - REFRESH_AFTER,
+            db.and_(Security.name.is_(None), Security.updated_at < now - RETRY_AFTER),
+        ))
+        .order_by(Security.updated_at)
+        .limit(batch_size)
+        .all()
+    )
+    if not rows:
+        return 0
+    profiles = fetch_company_profiles([row.symbol for row in rows])
+    updated = 0
+    for row in rows:
+        row.updated_at = now
+        profile = profiles.get(row.symbol)
+        if not profile:
+            continue
+        for field in _FIELDS:
+            value = profile.get(field)
+            if value:
+                setattr(row, field, value)
+        updated += 1
+    db.session.commit()
+    for row in rows:
+        _remember(row)
+    return updated
@@ -0,0 +1,286 @@
+"""In-process symbol / company-name index for /api/search typeahead.
+
+Built from the ``securities`` table, ranked by how many positions and
+watchlists hold each symbol, and rebuilt by the scheduler. Lookups use:
+
+- a prefix trie over the symbol and each word of the company name, where each
+  node keeps its TOP_K most popular entries, so a keystroke costs
+  O(len(query));
+- a trigram index for typos and mid-word matches when the prefixes come up
+  short.
+
+Requests only wait on upstream search when the index has no match at all.
+A short local answer is returned at once, and upstream is asked in the
+background so the index learns the symbols it missed. Learned symbols are
+also recorded in the security master, so rebuilds keep them. Upstream results
+are cached per query, so each query goes upstream at most once per quote_cache
+"search" TTL.
+"""
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from sqlalchemy import func
+
+from .extensions import db
+from .market_data import search_stocks
+from .models import Position, Security, WatchlistItem
+from .quote_cache import quote_cache
+from .security_master import record_security
+from .upstream import UpstreamUnavailable
+
+TOP_K = 32
+# Share of a query's trigrams a fuzzy match must contain
+FUZZY_MIN_SIMILARITY = 0.5
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Match tiers, best first
+_EXACT, _SYMBOL_PREFIX, _NAME_PREFIX, _FUZZY = range(4)
+
+
+class _Node:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: dict[str, "_Node"] = {}
+        self.ids: list[int] = []
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymbolIndex:
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._entries: list[dict] = []
+        self._ids: dict[str, int] = {}
+        self._popularity: list[int] = []
+        self._root = _Node()
+        self._grams: dict[str, set[int]] = {}
+        self.built = False
+
+    def init_app(self, app) -> None:
+        self.app = app
+        with self._lock:
+            self._reset()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # -- building ----------------------------------------------------------
+
+    def _keys(self, entry: dict) -> set[str]:
+        symbol = entry["symbol"].lower()
+        keys = {symbol, symbol.split(".")[0]}
+        keys.update(_WORD.findall((entry["longName"] or "").lower()))
+        return keys
+
+    def _rank(self, entry_id: int):
+        return (-self._popularity[entry_id], self._entries[entry_id]["symbol"])
+
+    def _index_locked(self, entry_id: int) -> None:
+        entry = self._entries[entry_id]
+        for key in self._keys(entry):
+            node = self._root
+            for char in key:
+                node = node.children.setdefault(char, _Node())
+                if entry_id not in node.ids:
+                    node.ids.append(entry_id)
+                    if len(node.ids) > TOP_K:
+                        node.ids.sort(key=self._rank)
+                        del node.ids[TOP_K:]
+        text = f"{entry['symbol']} {entry['longName'] or ''}".lower()
+        for gram in _trigrams(text):
+            self._grams.setdefault(gram, set()).add(entry_id)
+
+    def _add_locked(self, symbol: str, name: Optional[str], exchange: Optional[str], popularity: int = 0) -> bool:
+        symbol = symbol.strip().upper()
+        if not symbol or symbol in self._ids:
+            return False
+        entry_id = len(self._entries)
+        self._entries.append({
+            "symbol": symbol,
+            "shortName": name or symbol,
+            "longName": name or symbol,
+            "exchange": exchange or "",
+        })
+        self._ids[symbol] = entry_id
+        self._popularity.append(popularity)
+        self._index_locked(entry_id)
+        return True
+
+    def build(self, securities: Iterable[tuple], popularity: Optional[dict] = None) -> int:
+        """Replace the index with (symbol, name, exchange) rows. Returns the entry count."""
+        popularity = popularity or {}
+        rows = sorted(securities, key=lambda row: -popularity.get(row[0], 0))
+        with self._lock:
+            self._reset()
+            # Most popular first, so trie nodes fill up with the right TOP_K
+            for symbol, name, exchange in rows:
+                self._add_locked(symbol, name, exchange, popularity.get(symbol, 0))
+            stack = [self._root]
+            while stack:
+                node = stack.pop()
+                node.ids.sort(key=self._rank)
+                stack.extend(node.children.values())
+            self.built = True
+            return len(self._entries)
+
+    def load(self) -> int:
+        """Rebuild from the securities table and holdings. Needs an app context."""
+        popularity = Counter()
+        for model in (Position, WatchlistItem):
+            for symbol, count in db.session.query(model.symbol, func.count()).group_by(model.symbol):
+                popularity[symbol] += count
+        securities = db.session.query(Security.symbol, Security.name, Security.exchange).all()
+        # Held or watched symbols the security master has not seen yet
+        known = {symbol for symbol, _, _ in securities}
+        securities += [(symbol, None, None) for symbol in popularity if symbol not in known]
+        return self.build(securities, popularity)
+
+    def add(self, symbol: str, name: Optional[str] = None, exchange: Optional[str] = None) -> bool:
+        """Add one entry. Returns False if the symbol was already indexed."""
+        with self._lock:
+            return self._add_locked(symbol, name, exchange)
+
+    # -- lookup ------------------------------------------------------------
+
+    def _prefix_ids(self, prefix: str) -> list[int]:
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.ids
+
+    def _fuzzy_ids(self, text: str) -> list[int]:
+        grams = _trigrams(text)
+        counts = Counter()
+        for gram in grams:
+            counts.update(self._grams.get(gram, ()))
+        threshold = len(grams) * FUZZY_MIN_SIMILARITY
+        return [entry_id for entry_id, count in counts.most_common(TOP_K * 4) if count >= threshold]
+
+    def lookup(self, query: str, limit: int = 10, boosted: Iterable[str] = ()) -> list[dict]:
+        """Local matches, best first. ``boosted`` symbols (held or watchlisted) rank ahead of others."""
+        text = " ".join(_WORD.findall(query.lower()))
+        if not text:
+            return []
+        boosted = {symbol.upper() for symbol in boosted}
+        words = text.split()
+        tiers: dict[int, int] = {}
+
+        with self._lock:
+            exact = self._ids.get(query.strip().upper())
+            if exact is not None:
+                tiers[exact] = _EXACT
+            # Every word must prefix-match; rank by the entries of the first word's node
+            candidates = self._prefix_ids(words[0])
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                keys = self._keys(entry)
+                if all(any(key.startswith(word) for key in keys) for word in words[1:]):
+                    tier = _SYMBOL_PREFIX if entry["symbol"].lower().startswith(words[0]) else _NAME_PREFIX
+                    tiers.setdefault(entry_id, tier)
+            # Held / watched symbols may have fallen out of a busy node's TOP_K
+            for symbol in boosted:
+                entry_id = self._ids.get(symbol)
+                if entry_id is not None and entry_id not in tiers:
+                    if any(key.startswith(words[0]) for key in self._keys(self._entries[entry_id])):
+                        tiers[entry_id] = _NAME_PREFIX
+            if len(tiers) < limit and len(text) >= 3:
+                for entry_id in self._fuzzy_ids(text):
+                    tiers.setdefault(entry_id, _FUZZY)
+
+            ranked = sorted(
+                tiers,
+                key=lambda entry_id: (
+                    tiers[entry_id] != _EXACT,
+                    self._entries[entry_id]["symbol"] not in boosted,
+                    tiers[entry_id],
+                    *self._rank(entry_id),
+                ),
+            )
+            return [dict(self._entries[entry_id]) for entry_id in ranked[:limit]]
+
+
+symbol_index = SymbolIndex()
+
+
+# Background upstream lookups for short local answers; one at a time keeps typing bursts cheap
+_learn_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="symbol-search")
+_learning: set[str] = set()
+_learning_lock = threading.Lock()
+
+
+def _upstream_search(query: str, max_results: int) -> list[dict]:
+    """Upstream matches for a query (cached per query), added to the index and, in the background, the table."""
+    upstream = quote_cache.get(
+        "search", query.lower(), lambda: search_stocks(query, max_results=max_results), fallback=True
+    )
+    learned = [
+        quote for quote in upstream
+        if symbol_index.add(quote["symbol"], quote.get("longName"), quote.get("exchange"))
+    ]
+    if learned and symbol_index.app is not None:
+        _learn_pool.submit(_persist, learned)
+    return upstream
+
+
+def _persist(quotes: list[dict]) -> None:
+    """Record learned symbols in the security master, so symbol_index.load() keeps them."""
+    with symbol_index.app.app_context():
+        try:
+            for quote in quotes:
+                record_security(quote["symbol"], name=quote.get("longName"), exchange=quote.get("exchange"))
+            db.session.commit()
+        except Exception as e:
+            # e.g. another worker recorded the same symbol first; the next search learns it again
+            db.session.rollback()
+            print(f"Error recording learned symbols: {e}")
+
+
+def _learn(query: str, max_results: int) -> None:
+    try:
+        _upstream_search(query, max_results)
+    except Exception as e:
+        print(f"Error learning symbols for {query!r}: {e}")
+    finally:
+        with _learning_lock:
+            _learning.discard(query.lower())
+
+
+def search_symbols(query: str, max_results: int = 10, boosted: Iterable[str] = ()) -> list[dict]:
+    """Typeahead search: answered from the local index, upstream only when it has no match."""
+    query = (query or "").strip()
+    if not query:
+        return []
+    results = symbol_index.lookup(query, max_results, boosted)
+    if results:
+        if len(results) < max_results and quote_cache.needs_load("search", query.lower()):
+            with _learning_lock:
+                queued = query.lower() in _learning
+                _learning.add(query.lower())
+            if not queued:
+                _learn_pool.submit(_learn, query, max_results)
+        return results
+
+    try:
+        upstream = _upstream_search(query, max_results)
+    except UpstreamUnavailable:
+        return results
+    seen = set()
+    for quote in upstream:
+        if quote["symbol"] not in seen and len(results) < max_results:
+            results.append(quote)
+            seen.add(quote["symbol"])
+    return results
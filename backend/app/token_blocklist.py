@@ -0,0 +1,138 @@
+"""In-process view of the revoked_tokens table for the JWT blocklist check.
+
+Every authenticated request asks whether its JTI was revoked. Instead of a
+SELECT per request, each process keeps a 64-bit hash of each unexpired
+revoked JTI, so a miss is answered from memory. A hit goes to the database,
+because two JTIs can share a hash.
+
+Keeping processes in sync:
+
+- revoke() writes the row, adds the hash locally and touches a marker file.
+  Other workers on this host stat the marker on every check and re-sync as
+  soon as it changes.
+- Workers on other hosts never see the marker, so every process also
+  re-syncs at least every SYNC_SECONDS.
+- A sync reads rows revoked since the previous sync, minus SYNC_OVERLAP, so
+  rows that commit late are not missed.
+- The first check after startup loads every unexpired row.
+
+Entries are dropped once their token expires. Expired tokens fail signature
+validation before the blocklist is consulted.
+"""
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from .extensions import db
+from .models import RevokedToken
+from .price_table import default_path
+
+SYNC_SECONDS = 1.0
+SYNC_OVERLAP = timedelta(seconds=60)
+EVICT_SECONDS = 60.0
+
+
+def _hash(jti: str) -> int:
+    return int.from_bytes(hashlib.blake2b(jti.encode(), digest_size=8).digest(), "big")
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class TokenBlocklist:
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self.marker_path = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._expiry: dict[int, datetime] = {}  # JTI hash -> token expiry (naive UTC)
+        self._synced_at: Optional[datetime] = None  # DB time watermark of the last sync
+        self._next_sync = 0.0
+        self._next_evict = 0.0
+        self._marker = None
+        self._counters = {"checks": 0, "db_checks": 0, "revoked": 0, "syncs": 0}
+
+    def init_app(self, app) -> None:
+        self._reset()
+        self.marker_path = os.environ.get("REVOCATION_MARKER_PATH") or f"{default_path()}.revocations"
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def _read_marker(self):
+        try:
+            return os.stat(self.marker_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _touch_marker(self) -> None:
+        try:
+            with open(self.marker_path, "a"):
+                pass
+            os.utime(self.marker_path, ns=(time.time_ns(), time.time_ns()))
+        except OSError as e:
+            print(f"Could not signal token revocation to other workers: {e}")
+
+    def _sync(self) -> None:
+        """Pull revocations from the database. Needs an app context."""
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        query = db.session.query(RevokedToken.jti, RevokedToken.expires_at).filter(RevokedToken.expires_at > now)
+        if self._synced_at is not None:
+            query = query.filter(RevokedToken.revoked_at >= self._synced_at - SYNC_OVERLAP)
+        rows = query.all()
+        with self._lock:
+            for jti, expires_at in rows:
+                self._expiry[_hash(jti)] = _naive_utc(expires_at)
+            self._synced_at = now
+            self._counters["syncs"] += 1
+
+    def _evict(self) -> None:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        with self._lock:
+            for key in [key for key, expires_at in self._expiry.items() if expires_at <= now]:
+                del self._expiry[key]
+
+    def _refresh(self) -> None:
+        now = self._clock()
+        marker = self._read_marker()
+        if self._synced_at is None or marker != self._marker or now >= self._next_sync:
+            # Read the marker before syncing so a revocation during the sync triggers another
+            self._marker = marker
+            self._next_sync = now + SYNC_SECONDS
+            self._sync()
+        if now >= self._next_evict:
+            self._next_evict = now + EVICT_SECONDS
+            self._evict()
+
+    def is_revoked(self, jti: str) -> bool:
+        """Needs an app context. Only hash hits cost a database query."""
+        self._counters["checks"] += 1
+        self._refresh()
+        if _hash(jti) not in self._expiry:
+            return False
+        self._counters["db_checks"] += 1
+        return db.session.query(RevokedToken.id).filter_by(jti=jti).first() is not None
+
+    def revoke(self, jti: str, expires_at: datetime) -> None:
+        """Record a revoked token in the database and in every worker. Needs an app context."""
+        if RevokedToken.query.filter_by(jti=jti).first() is None:
+            db.session.add(RevokedToken(jti=jti, expires_at=expires_at))
+            db.session.commit()
+        with self._lock:
+            self._expiry[_hash(jti)] = _naive_utc(expires_at)
+            self._counters["revoked"] += 1
+        self._touch_marker()
+
+    def stats(self) -> dict:
+        return {**self._counters, "entries": len(self._expiry)}
+
+
+token_blocklist = TokenBlocklist()
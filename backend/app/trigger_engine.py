@@ -0,0 +1,175 @@
+"""Tick-driven stop-loss / take-profit execution.
+
+Thresholds set on filled BUY orders are kept in per-symbol PriceLevels, so each
+tick from ws_manager only touches the triggers it crosses. Crossed orders are
+sold through order_execution.sell_against_buy_order, the same path as /api/sell.
+The book is rebuilt from the database on startup.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import update
+
+from . import market_data
+from .extensions import db
+from .models import Account, Lot, Order
+from .order_execution import FillRejected, run_with_retry, sell_against_buy_order
+from .price_levels import PriceLevels
+from .websocket_manager import ws_manager
+
+STOP_LOSS = "STOP_LOSS"
+TAKE_PROFIT = "TAKE_PROFIT"
+
+
+class TriggerBook:
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        # Stop-losses fire when price <= trigger, take-profits when price >= trigger
+        self._stop_losses: dict[str, PriceLevels] = {}
+        self._take_profits: dict[str, PriceLevels] = {}
+        self._symbols: dict[int, str] = {}
+        # Fills run off the WebSocket thread, one at a time
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="triggers")
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self.clear()
+        ws_manager.add_listener(self.on_tick)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stop_losses.clear()
+            self._take_profits.clear()
+            self._symbols.clear()
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def load(self) -> int:
+        """Rebuild the book from open BUY orders with thresholds. Needs an app context."""
+        orders = Order.query.filter(
+            Order.side == "BUY",
+            Order.status == "FILLED",
+            Order.status_text == "OPEN",
+            db.or_(Order.stop_loss_price.isnot(None), Order.take_profit_price.isnot(None)),
+        ).all()
+        self.clear()
+        for order in orders:
+            self.upsert(order.id, order.symbol, order.stop_loss_price, order.take_profit_price)
+        return len(orders)
+
+    def symbols(self) -> set[str]:
+        with self._lock:
+            return set(self._symbols.values())
+
+    def upsert(
+        self,
+        order_id: int,
+        symbol: str,
+        stop_loss_price: Optional[Decimal],
+        take_profit_price: Optional[Decimal],
+    ) -> None:
+        with self._lock:
+            self._remove_locked(order_id)
+            if stop_loss_price:
+                self._stop_losses.setdefault(symbol, PriceLevels()).add(order_id, float(stop_loss_price))
+            if take_profit_price:
+                self._take_profits.setdefault(symbol, PriceLevels()).add(order_id, float(take_profit_price))
+            if stop_loss_price or take_profit_price:
+                self._symbols[order_id] = symbol
+
+    def remove(self, order_id: int) -> None:
+        with self._lock:
+            self._remove_locked(order_id)
+
+    def _remove_locked(self, order_id: int) -> None:
+        symbol = self._symbols.pop(order_id, None)
+        if symbol is None:
+            return
+        for book in (self._stop_losses, self._take_profits):
+            levels = book.get(symbol)
+            if levels is not None:
+                levels.remove(order_id)
+
+    def crossed(self, symbol: str, price: float) -> list[tuple[int, str]]:
+        """Pop and return (order_id, reason) for every trigger this price crosses."""
+        with self._lock:
+            stop_losses = self._stop_losses.get(symbol)
+            take_profits = self._take_profits.get(symbol)
+            fired = []
+            if stop_losses:
+                fired += [(order_id, STOP_LOSS) for order_id in stop_losses.pop_at_or_above(price)]
+            if take_profits:
+                fired += [(order_id, TAKE_PROFIT) for order_id in take_profits.pop_at_or_below(price)]
+            for order_id, _ in fired:
+                # An order has at most one exit; drop its other threshold too
+                self._remove_locked(order_id)
+            return fired
+
+    def on_tick(self, symbol: str, price: float) -> None:
+        """ws_manager listener: O(log n) lookup here, fills on the executor thread."""
+        fired = self.crossed(symbol, price)
+        if fired and self.app is not None:
+            self._executor.submit(self._execute_in_app, fired, price)
+
+    def _execute_in_app(self, fired: list[tuple[int, str]], price: float) -> None:
+        with self.app.app_context():
+            try:
+                self.execute(fired, price)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error executing price triggers {fired}: {e}")
+
+    def execute(self, fired: list[tuple[int, str]], price: float) -> list[Order]:
+        """Sell the shares of each fired BUY order. Needs an app context. Returns the sell orders."""
+        sell_orders = []
+        for order_id, reason in fired:
+            buy_order = db.session.get(Order, order_id)
+            # The order may have been sold or closed since it was indexed
+            if not buy_order or buy_order.status != "FILLED" or buy_order.status_text != "OPEN":
+                continue
+            account = db.session.get(Account, buy_order.account_id)
+            position = account.positions.filter_by(symbol=buy_order.symbol).first() if account else None
+            if not position:
+                continue
+            market_open = market_data.is_market_open(buy_order.symbol)
+
+            def sell():
+                # Every worker keeps a book and may fire the same order; the first to clear its thresholds sells
+                claimed = db.session.execute(
+                    update(Order)
+                    .where(
+                        Order.id == buy_order.id,
+                        db.or_(Order.stop_loss_price.isnot(None), Order.take_profit_price.isnot(None)),
+                    )
+                    .values(stop_loss_price=None, take_profit_price=None)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                if not claimed:
+                    return None
+                position = account.positions.filter_by(symbol=buy_order.symbol).first()
+                lot = Lot.query.filter_by(buy_order_id=buy_order.id).first()
+                if not position:
+                    raise FillRejected("Insufficient shares")
+                quantity = min(lot.remaining if lot else buy_order.quantity, position.quantity)
+                return sell_against_buy_order(
+                    account, position, buy_order, quantity, Decimal(str(price)), market_open
+                )
+
+            try:
+                sell_order = run_with_retry(sell)
+            except FillRejected:
+                # Another sell took the shares first
+                db.session.rollback()
+                continue
+            if sell_order is None:
+                continue
+            print(f"{reason} triggered for order {order_id} ({buy_order.symbol} @ {price:.2f})")
+            sell_orders.append(sell_order)
+        return sell_orders
+
+
+trigger_book = TriggerBook()
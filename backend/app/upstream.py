@@ -0,0 +1,291 @@
+"""Shared HTTP plumbing for every upstream (Yahoo) call.
+
+One pooled ``requests.Session`` serves yfinance and the direct search
+fallback, so connections, TLS sessions and Yahoo's cookie/crumb are reused
+instead of renegotiated on every call. The session retries connection errors
+and 5xx responses with jittered backoff, and caps every request at
+UPSTREAM_TIMEOUT.
+
+Every request also passes through a global token bucket (``limiter``) and a
+circuit breaker (``breaker``). When Yahoo throttles or fails repeatedly, the
+breaker opens and requests raise UpstreamUnavailable at once instead of
+holding a worker thread until they time out. Callers fall back to the last
+good data (see QuoteCache.get).
+
+``ticker(symbol, max_age)`` hands out ``yf.Ticker`` objects from a small LRU.
+A Ticker caches ``info``, ``fast_info`` and ``calendar`` internally, so callers
+say how old those may be: quote paths use the default TICKER_MAX_AGE, and
+reference-data paths pass REFERENCE_MAX_AGE.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import requests
+import yfinance as yf
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) seconds; longer timeouts requested by callers are clamped
+UPSTREAM_TIMEOUT = (3.05, float(os.environ.get("UPSTREAM_READ_TIMEOUT", "10")))
+# Keep-alive connections per upstream host; sized for gunicorn threads plus fan-out pools
+UPSTREAM_POOL_SIZE = int(os.environ.get("UPSTREAM_POOL_SIZE", "32"))
+UPSTREAM_RETRIES = 2
+
+# Token bucket shared by all upstream requests in this process
+UPSTREAM_RATE = float(os.environ.get("UPSTREAM_RATE", "10"))  # requests per second
+UPSTREAM_BURST = int(os.environ.get("UPSTREAM_BURST", "20"))
+# Requests that would wait longer than this for a token fail instead
+UPSTREAM_MAX_WAIT = 2.0
+
+# Consecutive failed requests that open the breaker, and how long it stays open
+BREAKER_FAILURES = 5
+BREAKER_RESET_SECONDS = 30.0
+
+TICKER_CACHE_SIZE = 512
+# How stale a reused Ticker's cached info may be, in seconds
+TICKER_MAX_AGE = 5.0
+REFERENCE_MAX_AGE = 60 * 60.0
+
+# Older yfinance releases have no Search; market_data falls back to the raw endpoint
+HAS_SEARCH = hasattr(yf, "Search")
+
+
+class UpstreamUnavailable(requests.ConnectionError):
+    """Raised without contacting upstream: the breaker is open or the limiter queue is full."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float = UPSTREAM_RATE, burst: int = UPSTREAM_BURST,
+                 max_wait: float = UPSTREAM_MAX_WAIT, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self._clock = clock
+        self._sleep = sleep
+        self._reset()
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = self._clock()
+        self._waiting = 0
+        self._counters = {"granted": 0, "delayed": 0, "rejected": 0}
+
+    def acquire(self) -> None:
+        """Take a token, sleeping until one is due. Raises UpstreamUnavailable past max_wait."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens may go negative: each waiter reserves its slot in the queue
+            wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+            if wait > self.max_wait:
+                self._counters["rejected"] += 1
+                raise UpstreamUnavailable("upstream rate limit queue is full")
+            self._tokens -= 1
+            self._counters["granted"] += 1
+            if not wait:
+                return
+            self._counters["delayed"] += 1
+            self._waiting += 1
+        try:
+            self._sleep(wait)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "waiting": self._waiting, "tokens": round(self._tokens, 2)}
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failures`` consecutive failures -> half-open after ``reset_seconds``.
+
+    Half-open lets a single probe request through; its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS,
+                 clock=time.monotonic):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._reset()
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._counters = {"opened": 0, "short_circuited": 0}
+
+    def before(self) -> None:
+        with self._lock:
+            if self.state == "open" and self._clock() - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+            if self.state == "closed":
+                return
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return
+            self._counters["short_circuited"] += 1
+        raise UpstreamUnavailable("upstream circuit breaker is open")
+
+    def release(self) -> None:
+        with self._lock:
+            self._probing = False
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            self._probing = False
+            if ok:
+                self.state = "closed"
+                self._consecutive = 0
+                return
+            self._consecutive += 1
+            if self.state == "half_open" or self._consecutive >= self.failures:
+                if self.state != "open":
+                    self._counters["opened"] += 1
+                self.state = "open"
+                self._opened_at = self._clock()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {**self._counters, "state": self.state, "consecutive_failures": self._consecutive}
+            if self.state == "open":
+                stats["retry_in"] = round(max(0.0, self._opened_at + self.reset_seconds - self._clock()), 1)
+            return stats
+
+
+limiter = TokenBucket()
+breaker = CircuitBreaker()
+
+
+class _UpstreamSession(requests.Session):
+    def request(self, method, url, **kwargs):
+        timeout = kwargs.get("timeout")
+        if timeout is None or (isinstance(timeout, (int, float)) and timeout > UPSTREAM_TIMEOUT[1]):
+            kwargs["timeout"] = UPSTREAM_TIMEOUT
+        breaker.before()
+        try:
+            limiter.acquire()
+        except UpstreamUnavailable:
+            breaker.release()  # nothing was sent, so no outcome to record
+            raise
+        try:
+            response = super().request(method, url, **kwargs)
+        except requests.RequestException:
+            breaker.record(False)
+            raise
+        breaker.record(response.status_code != 429 and response.status_code < 500)
+        return response
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=UPSTREAM_RETRIES,
+        connect=UPSTREAM_RETRIES,
+        read=1,
+        status=UPSTREAM_RETRIES,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        backoff_factor=0.25,
+        backoff_jitter=0.25,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=UPSTREAM_POOL_SIZE, max_retries=retry)
+    http = _UpstreamSession()
+    http.mount("https://", adapter)
+    http.mount("http://", adapter)
+    return http
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def session() -> requests.Session:
+    """The process-wide pooled session, created on first use (and again after a fork)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def _reset_after_fork() -> None:
+    # Pooled sockets and locks must not be shared with a forked child
+    global _session, _session_lock
+    _session = None
+    _session_lock = threading.Lock()
+    tickers._reset()
+    limiter._reset()
+    breaker._reset()
+
+
+class TickerRegistry:
+    """LRU of ``yf.Ticker`` objects keyed by symbol, each bound to the shared session."""
+
+    def __init__(self, size: int = TICKER_CACHE_SIZE, clock=time.monotonic):
+        self._size = size
+        self._clock = clock
+        self._reset()
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._tickers: "OrderedDict[str, tuple[float, yf.Ticker]]" = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0}
+
+    def get(self, symbol: str, max_age: float = TICKER_MAX_AGE) -> yf.Ticker:
+        now = self._clock()
+        with self._lock:
+            entry = self._tickers.get(symbol)
+            if entry is not None and now - entry[0] <= max_age:
+                self._tickers.move_to_end(symbol)
+                self._counters["hits"] += 1
+                return entry[1]
+            self._counters["misses"] += 1
+        ticker = yf.Ticker(symbol, session=session())
+        with self._lock:
+            self._tickers[symbol] = (now, ticker)
+            self._tickers.move_to_end(symbol)
+            while len(self._tickers) > self._size:
+                self._tickers.popitem(last=False)
+        return ticker
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tickers.clear()
+            for name in self._counters:
+                self._counters[name] = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "tickers": len(self._tickers)}
+
+
+tickers = TickerRegistry()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def stats() -> dict:
+    return {"breaker": breaker.stats(), "limiter": limiter.stats(), "tickers": tickers.stats()}
+
+
+def ticker(symbol: str, max_age: float = TICKER_MAX_AGE) -> yf.Ticker:
+    return tickers.get(symbol, max_age)
+
+
+def search(query: str, max_results: int) -> yf.Search:
+    return yf.Search(query, max_results=max_results, enable_fuzzy_query=True, session=session())
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return session().get(url, **kwargs)
@@ -0,0 +1,197 @@
+"""Incrementally maintained equity and unrealized P&L per account.
+
+An account's positions and last prices are loaded once, the first time its
+summary is asked for. After that, ticks from ws_manager and committed fills
+from order_execution adjust equity and P&L in place, so a summary is an O(1)
+read. Cash always comes from the Account row the caller already holds.
+
+reconcile() reloads every tracked account from the database with fresh quotes
+and corrects any drift (e.g. fills applied by another worker process).
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from . import market_data
+from .models import Account, Position
+from .order_execution import Fill, add_fill_listener
+from .websocket_manager import ws_manager
+
+ZERO = Decimal("0")
+
+
+class AccountValuation:
+    __slots__ = ("positions", "prices", "equity_value", "cost_basis")
+
+    def __init__(self):
+        self.positions: dict[str, tuple[int, Decimal]] = {}  # symbol -> (quantity, avg_price)
+        self.prices: dict[str, Decimal] = {}
+        self.equity_value = ZERO
+        self.cost_basis = ZERO
+
+    def set_position(self, symbol: str, quantity: int, avg_price: Decimal, price: Decimal) -> None:
+        old_quantity, old_avg = self.positions.get(symbol, (0, ZERO))
+        old_price = self.prices.get(symbol, ZERO)
+        self.equity_value -= old_price * old_quantity
+        self.cost_basis -= old_avg * old_quantity
+        if quantity:
+            self.positions[symbol] = (quantity, avg_price)
+            self.prices[symbol] = price
+            self.equity_value += price * quantity
+            self.cost_basis += avg_price * quantity
+        else:
+            self.positions.pop(symbol, None)
+            self.prices.pop(symbol, None)
+
+    def reprice(self, symbol: str, price: Decimal) -> None:
+        quantity, _ = self.positions[symbol]
+        self.equity_value += (price - self.prices[symbol]) * quantity
+        self.prices[symbol] = price
+
+    @property
+    def unrealized_pnl(self) -> Decimal:
+        return self.equity_value - self.cost_basis
+
+
+class ValuationEngine:
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._accounts: dict[int, AccountValuation] = {}
+        self._holders: dict[str, set[int]] = {}  # symbol -> account ids holding it
+        self.last_reconcile_stats: dict = {}
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self.clear()
+        ws_manager.add_listener(self.on_tick)
+        add_fill_listener(self.on_fills)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._accounts.clear()
+            self._holders.clear()
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def _build(self, account: Account) -> AccountValuation:
+        """Value an account from its positions and one batch of quotes. Needs an app context."""
+        positions = account.positions.all()
+        quotes = market_data.fetch_quotes([position.symbol for position in positions], allow_stale=True)
+        valuation = AccountValuation()
+        for position in positions:
+            quote = quotes.get(position.symbol)
+            avg_price = Decimal(position.avg_price)
+            # Value at cost when the quote is unavailable rather than failing the whole summary
+            price = Decimal(str(quote["price"])) if quote else avg_price
+            valuation.set_position(position.symbol, position.quantity, avg_price, price)
+        return valuation
+
+    def _store_locked(self, account_id: int, valuation: AccountValuation) -> None:
+        previous = self._accounts.get(account_id)
+        if previous is not None:
+            for symbol in previous.positions:
+                self._holders.get(symbol, set()).discard(account_id)
+        self._accounts[account_id] = valuation
+        for symbol in valuation.positions:
+            self._holders.setdefault(symbol, set()).add(account_id)
+
+    def summary(self, account: Account) -> dict:
+        """The account summary returned by /api/account and the order endpoints."""
+        with self._lock:
+            valuation = self._accounts.get(account.id)
+            if valuation is not None:
+                return self._summary_locked(account, valuation)
+
+        valuation = self._build(account)
+        with self._lock:
+            # Another request may have loaded the account meanwhile
+            current = self._accounts.get(account.id)
+            if current is None:
+                self._store_locked(account.id, valuation)
+                current = valuation
+            return self._summary_locked(account, current)
+
+    @staticmethod
+    def _summary_locked(account: Account, valuation: AccountValuation) -> dict:
+        cash_balance = Decimal(account.cash_balance)
+        return {
+            "id": account.id,
+            "starting_balance": float(account.starting_balance),
+            "cash_balance": float(cash_balance),
+            "equity_value": float(valuation.equity_value),
+            "unrealized_pnl": float(valuation.unrealized_pnl),
+            "total_value": float(valuation.equity_value + cash_balance),
+        }
+
+    def on_tick(self, symbol: str, price: float) -> None:
+        """ws_manager listener: reprice the symbol for every tracked account holding it."""
+        with self._lock:
+            holders = self._holders.get(symbol)
+            if not holders:
+                return
+            price = Decimal(str(price))
+            for account_id in holders:
+                self._accounts[account_id].reprice(symbol, price)
+
+    def on_fills(self, fills: list[Fill]) -> None:
+        """order_execution listener: apply committed position changes of tracked accounts."""
+        with self._lock:
+            for fill in fills:
+                valuation = self._accounts.get(fill.account_id)
+                if valuation is None:
+                    continue
+                # Keep the last traded price for a held symbol; the fill price is the best we have for a new one
+                price = valuation.prices.get(fill.symbol, fill.price)
+                valuation.set_position(fill.symbol, fill.quantity, fill.avg_price, price)
+                if fill.quantity:
+                    self._holders.setdefault(fill.symbol, set()).add(fill.account_id)
+                else:
+                    self._holders.get(fill.symbol, set()).discard(fill.account_id)
+
+    def reconcile(self) -> int:
+        """Rebuild every tracked account from the database. Needs an app context.
+
+        Returns the number of accounts whose equity had drifted by more than a cent.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            account_ids = list(self._accounts)
+        if not account_ids:
+            return 0
+        accounts = Account.query.filter(Account.id.in_(account_ids)).all()
+        symbols = {
+            symbol
+            for (symbol,) in Position.query.with_entities(Position.symbol)
+            .filter(Position.account_id.in_(account_ids))
+            .distinct()
+        }
+        # Warm the quote cache with one batch so the per-account rebuilds below hit it
+        market_data.fetch_quotes(list(symbols), allow_stale=True)
+
+        drifted = 0
+        for account in accounts:
+            valuation = self._build(account)
+            with self._lock:
+                previous = self._accounts.get(account.id)
+                if previous is not None and abs(previous.equity_value - valuation.equity_value) > Decimal("0.01"):
+                    drifted += 1
+                self._store_locked(account.id, valuation)
+        with self._lock:
+            # Accounts deleted since they were loaded
+            for account_id in set(account_ids) - {account.id for account in accounts}:
+                self._store_locked(account_id, AccountValuation())
+                self._accounts.pop(account_id, None)
+
+        self.last_reconcile_stats = {
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "accounts": len(accounts),
+            "drifted": drifted,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        return drifted
+
+
+valuation_engine = ValuationEngine()
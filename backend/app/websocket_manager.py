@@ -1,8 +1,32 @@
+"""Live prices from the yfinance WebSocket.
+
+With several gunicorn workers, exactly one process per host (the feeder,
+whoever holds the feeder lock) owns the WebSocket and publishes every tick
+into the SharedPriceTable. The other workers read prices from the table
+without locking and poll it to drive their own tick listeners. If the feeder
+dies, or its WebSocket does, its lock is released and a worker (possibly the
+same one) takes over within FEEDER_RETRY_SECONDS.
+
+A symbol the table cannot hold (full, or too long) is logged and skipped: it
+gets no live price, and callers fall back to REST quotes.
+
+Before start() (e.g. in tests) prices live in the per-process dicts only.
+"""
 import asyncio
+import fcntl
+import os
 import threading
+import time
 import yfinance as yf
 from datetime import datetime, timezone
-from typing import Set, Dict, Optional
+from typing import Callable, Set, Dict, List, Optional
+
+from .price_table import SharedPriceTable, default_path
+
+# How often non-feeder workers poll the table for ticks
+TAIL_INTERVAL_SECONDS = 0.05
+# How often a standby worker tries to take over the feed, and the feeder checks for new symbols
+FEEDER_RETRY_SECONDS = 1.0
 
 # Singleton pattern for the app instances' websocket connection
 
@@ -28,8 +52,24 @@ class WebSocketPriceManager:
         self.ws = None
         self.running = False
         self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listeners: List[Callable[[str, float], None]] = []
+        self.table: Optional[SharedPriceTable] = None
+        self.is_feeder = False
+        self._feeder_lock = None
         self._initialized = True
 
+    def _dispatch(self, symbol: str, price: float):
+        for listener in list(self._listeners):
+            try:
+                listener(symbol, price)
+            except Exception as e:
+                print(f"Tick listener error for {symbol}: {e}")
+
+    def add_listener(self, listener: Callable[[str, float], None]):
+        """Call listener(symbol, price) on every tick. Listeners run on the WebSocket thread and must be quick."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
     def handle_message(self, message: dict): 
         symbol = message.get("id")
         price = message.get("price")
@@ -37,7 +77,13 @@ class WebSocketPriceManager:
         if symbol and price:
             self.price_cache[symbol] = float(price)
             self.last_update[symbol] = datetime.now(timezone.utc)
+            if self.table is not None:
+                try:
+                    self.table.write(symbol, float(price))
+                except (ValueError, RuntimeError) as e:
+                    print(f"Could not publish {symbol}: {e}")
             print(f"Updated price for {symbol}: ${price:.2f}")
+            self._dispatch(symbol, float(price))
 
     async def _run_websocket(self):
         """Internal async function to run WebSocket connection"""
@@ -49,11 +95,81 @@ class WebSocketPriceManager:
         await self.ws.listen(self.handle_message)
 
     async def start(self, symbols: list[str]):
-        """Start WebSocket streaming in background thread"""
-        if self.running:
+        """Join the shared price table and feed it, or follow it if another worker is the feeder"""
+        if self.table is not None or self.running:
             print("WebSocket is already running")
             return
 
+        path = os.environ.get("PRICE_TABLE_PATH") or default_path()
+        self.table = SharedPriceTable(path)
+        for symbol in symbols:
+            self._register(symbol)
+        self.subscribed_symbols.update(self.table.symbols())
+
+        thread = threading.Thread(target=self._coordinate, daemon=True, name="price-table")
+        thread.start()
+
+    def _register(self, symbol: str) -> bool:
+        """Give a symbol a table slot. False (and logged) when the table cannot hold it."""
+        try:
+            self.table.register(symbol)
+            return True
+        except (ValueError, RuntimeError) as e:
+            print(f"Not streaming {symbol}: {e}")
+            return False
+
+    def _try_become_feeder(self) -> bool:
+        handle = open(f"{self.table.path}.feeder", "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        # Held while our WebSocket runs; the OS releases it if we die
+        self._feeder_lock = handle
+        self.is_feeder = True
+        return True
+
+    def _resign_feeder(self) -> None:
+        """Let any worker (this one included) take over the feed, e.g. after the WebSocket died."""
+        self.is_feeder = False
+        if self._feeder_lock is not None:
+            self._feeder_lock.close()  # closing the file drops the flock
+            self._feeder_lock = None
+
+    def _coordinate(self):
+        """Feeder: subscribe symbols other workers register. Follower: dispatch ticks, stand by to take over."""
+        seen: Dict[int, int] = {}
+        self.table.changed_since(seen)  # only ticks from now on
+        last_ticks = self.table.ticks()
+        next_attempt = 0.0
+        while True:
+            try:
+                now = time.monotonic()
+                if not self.is_feeder and now >= next_attempt:
+                    next_attempt = now + FEEDER_RETRY_SECONDS
+                    if self._try_become_feeder():
+                        print(f"Became price feeder (pid {os.getpid()})")
+                        self._start_websocket(self.table.symbols())
+                if self.is_feeder:
+                    for symbol in self.table.symbols():
+                        if symbol not in self.subscribed_symbols:
+                            self.subscribe(symbol)
+                    time.sleep(FEEDER_RETRY_SECONDS)
+                    continue
+
+                ticks = self.table.ticks()
+                if ticks != last_ticks:
+                    last_ticks = ticks
+                    for symbol, price in self.table.changed_since(seen):
+                        self._dispatch(symbol, price)
+                self.subscribed_symbols.update(self.table.symbols())
+            except Exception as e:
+                print(f"Price table error: {e}")
+            time.sleep(TAIL_INTERVAL_SECONDS)
+
+    def _start_websocket(self, symbols: list[str]):
+        """Start WebSocket streaming in background thread"""
         self.subscribed_symbols.update(symbols)
         self.running = True
 
@@ -66,19 +182,27 @@ class WebSocketPriceManager:
                 self.loop.run_until_complete(self._run_websocket())
             except Exception as e:
                 print(f"WebSocket error: {e}")
-                self.running = False
             finally:
+                self.running = False
+                self.ws = None
                 self.loop.close()
                 self.loop = None
+                if self.table is not None:
+                    print(f"WebSocket closed; resigning as price feeder (pid {os.getpid()})")
+                    self._resign_feeder()
 
         thread = threading.Thread(target=run_in_thread, daemon=True)
         thread.start()
         print(f"WebSocket started for {len(symbols)} symbols")
 
     def subscribe(self, symbol: str):
-        """Add a symbol to the stream"""
+        """Add a symbol to the stream (the feeder picks it up when another worker owns the WebSocket)"""
+        if self.table is not None and not self._register(symbol):
+            return
         if symbol not in self.subscribed_symbols:
             self.subscribed_symbols.add(symbol)
+            if self.table is not None and not self.is_feeder:
+                return
 
             if self.ws and self.running and self.loop and not self.loop.is_closed():
                 try:
@@ -95,11 +219,16 @@ class WebSocketPriceManager:
                 print(f"Queued {symbol} for WebSocket subscription")
                 
     def get_price(self, symbol: str) -> float:
-        """Get the price for a symbol from the cache"""
+        """Get the price for a symbol from the shared table, or the local cache before start()"""
+        if self.table is not None:
+            return self.table.read(symbol)[0]
         return self.price_cache.get(symbol, 0.0)
 
     def get_last_update(self, symbol: str) -> datetime:
         """Get timestamp of last update"""
+        if self.table is not None:
+            updated_at = self.table.read(symbol)[1]
+            return datetime.fromtimestamp(updated_at, tz=timezone.utc) if updated_at else None
         return self.last_update.get(symbol)
 
     async def stop(self):
@@ -0,0 +1,85 @@
+"""Chart serialization: DataFrame.iterrows vs column-at-a-time.
+
+Builds synthetic OHLCV series and times, for each size, the per-row
+iterrows loop /api/chart/<symbol> used to run, the vectorized row output and
+the columnar (format=columns) output, each including json.dumps. Usage:
+
+    python benchmarks/bench_chart_serialization.py [--sizes 10000 100000] [--repeat 3]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.chart_format import bar_columns, bar_rows  # noqa: E402
+
+
+def make_history(bars: int) -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    index = pd.date_range("1980-01-01", periods=bars, freq="D", tz="America/New_York")
+    return pd.DataFrame(
+        {
+            "Open": close * 0.999,
+            "High": close * 1.01,
+            "Low": close * 0.99,
+            "Close": close,
+            "Volume": rng.integers(1_000, 10_000_000, bars),
+        },
+        index=index,
+    )
+
+
+def iterrows_rows(history: pd.DataFrame) -> list[dict]:
+    """The previous implementation, kept here as the baseline."""
+    chart_data = []
+    for timestamp, row in history.iterrows():
+        chart_data.append({
+            'time': int(timestamp.timestamp()),
+            'open': float(row['Open']),
+            'high': float(row['High']),
+            'low': float(row['Low']),
+            'close': float(row['Close']),
+            'volume': int(row['Volume'])
+        })
+    return chart_data
+
+
+def best_of(repeat: int, fn) -> tuple[float, int]:
+    best, size = float("inf"), 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(json.dumps(fn()))
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for bars in args.sizes:
+        history = make_history(bars)
+        assert iterrows_rows(history[:100]) == bar_rows(history[:100])
+        print(f"{bars:,} bars")
+        baseline = None
+        for name, fn in (
+            ("iterrows rows", lambda: iterrows_rows(history)),
+            ("vectorized rows", lambda: bar_rows(history)),
+            ("columnar", lambda: bar_columns(history)),
+        ):
+            ms, size = best_of(args.repeat, fn)
+            baseline = baseline or ms
+            print(f"  {name:<16} {ms:9.1f} ms  {size / 1024:8.0f} KiB  {baseline / ms:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Match throughput of the in-process matching engine.
+
+Rests N LIMIT/STOP orders spread over a handful of symbols, then replays a
+random walk of ticks and reports ticks/second and fills/second. Usage:
+
+    python benchmarks/bench_matching_engine.py [--orders 100000] [--ticks 200000]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.matching_engine import MatchingEngine  # noqa: E402
+
+SYMBOLS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "JPM", "V", "XOM"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--ticks", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    engine = MatchingEngine()
+
+    started = time.perf_counter()
+    for order_id in range(1, args.orders + 1):
+        engine.add(
+            order_id,
+            rng.choice(SYMBOLS),
+            rng.choice(("BUY", "SELL")),
+            rng.choice(("LIMIT", "STOP")),
+            round(rng.uniform(50.0, 150.0), 2),
+        )
+    load_s = time.perf_counter() - started
+    print(f"rested {args.orders:,} orders in {load_s * 1000:.1f} ms")
+
+    prices = {symbol: 100.0 for symbol in SYMBOLS}
+    fills = 0
+    started = time.perf_counter()
+    for _ in range(args.ticks):
+        symbol = rng.choice(SYMBOLS)
+        prices[symbol] = min(150.0, max(50.0, prices[symbol] * (1 + rng.gauss(0, 0.002))))
+        fills += len(engine.match(symbol, prices[symbol]))
+    match_s = time.perf_counter() - started
+
+    print(
+        f"{args.ticks:,} ticks in {match_s:.2f} s: "
+        f"{args.ticks / match_s:,.0f} ticks/s, {fills:,} fills "
+        f"({fills / match_s:,.0f} fills/s), {len(engine):,} still resting"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,5 +2,13 @@
 import os
 
 bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
-workers = 1
+# Workers share live prices through app/price_table.py and elect one leader
+# for the scheduler jobs (app/leader.py). Fills are conditional UPDATEs
+# (app/order_execution.py), so any worker may fill any order, and
+# app/fill_relay.py passes each fill to the SSE streams and valuations of
+# every other worker. Raise WEB_CONCURRENCY as the instance's memory allows.
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+# /api/portfolio/stream holds a thread per open EventSource, so use threaded workers
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "32"))
 timeout = 120
@@ -2,4 +2,4 @@
 # Render may not expand $PORT in Start Command; this script ensures it's used
 set -e
 PORT="${PORT:-10000}"
-exec gunicorn wsgi:app -b "0.0.0.0:${PORT}" -w 1 -t 120
+exec gunicorn wsgi:app -b "0.0.0.0:${PORT}" -w "${WEB_CONCURRENCY:-1}" -k gthread --threads "${GUNICORN_THREADS:-32}" -t 120
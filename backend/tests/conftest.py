@@ -13,6 +13,7 @@ from app.extensions import db
 @pytest.fixture()
 def app(monkeypatch):
     monkeypatch.setenv("DATABASE_URL", "sqlite://")
+    monkeypatch.setenv("BAR_STORE_PATH", ":memory:")
     monkeypatch.setenv("JWT_SECRET_KEY", "test-jwt-secret-key-with-minimum-32-chars-for-security")
     
     # Pass TESTING=True during creation, not after
@@ -48,16 +49,15 @@ def authenticated_user(app, client):
 
 @pytest.fixture
 def mock_quote():
-    """Mock fetch_quote in routes and processor"""
+    """Mock fetch_quote in routes and processor (fetch_quotes calls through market_data.fetch_quote)"""
     with patch('app.market_data.fetch_quote') as mock:
-        with patch('app.order_processor.fetch_quote', new=mock):
-            with patch('app.routes.fetch_quote', new=mock):
-                mock.return_value = {
-                    'price': 150.00,
-                    'exchange': 'NMS',
-                    'currency': 'USD'
-                }
-                yield mock
+        with patch('app.routes.fetch_quote', new=mock):
+            mock.return_value = {
+                'price': 150.00,
+                'exchange': 'NMS',
+                'currency': 'USD'
+            }
+            yield mock
 
 
 @pytest.fixture
@@ -70,9 +70,11 @@ def mock_current_price():
 
 @pytest.fixture
 def mock_company_name():
-    """Mock the fetch_company_name function"""
-    with patch('app.routes.fetch_company_name') as mock:
-        mock.return_value = 'Apple Inc.'
+    """Mock the upstream profile lookup behind the security master"""
+    with patch('app.security_master.fetch_company_profiles') as mock:
+        mock.side_effect = lambda symbols: {
+            symbol: {'symbol': symbol, 'name': 'Apple Inc.'} for symbol in symbols
+        }
         yield mock
 
 
@@ -80,9 +82,15 @@ def mock_company_name():
 def mock_market_open():
     """Mock is_market_open across the entire app surface area"""
     with patch('app.market_data.is_market_open') as mock:
-        # Patch the processor (background jobs)
-        with patch('app.order_processor.is_market_open', new=mock):
+        # Patch the processor (background jobs), which asks for all symbols at once
+        with patch(
+            'app.order_processor.markets_open',
+            side_effect=lambda symbols: {symbol: mock(symbol) for symbol in symbols},
+        ):
             # Patch the routes (API endpoints for instant fill)
-            with patch('app.routes.is_market_open', new=mock):
+            with patch('app.routes.is_market_open', new=mock), patch(
+                'app.routes.markets_open',
+                side_effect=lambda symbols: {symbol: mock(symbol) for symbol in symbols},
+            ):
                 mock.return_value = True
                 yield mock
\ No newline at end of file
@@ -0,0 +1,107 @@
+"""
+Tests for the local OHLCV bar store
+"""
+import importlib
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from app.bar_store import BarStore
+
+# The package re-exports the bar_store singleton under the module's name
+bar_store_module = importlib.import_module("app.bar_store")
+
+
+def _bars(start: str, days: int, close: float = 100.0) -> pd.DataFrame:
+    index = pd.date_range(start, periods=days, freq="D", tz="America/New_York", name="Date")
+    closes = [close + i for i in range(days)]
+    return pd.DataFrame(
+        {"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": [1000] * days},
+        index=index,
+    )
+
+
+@pytest.fixture
+def store():
+    store = BarStore()
+    store.open(":memory:")
+    return store
+
+
+def test_first_request_downloads_history_then_serves_locally(store):
+    with patch.object(bar_store_module, "_download", return_value=_bars("2024-01-01", 400)) as download:
+        history = store.history("aapl", period="1mo", interval="1d")
+        assert download.call_count == 1
+        assert download.call_args.kwargs["period"] == "max"
+
+        again = store.history("AAPL", period="max", interval="1d")
+        assert download.call_count == 1
+
+    assert len(again) == 400
+    assert history.index[-1] == again.index[-1]
+    assert history.index[0] >= again.index[-1] - pd.DateOffset(months=1)
+    assert str(history.index.tz) == "America/New_York"
+    assert list(history.columns) == ["Open", "High", "Low", "Close", "Volume"]
+
+
+def test_stale_series_appends_only_the_tail(store):
+    with patch.object(bar_store_module, "_download", return_value=_bars("2024-01-01", 10)):
+        store.history("AAPL", period="max", interval="1d")
+
+    # Upstream re-sends the last two stored bars plus two new ones
+    tail = _bars("2024-01-09", 4, close=108.0)
+    with patch.object(bar_store_module, "TAIL_REFRESH", {"intraday": 0, "daily": -1}), \
+            patch.object(bar_store_module, "_download", return_value=tail) as download:
+        history = store.history("AAPL", period="max", interval="1d")
+    assert "start" in download.call_args.kwargs
+    assert len(history) == 12
+    assert history["Close"].iloc[-1] == 111.0
+
+
+def test_readjusted_history_is_reloaded(store):
+    with patch.object(bar_store_module, "_download", return_value=_bars("2024-01-01", 10)):
+        store.history("AAPL", period="max", interval="1d")
+
+    # A 2:1 split halves every historical close
+    halved = _bars("2024-01-01", 12) / 2
+    calls = []
+
+    def download(symbol, interval, period=None, start=None):
+        calls.append(period or "tail")
+        return halved if period else halved.iloc[-4:]
+
+    with patch.object(bar_store_module, "TAIL_REFRESH", {"intraday": 0, "daily": -1}), \
+            patch.object(bar_store_module, "_download", side_effect=download):
+        history = store.history("AAPL", period="max", interval="1d")
+    assert calls == ["tail", "max"]
+    assert history["Close"].iloc[0] == 50.0
+    assert len(history) == 12
+
+
+def test_empty_or_failed_reload_keeps_stored_history(store):
+    with patch.object(bar_store_module, "_download", return_value=_bars("2024-01-01", 10)):
+        store.history("AAPL", period="max", interval="1d")
+
+    halved = _bars("2024-01-01", 12) / 2
+    for reload in (pd.DataFrame(), ConnectionError("upstream down")):
+        def download(symbol, interval, period=None, start=None):
+            if not period:
+                return halved.iloc[-4:]
+            if isinstance(reload, Exception):
+                raise reload
+            return reload
+
+        with patch.object(bar_store_module, "TAIL_REFRESH", {"intraday": 0, "daily": -1}), \
+                patch.object(bar_store_module, "_download", side_effect=download):
+            history = store.history("AAPL", period="max", interval="1d")
+        assert len(history) == 10
+        assert history["Close"].iloc[0] == 100.0
+
+
+def test_start_end_range_and_trading_sessions(store):
+    with patch.object(bar_store_module, "_download", return_value=_bars("2024-01-01", 30)):
+        ranged = store.history("AAPL", start="2024-01-05", end="2024-01-08", interval="1d")
+        sessions = store.history("AAPL", period="5d", interval="1d")
+    assert [ts.day for ts in ranged.index] == [5, 6, 7]
+    assert len(sessions) == 5
@@ -0,0 +1,90 @@
+"""
+Tests for /api/orders/batch: one quote per symbol, whole-basket buying power, all-or-nothing
+"""
+from decimal import Decimal
+
+from app.extensions import db
+from app.models import Account, Order
+
+PRICES = {"AAPL": 100.0, "MSFT": 200.0, "NVDA": 50.0}
+
+
+def _quote(symbol, allow_stale=False):
+    return {"price": PRICES[symbol], "exchange": "NMS", "currency": "USD"}
+
+
+def _set_cash(app, user_id, cash):
+    with app.app_context():
+        Account.query.filter_by(user_id=user_id).one().cash_balance = Decimal(cash)
+        db.session.commit()
+
+
+def test_rebalance_sells_fund_buys_in_one_call(app, client, authenticated_user, mock_quote, mock_market_open, mock_company_name):
+    mock_quote.side_effect = _quote
+    client.post("/api/orders", json={"symbol": "AAPL", "side": "BUY", "quantity": 20})
+    _set_cash(app, authenticated_user["user_id"], "500")
+    mock_quote.reset_mock()
+
+    response = client.post("/api/orders/batch", json={"orders": [
+        {"symbol": "MSFT", "side": "BUY", "quantity": 10},
+        {"symbol": "AAPL", "side": "SELL", "quantity": 20},
+        {"symbol": "msft", "side": "BUY", "quantity": 1},
+    ]})
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+
+    # One quote per distinct symbol
+    assert sorted(call.args[0] for call in mock_quote.call_args_list) == ["AAPL", "MSFT"]
+    assert [(r["order"]["symbol"], r["order"]["side"], r["order"]["status"]) for r in body["results"]] == [
+        ("MSFT", "BUY", "FILLED"), ("AAPL", "SELL", "FILLED"), ("MSFT", "BUY", "FILLED"),
+    ]
+    assert body["account"]["cash_balance"] == 500 + 2000 - 2200
+
+
+def test_basket_over_buying_power_is_rejected_whole(app, client, authenticated_user, mock_quote, mock_market_open, mock_company_name):
+    mock_quote.side_effect = _quote
+    _set_cash(app, authenticated_user["user_id"], "1000")
+
+    response = client.post("/api/orders/batch", json={"orders": [
+        {"symbol": "NVDA", "side": "BUY", "quantity": 10},
+        {"symbol": "AAPL", "side": "BUY", "quantity": 6},
+    ]})
+    assert response.status_code == 400
+    assert response.get_json()["results"] == [{"error": "Insufficient cash"}, {"error": "Insufficient cash"}]
+    with app.app_context():
+        assert Order.query.count() == 0
+
+    response = client.post("/api/orders/batch", json={"orders": [
+        {"symbol": "NVDA", "side": "BUY", "quantity": 10},
+        {"symbol": "AAPL", "side": "SELL", "quantity": 1},
+    ]})
+    assert response.get_json()["results"] == [{}, {"error": "Insufficient shares"}]
+
+
+def test_invalid_orders_are_reported_by_position(client, authenticated_user, mock_quote, mock_market_open):
+    response = client.post("/api/orders/batch", json={"orders": [
+        {"symbol": "AAPL", "side": "BUY", "quantity": 1},
+        {"symbol": "AAPL", "side": "HOLD", "quantity": 1},
+        {"symbol": "AAPL", "side": "BUY", "quantity": 1, "order_type": "LIMIT"},
+    ]})
+    assert response.status_code == 400
+    assert response.get_json()["results"] == [
+        {}, {"error": "Invalid order payload"}, {"error": "limit_price must be a positive number"},
+    ]
+    mock_quote.assert_not_called()
+
+    assert client.post("/api/orders/batch", json={"orders": []}).status_code == 400
+
+
+def test_closed_market_and_resting_orders_stay_pending(client, authenticated_user, mock_quote, mock_market_open, mock_company_name):
+    from app.matching_engine import matching_engine
+
+    mock_quote.side_effect = _quote
+    mock_market_open.side_effect = lambda symbol: symbol != "MSFT"
+    body = client.post("/api/orders/batch", json={"orders": [
+        {"symbol": "MSFT", "side": "BUY", "quantity": 1},
+        {"symbol": "AAPL", "side": "BUY", "quantity": 1, "order_type": "LIMIT", "limit_price": 90},
+    ]}).get_json()
+    assert [r["order"]["status"] for r in body["results"]] == ["PENDING", "PENDING"]
+    assert body["results"][1]["message"] == "Limit order resting at 90.00."
+    assert len(matching_engine) == 1
@@ -49,6 +49,20 @@ class TestBuyStockMarketOpen:
         data = response.get_json()
         assert 'Insufficient cash' in data['error']
 
+    def test_buy_stock_refuses_stale_quote(self, app, client, authenticated_user, mock_quote, mock_market_open):
+        """A quote served stale while upstream is down must not price a fill"""
+        mock_quote.return_value = {'price': 150.00, 'exchange': 'NMS', 'currency': 'USD', 'stale': True}
+
+        response = client.post(
+            "/api/orders",
+            json={"symbol": "AAPL", "side": "BUY", "quantity": 1},
+        )
+
+        assert response.status_code == 503
+        assert response.get_json()['error'] == 'Failed to get current price'
+        with app.app_context():
+            assert Order.query.count() == 0
+
 
 class TestBuyStockMarketClosed:
     """Test cases for buying stocks when market is CLOSED"""
@@ -388,6 +402,32 @@ class TestOrderProcessor:
             ).scalars().all()
             assert len(orders) == 3
 
+    def test_processor_prices_each_symbol_once_and_commits_in_chunks(self, app, client, authenticated_user, mock_quote, mock_market_open, mock_company_name, monkeypatch):
+        """Test that orders are grouped by symbol, quoted once per group and applied in chunks"""
+        from app import order_processor
+
+        mock_market_open.return_value = False
+        for symbol in ["AAPL", "AAPL", "AAPL", "MSFT", "MSFT"]:
+            client.post("/api/orders", json={"symbol": symbol, "side": "BUY", "quantity": 1})
+
+        mock_market_open.return_value = True
+        mock_quote.reset_mock()
+        monkeypatch.setattr(order_processor, "CHUNK_SIZE", 2)
+
+        with app.app_context():
+            processed = order_processor.process_pending_orders()
+            assert processed == 5
+            assert mock_quote.call_count == 2
+
+            stats = order_processor.last_run_stats
+            assert stats["pending"] == 5
+            assert stats["groups"] == 2
+            assert stats["filled"] == 5
+            assert "duration_ms" in stats
+
+            positions = db.session.execute(db.select(Position)).scalars().all()
+            assert {position.symbol: position.quantity for position in positions} == {"AAPL": 3, "MSFT": 2}
+
 
 class TestPortfolioBreakdown:
     """Test cases for portfolio breakdown"""
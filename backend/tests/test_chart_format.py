@@ -0,0 +1,82 @@
+"""
+Tests for chart payload serialization and downsampling
+"""
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from app.chart_downsample import downsample, lttb_indices
+from app.chart_format import bar_columns, bar_rows, point_rows
+
+
+def _history(bars: int = 3) -> pd.DataFrame:
+    index = pd.date_range("2024-03-01", periods=bars, freq="D", tz="America/New_York")
+    closes = [100.0 + i for i in range(bars)]
+    return pd.DataFrame(
+        {"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": [10] * bars},
+        index=index,
+    )
+
+
+def test_vectorized_rows_match_iterrows():
+    history = _history()
+    expected = [
+        {
+            "time": int(timestamp.timestamp()),
+            "open": float(row["Open"]),
+            "high": float(row["High"]),
+            "low": float(row["Low"]),
+            "close": float(row["Close"]),
+            "volume": int(row["Volume"]),
+        }
+        for timestamp, row in history.iterrows()
+    ]
+    assert bar_rows(history) == expected
+    assert point_rows(history)[0] == {"date": "2024-03-01", "close": 100.0}
+
+
+def test_empty_history():
+    assert bar_rows(pd.DataFrame()) == []
+    assert bar_columns(None)["time"] == []
+
+
+def test_chart_endpoint_columnar_format(client):
+    with patch("app.routes.bar_store.history", return_value=_history()):
+        rows = client.get("/api/chart/AAPL?period=1mo&interval=1d").get_json()["data"]
+        columns = client.get("/api/chart/AAPL?period=1mo&interval=1d&format=columns").get_json()["data"]
+    assert columns["close"] == [row["close"] for row in rows]
+    assert columns["time"] == [row["time"] for row in rows]
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[500] = 10.0
+    indices = lttb_indices(x, y, 50)
+    assert len(indices) == 50
+    assert indices[0] == 0 and indices[-1] == 999
+    assert 500 in indices
+    assert list(indices) == sorted(indices)
+
+
+def test_ohlc_buckets_merge_bars():
+    merged = downsample(_history(10), 5, "ohlc")
+    assert len(merged) == 5
+    first = merged.iloc[0]
+    assert (first["Open"], first["High"], first["Low"], first["Close"], first["Volume"]) == (100.0, 101.0, 100.0, 101.0, 20)
+    assert merged.index[1] == _history(10).index[2]
+
+
+def test_chart_endpoint_downsamples_and_caches(client):
+    with patch("app.routes.bar_store.history", return_value=_history(300)) as history:
+        first = client.get("/api/chart/AAPL?period=1y&interval=1d&max_points=50").get_json()["data"]
+        second = client.get("/api/chart/AAPL?period=1y&interval=1d&max_points=50").get_json()["data"]
+        full = client.get("/api/chart/AAPL?period=1y&interval=1d").get_json()["data"]
+    assert len(first) == 50 and first == second
+    assert len(full) == 300
+    assert history.call_count == 2
+    assert first[0] == full[0] and first[-1] == full[-1]
+
+    assert client.get("/api/chart/AAPL?max_points=1").status_code == 400
+    assert client.get("/api/chart/AAPL?max_points=10&downsample=median").status_code == 400
@@ -0,0 +1,141 @@
+"""
+Tests for the /api/market/<symbol> snapshot builder
+"""
+import time
+
+import pandas as pd
+import pytest
+
+from app import market_data
+from app.quote_cache import quote_cache
+from app.upstream import UpstreamUnavailable
+
+
+class SlowTicker:
+    """Each upstream property sleeps for the given number of seconds and counts its calls."""
+
+    def __init__(self, info=0.0, history=0.0, calendar=0.0):
+        self.delays = {"info": info, "history": history, "calendar": calendar}
+        self.calls = {"info": 0, "history": 0, "calendar": 0}
+        self.price = 150.0
+        self.down = False
+
+    def _call(self, part):
+        if self.down:
+            raise UpstreamUnavailable("upstream circuit breaker is open")
+        self.calls[part] += 1
+        time.sleep(self.delays[part])
+
+    @property
+    def info(self):
+        self._call("info")
+        return {"longName": "Apple Inc.", "regularMarketPrice": self.price, "marketState": "REGULAR", "sector": "Technology"}
+
+    def history(self, period):
+        self._call("history")
+        return pd.DataFrame({"Close": [100.0, 110.0]})
+
+    @property
+    def calendar(self):
+        self._call("calendar")
+        return {"Earnings Date": [pd.Timestamp("2026-01-29").date()]}
+
+
+@pytest.fixture
+def use_ticker(monkeypatch):
+    quote_cache.clear()
+    yield lambda ticker: monkeypatch.setattr(market_data.upstream, "ticker", lambda symbol, max_age=None: ticker)
+    quote_cache.clear()
+
+
+def test_snapshot_parts_run_concurrently(use_ticker):
+    use_ticker(SlowTicker(info=0.2, history=0.2, calendar=0.2))
+    started = time.perf_counter()
+    snapshot = market_data.fetch_company_snapshot("AAPL")
+    assert time.perf_counter() - started < 0.5
+    assert snapshot["quote"]["current_price"] == 150.0
+    assert snapshot["performance_metrics"]["past_week_growth"] == "+10.00%"
+    assert snapshot["upcoming_events"]["date"] == "2026-01-29"
+
+
+def test_slow_part_only_degrades_its_own_section(use_ticker, monkeypatch):
+    monkeypatch.setitem(market_data.SNAPSHOT_PART_TIMEOUTS, "calendar", 0.1)
+    use_ticker(SlowTicker(calendar=1.0))
+    started = time.perf_counter()
+    snapshot = market_data.fetch_company_snapshot("AAPL")
+    assert time.perf_counter() - started < 0.5
+    assert snapshot["upcoming_events"]["date"] is None
+    assert snapshot["company_name"] == "Apple Inc."
+
+
+def test_sections_are_built_and_cached_independently(use_ticker, monkeypatch):
+    ticker = SlowTicker()
+    use_ticker(ticker)
+    snapshot = market_data.fetch_company_snapshot("AAPL", ["quote"])
+    assert set(snapshot) == {"ticker", "company_name", "market_status", "quote"}
+    assert ticker.calls == {"info": 1, "history": 0, "calendar": 0}
+
+    full = market_data.fetch_company_snapshot("AAPL")
+    assert full["profile"]["sector"] == "Technology"
+    assert ticker.calls["history"] == 1 and ticker.calls["calendar"] == 1
+
+    # Only the quote expires: refreshing it touches neither history nor the calendar
+    monkeypatch.setitem(quote_cache._ttls, "snapshot_quote", (0.0, 0.0))
+    ticker.price = 151.0
+    assert market_data.fetch_company_snapshot("AAPL")["quote"]["current_price"] == 151.0
+    assert ticker.calls == {"info": 3, "history": 1, "calendar": 1}
+
+
+def test_snapshot_falls_back_to_last_good_sections(use_ticker, monkeypatch):
+    ticker = SlowTicker()
+    use_ticker(ticker)
+    monkeypatch.setitem(quote_cache._ttls, "snapshot_quote", (0.0, 0.0))
+    assert market_data.fetch_company_snapshot("AAPL", ["quote"])["quote"]["current_price"] == 150.0
+
+    ticker.down = True
+    snapshot = market_data.fetch_company_snapshot("AAPL", ["quote"])
+    assert snapshot["quote"]["current_price"] == 150.0
+    assert snapshot["stale"] is True
+    with pytest.raises(UpstreamUnavailable):
+        market_data.fetch_company_snapshot("MSFT", ["quote"])
+
+
+
+class FastInfoTicker(SlowTicker):
+    """Info may lack the price and market state; fast_info has them."""
+
+    def __init__(self, with_price):
+        super().__init__()
+        self.with_price = with_price
+        self.fast_info_calls = 0
+
+    @property
+    def info(self):
+        info = super().info
+        return info if self.with_price else {"longName": info["longName"]}
+
+    @property
+    def fast_info(self):
+        self.fast_info_calls += 1
+        return {"last_price": 149.5, "market_state": "REGULAR"}
+
+
+def test_quote_falls_back_to_fast_info(use_ticker):
+    ticker = FastInfoTicker(with_price=False)
+    use_ticker(ticker)
+    snapshot = market_data.fetch_company_snapshot("AAPL", ["quote"])
+    assert snapshot["quote"]["current_price"] == 149.5
+    assert snapshot["market_status"] == "Market Open"
+    assert ticker.fast_info_calls == 1
+
+    # Not fetched when info has what the quote needs
+    ticker = FastInfoTicker(with_price=True)
+    use_ticker(ticker)
+    assert market_data.fetch_company_snapshot("MSFT", ["quote"])["quote"]["current_price"] == 150.0
+    assert ticker.fast_info_calls == 0
+
+
+def test_route_rejects_unknown_sections(client):
+    response = client.get("/api/market/AAPL?sections=quote,gossip")
+    assert response.status_code == 400
+    assert "gossip" in response.get_json()["error"]
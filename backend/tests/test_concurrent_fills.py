@@ -0,0 +1,112 @@
+"""
+Stress test: many concurrent orders against one account must never overdraw
+it, oversell a holding, or let cash, positions and lots drift apart
+"""
+import random
+import threading
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func
+
+from app import create_app
+from app.extensions import db
+from app.models import Account, Lot, Order, Position
+
+THREADS = 8
+ORDERS_PER_THREAD = 50
+STARTING_CASH = Decimal("5000")
+PRICE = Decimal("100")
+
+
+@pytest.fixture()
+def app(monkeypatch, tmp_path):
+    # A file database: the in-memory one shares a single connection, so it cannot race
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'stress.db'}")
+    monkeypatch.setenv("BAR_STORE_PATH", ":memory:")
+    monkeypatch.setenv("JWT_SECRET_KEY", "test-jwt-secret-key-with-minimum-32-chars-for-security")
+    app = create_app(config={"TESTING": True})
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_concurrent_orders_keep_one_account_consistent(app, client, authenticated_user, mock_quote, mock_market_open, mock_company_name):
+    mock_quote.return_value = {"price": float(PRICE), "exchange": "NMS", "currency": "USD"}
+    with app.app_context():
+        account = Account.query.filter_by(user_id=authenticated_user["user_id"]).one()
+        account.cash_balance = STARTING_CASH
+        db.session.commit()
+        account_id = account.id
+
+    statuses = []
+    start = threading.Barrier(THREADS)
+
+    def trade(seed):
+        rng = random.Random(seed)
+        session = app.test_client()
+        session.post("/api/auth/login", json={"email": "test@example.com", "password": "testpass123"})
+        start.wait()
+        for _ in range(ORDERS_PER_THREAD):
+            response = session.post("/api/orders", json={
+                "symbol": "AAPL",
+                "side": rng.choice(["BUY", "BUY", "SELL"]),
+                "quantity": rng.randint(1, 10),
+                "lot_method": rng.choice(["FIFO", "LIFO"]),
+            })
+            statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=trade, args=(seed,)) for seed in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(statuses) == THREADS * ORDERS_PER_THREAD
+    assert set(statuses) <= {200, 400}, statuses
+    assert statuses.count(200) > THREADS  # Plenty of fills, not just rejections
+
+    with app.app_context():
+        account = db.session.get(Account, account_id)
+        filled = {
+            side: (int(quantity or 0), Decimal(str(cost or 0)))
+            for side, quantity, cost in db.session.query(
+                Order.side, func.sum(Order.quantity), func.sum(Order.quantity * Order.price)
+            ).filter_by(account_id=account_id, status="FILLED").group_by(Order.side)
+        }
+        bought, spent = filled.get("BUY", (0, Decimal("0")))
+        sold, received = filled.get("SELL", (0, Decimal("0")))
+        position = Position.query.filter_by(account_id=account_id, symbol="AAPL").first()
+        held = position.quantity if position else 0
+        in_lots = db.session.query(func.coalesce(func.sum(Lot.remaining), 0)).filter_by(account_id=account_id).scalar()
+        negative_lots = Lot.query.filter(Lot.remaining < 0).count()
+
+    assert account.cash_balance >= 0
+    assert account.cash_balance == STARTING_CASH - spent + received
+    assert held >= 0 and held == bought - sold
+    assert in_lots == held and negative_lots == 0
+
+
+def test_an_order_claimed_elsewhere_is_not_filled_twice(app, client, authenticated_user):
+    from app.order_execution import fill_order
+
+    with app.app_context():
+        account = Account.query.filter_by(user_id=authenticated_user["user_id"]).one()
+        order = Order(account_id=account.id, symbol="AAPL", side="BUY", quantity=1, price=PRICE, status="PENDING")
+        db.session.add(order)
+        db.session.commit()
+        cash = account.cash_balance
+
+        # Another worker fills it between our read and our fill
+        db.session.execute(
+            db.update(Order).where(Order.id == order.id).values(status="FILLED")
+            .execution_options(synchronize_session=False)
+        )
+        assert fill_order(order, account, None, PRICE) == (False, None)
+        db.session.commit()
+        assert order.status == "FILLED"
+        assert db.session.get(Account, account.id).cash_balance == cash
+        assert Lot.query.count() == 0
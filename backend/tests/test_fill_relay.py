@@ -0,0 +1,60 @@
+"""
+Tests for relaying fills committed by other processes to this process's fill listeners
+"""
+import importlib
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from app.extensions import db
+from app.fill_relay import RETAIN, fill_relay
+from app.models import FillEvent
+
+order_execution = importlib.import_module("app.order_execution")
+
+
+def _event(origin, created_at=None, **fields):
+    return FillEvent(
+        origin=origin,
+        account_id=fields.get("account_id", 1),
+        symbol=fields.get("symbol", "AAPL"),
+        price=Decimal("150"),
+        quantity=fields.get("quantity", 10),
+        avg_price=Decimal("150"),
+        created_at=created_at or datetime.now(timezone.utc).replace(tzinfo=None),
+    )
+
+
+def test_relays_fills_from_other_processes_once(app, monkeypatch):
+    delivered = []
+    monkeypatch.setattr(order_execution, "_fill_listeners", [delivered.extend])
+    with app.app_context():
+        db.session.add(_event("old-host:1"))
+        db.session.commit()
+        # Rows from before startup are not replayed
+        fill_relay.poll(deliver=False)
+
+        db.session.add_all([_event("other-host:7", quantity=25), _event(order_execution.process_origin())])
+        db.session.commit()
+        assert fill_relay.poll() == 1
+        assert fill_relay.poll() == 0
+
+    assert [(fill.account_id, fill.symbol, fill.quantity) for fill in delivered] == [(1, "AAPL", 25)]
+
+
+def test_local_fills_are_written_and_signalled(app, client, authenticated_user, mock_quote, mock_market_open, mock_company_name, monkeypatch, tmp_path):
+    monkeypatch.setattr(fill_relay, "marker_path", str(tmp_path / "fills"))
+    client.post("/api/orders", json={"symbol": "AAPL", "side": "BUY", "quantity": 10})
+
+    assert (tmp_path / "fills").exists()
+    with app.app_context():
+        event = FillEvent.query.one()
+        assert (event.origin, event.symbol, event.quantity) == (order_execution.process_origin(), "AAPL", 10)
+
+
+def test_prune_keeps_recent_events(app):
+    with app.app_context():
+        old = datetime.now(timezone.utc).replace(tzinfo=None) - RETAIN - timedelta(minutes=1)
+        db.session.add_all([_event("a:1", created_at=old), _event("a:1")])
+        db.session.commit()
+        assert fill_relay.prune() == 1
+        assert FillEvent.query.count() == 1
@@ -0,0 +1,104 @@
+"""
+Tests for scheduler leader election
+"""
+from datetime import timedelta
+
+import pytest
+
+from app.extensions import db
+from app.leader import LEASE_NAME, LEASE_SECONDS, LeaderElection, _utcnow
+from app.models import SchedulerLease
+
+
+def _candidate(app, identity, clock=None):
+    election = LeaderElection(clock=clock) if clock else LeaderElection()
+    election.init_app(app)
+    election.identity = identity
+    return election
+
+
+@pytest.fixture()
+def database_lease(monkeypatch):
+    monkeypatch.setenv("SCHEDULER_LEASE", "database")
+
+
+@pytest.fixture()
+def file_lease(monkeypatch, tmp_path):
+    monkeypatch.setenv("SCHEDULER_LEASE", "file")
+    monkeypatch.setenv("SCHEDULER_LOCK_PATH", str(tmp_path / "scheduler.lock"))
+
+
+def test_database_lease_has_one_holder_until_it_expires(app, database_lease):
+    a, b = _candidate(app, "host-a:1"), _candidate(app, "host-b:1")
+    with app.app_context():
+        assert a.campaign() is True
+        assert b.campaign() is False
+        assert a.campaign() is True  # renewal
+
+        # Leader stopped renewing
+        db.session.get(SchedulerLease, LEASE_NAME).expires_at = _utcnow() - timedelta(seconds=2)
+        db.session.commit()
+        assert b.campaign() is True
+        assert a.campaign() is False
+        assert db.session.get(SchedulerLease, LEASE_NAME).holder == "host-b:1"
+
+
+def test_database_lease_ignores_host_clock_skew(app, database_lease, monkeypatch):
+    import importlib
+
+    leader_module = importlib.import_module("app.leader")
+    a, b = _candidate(app, "host-a:1"), _candidate(app, "host-b:1")
+    with app.app_context():
+        assert a.campaign() is True
+        # Host b's clock runs an hour ahead; the lease is still a's on the database clock
+        monkeypatch.setattr(leader_module, "_utcnow", lambda: _utcnow() + timedelta(hours=1))
+        assert b.campaign() is False
+        assert db.session.get(SchedulerLease, LEASE_NAME).holder == "host-a:1"
+
+
+def test_resigning_hands_over_without_waiting_for_expiry(app, database_lease):
+    a, b = _candidate(app, "host-a:1"), _candidate(app, "host-b:1")
+    with app.app_context():
+        a.campaign()
+        a.resign()
+        assert b.campaign() is True
+
+
+def test_file_lease_has_one_holder_per_host(app, file_lease):
+    a, b = _candidate(app, "host:1"), _candidate(app, "host:2")
+    with app.app_context():
+        assert a.campaign() is True
+        assert b.campaign() is False
+        a.resign()
+        assert b.campaign() is True
+
+
+def test_jobs_only_run_on_the_leader_and_their_stats_are_published(app, database_lease):
+    a, b = _candidate(app, "host-a:1"), _candidate(app, "host-b:1")
+    calls = []
+    with app.app_context():
+        a.campaign()
+        b.campaign()
+        for election in (a, b):
+            election.run("process_pending_orders", lambda: calls.append(election.identity))
+        a.run("prune_revoked_tokens", lambda: 1 / 0)
+        assert calls == ["host-a:1"]
+
+        a.campaign()
+        stats = b.stats()
+        assert stats["is_leader"] is False
+        assert stats["leader"] == "host-a:1"
+        assert stats["jobs"]["process_pending_orders"]["runs"] == 1
+        assert stats["jobs"]["prune_revoked_tokens"]["failures"] == 1
+        assert stats["jobs"]["prune_revoked_tokens"]["last_error"] == "division by zero"
+
+
+def test_leader_stops_running_jobs_once_its_lease_could_have_expired(app, database_lease):
+    now = [0.0]
+    a = _candidate(app, "host-a:1", clock=lambda: now[0])
+    calls = []
+    with app.app_context():
+        a.campaign()
+        now[0] = LEASE_SECONDS + 1  # renewal thread stalled
+        a.run("process_pending_orders", lambda: calls.append(1))
+    assert calls == []
@@ -0,0 +1,93 @@
+"""
+Tests for tax lots: FIFO/LIFO/specific-ID sells and realized P&L
+"""
+from app.extensions import db
+from app.models import Lot, Order
+
+
+def _buy(client, mock_quote, price, quantity=10):
+    mock_quote.return_value = {"price": price, "exchange": "NMS", "currency": "USD"}
+    return client.post("/api/orders", json={"symbol": "AAPL", "side": "BUY", "quantity": quantity}).get_json()["order"]["id"]
+
+
+def _open_lots(client):
+    return [(row["id"], row["quantity"], row["price"])
+            for row in client.get("/api/portfolio/breakdown/AAPL").get_json()["order_history"]]
+
+
+def test_fifo_sell_closes_oldest_lots_and_realizes_pnl(app, client, authenticated_user, mock_quote, mock_current_price, mock_market_open, mock_company_name):
+    first = _buy(client, mock_quote, 100.0)
+    second = _buy(client, mock_quote, 120.0)
+
+    mock_quote.return_value = {"price": 130.0, "exchange": "NMS", "currency": "USD"}
+    sell = client.post("/api/orders", json={"symbol": "AAPL", "side": "SELL", "quantity": 15}).get_json()["order"]
+    assert sell["realized_pnl"] == 10 * 30 + 5 * 10
+    assert _open_lots(client) == [(second, 5, 120.0)]
+    with app.app_context():
+        assert db.session.get(Order, first).status_text == "CLOSED"
+        # Partly sold: still OPEN, and still on the breakdown
+        assert db.session.get(Order, second).status_text == "OPEN"
+
+
+def test_lifo_sell_closes_newest_lots(client, authenticated_user, mock_quote, mock_current_price, mock_market_open, mock_company_name):
+    first = _buy(client, mock_quote, 100.0)
+    _buy(client, mock_quote, 120.0)
+
+    mock_quote.return_value = {"price": 130.0, "exchange": "NMS", "currency": "USD"}
+    response = client.post("/api/orders", json={"symbol": "AAPL", "side": "SELL", "quantity": 15, "lot_method": "LIFO"})
+    assert response.get_json()["order"]["realized_pnl"] == 10 * 10 + 5 * 30
+    assert _open_lots(client) == [(first, 5, 100.0)]
+
+    assert client.post("/api/orders", json={"symbol": "AAPL", "side": "SELL", "quantity": 1, "lot_method": "HIFO"}).status_code == 400
+
+
+def test_selling_from_a_specific_buy_leaves_other_lots_alone(client, authenticated_user, mock_quote, mock_current_price, mock_market_open, mock_company_name):
+    first = _buy(client, mock_quote, 100.0)
+    second = _buy(client, mock_quote, 120.0)
+
+    mock_current_price.return_value = 125.0
+    sell = client.post("/api/sell", json={"id": second, "symbol": "AAPL", "quantity": 4}).get_json()["order"]
+    assert sell["realized_pnl"] == 4 * 5
+    assert _open_lots(client) == [(first, 10, 100.0), (second, 6, 120.0)]
+
+
+def test_queued_sell_closes_the_chosen_lot_when_filled(app, client, authenticated_user, mock_quote, mock_current_price, mock_market_open, mock_company_name):
+    from app.order_processor import process_pending_orders
+
+    first = _buy(client, mock_quote, 100.0)
+    second = _buy(client, mock_quote, 120.0)
+
+    mock_market_open.return_value = False
+    client.post("/api/sell", json={"id": second, "symbol": "AAPL", "quantity": 10})
+    mock_market_open.return_value = True
+    mock_quote.return_value = {"price": 110.0, "exchange": "NMS", "currency": "USD"}
+    with app.app_context():
+        assert process_pending_orders() == 1
+        assert db.session.get(Order, second).status_text == "CLOSED"
+        assert db.session.get(Order, first).status_text == "OPEN"
+        lots = {lot.buy_order_id: lot.remaining for lot in Lot.query.all()}
+    assert lots == {first: 10, second: 0}
+
+
+def test_lot_without_a_buy_order_can_be_shown_and_sold_by_lot_id(app, client, authenticated_user, mock_current_price, mock_market_open, mock_company_name):
+    from decimal import Decimal
+
+    from app.models import Account, Position
+
+    # As migration 4 carries over holdings that have no open BUY order
+    with app.app_context():
+        account = Account.query.filter_by(user_id=authenticated_user["user_id"]).one()
+        db.session.add(Position(account_id=account.id, symbol="AAPL", quantity=5, avg_price=Decimal("100")))
+        lot = Lot(account_id=account.id, symbol="AAPL", quantity=5, remaining=5, price=Decimal("100"))
+        db.session.add(lot)
+        db.session.commit()
+        lot_id = lot.id
+
+    rows = client.get("/api/portfolio/breakdown/AAPL").get_json()["order_history"]
+    assert [(row["id"], row["lot_id"]) for row in rows] == [(None, lot_id)]
+
+    assert client.post("/api/sell", json={"lot_id": lot_id + 1, "symbol": "AAPL", "quantity": 5}).status_code == 404
+    mock_current_price.return_value = 110.0
+    sell = client.post("/api/sell", json={"lot_id": lot_id, "symbol": "AAPL", "quantity": 5}).get_json()["order"]
+    assert sell["realized_pnl"] == 50
+    assert _open_lots(client) == []
@@ -0,0 +1,76 @@
+"""
+Tests for the offline exchange trading calendar
+"""
+from datetime import datetime, timezone
+
+from app.market_calendar import exchange_for_symbol, is_open, open_symbols
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class TestSymbolMapping:
+    def test_plain_and_share_class_tickers_trade_in_the_us(self):
+        assert exchange_for_symbol("AAPL").code == "US"
+        assert exchange_for_symbol("BRK-B").code == "US"
+        assert exchange_for_symbol("^GSPC").code == "US"
+
+    def test_suffixes_and_special_tickers(self):
+        assert exchange_for_symbol("VOD.L").code == "LSE"
+        assert exchange_for_symbol("SHOP.TO").code == "TSX"
+        assert exchange_for_symbol("BTC-USD").code == "CRYPTO"
+        assert exchange_for_symbol("EURUSD=X").code == "FX"
+
+    def test_yahoo_exchange_code_wins_over_ticker_shape(self):
+        assert exchange_for_symbol("XYZ", "LSE").code == "LSE"
+        assert exchange_for_symbol("XYZ", "NMS").code == "US"
+
+
+class TestUsSessions:
+    def test_regular_session(self):
+        # Tuesday 2025-06-10, 10:00 and 17:00 New York (EDT)
+        assert is_open("AAPL", _utc(2025, 6, 10, 14, 0))
+        assert not is_open("AAPL", _utc(2025, 6, 10, 21, 0))
+        # 09:29 is before the open
+        assert not is_open("AAPL", _utc(2025, 6, 10, 13, 29))
+
+    def test_weekend_is_closed(self):
+        assert not is_open("AAPL", _utc(2025, 6, 14, 15, 0))
+
+    def test_holidays(self):
+        assert not is_open("AAPL", _utc(2025, 7, 4, 15, 0))  # Independence Day
+        assert not is_open("AAPL", _utc(2025, 4, 18, 15, 0))  # Good Friday
+        assert not is_open("AAPL", _utc(2025, 11, 27, 15, 0))  # Thanksgiving
+        assert not is_open("AAPL", _utc(2023, 6, 19, 15, 0))  # Juneteenth
+
+    def test_juneteenth_only_from_2022(self):
+        assert is_open("AAPL", _utc(2021, 6, 18, 15, 0))
+
+    def test_saturday_new_year_is_not_observed_on_friday(self):
+        assert is_open("AAPL", _utc(2021, 12, 31, 15, 0))
+
+    def test_half_day_after_thanksgiving(self):
+        # 12:30 vs 13:30 New York (EST)
+        assert is_open("AAPL", _utc(2025, 11, 28, 17, 30))
+        assert not is_open("AAPL", _utc(2025, 11, 28, 18, 30))
+
+
+class TestOtherMarkets:
+    def test_london_session_and_boxing_day(self):
+        assert is_open("VOD.L", _utc(2025, 6, 10, 8, 0))  # 09:00 BST
+        assert not is_open("VOD.L", _utc(2025, 12, 26, 10, 0))
+
+    def test_crypto_trades_at_weekends(self):
+        assert is_open("BTC-USD", _utc(2025, 6, 14, 3, 0))
+
+    def test_fx_closes_from_friday_to_sunday_evening(self):
+        assert is_open("EURUSD=X", _utc(2025, 6, 10, 3, 0))
+        assert not is_open("EURUSD=X", _utc(2025, 6, 14, 12, 0))
+        assert is_open("EURUSD=X", _utc(2025, 6, 15, 22, 0))  # Sunday 18:00 New York
+
+
+def test_open_symbols_answers_for_every_symbol():
+    at = _utc(2025, 6, 14, 15, 0)  # Saturday
+    result = open_symbols(["AAPL", "MSFT", "BTC-USD", "VOD.L"], at=at)
+    assert result == {"AAPL": False, "MSFT": False, "BTC-USD": True, "VOD.L": False}
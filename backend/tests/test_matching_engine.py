@@ -0,0 +1,135 @@
+"""
+Tests for LIMIT / STOP orders and the matching engine
+"""
+from decimal import Decimal
+
+from app.extensions import db
+from app.matching_engine import MatchingEngine, matching_engine
+from app.models import Account, Order, Position
+
+
+class TestMatchingEngine:
+    def test_ticks_match_only_qualifying_orders(self):
+        engine = MatchingEngine()
+        engine.add(1, "AAPL", "BUY", "LIMIT", 140)
+        engine.add(2, "AAPL", "SELL", "LIMIT", 160)
+        engine.add(3, "AAPL", "BUY", "STOP", 155)
+        engine.add(4, "AAPL", "SELL", "STOP", 135)
+
+        assert engine.match("AAPL", 150.0) == []
+        assert engine.match("AAPL", 139.0) == [1]
+        assert sorted(engine.match("AAPL", 161.0)) == [2, 3]
+        assert engine.match("AAPL", 130.0) == [4]
+        assert len(engine) == 0
+
+    def test_remove_and_other_symbols(self):
+        engine = MatchingEngine()
+        engine.add(1, "AAPL", "BUY", "LIMIT", 140)
+        engine.add(2, "AAPL", "BUY", "LIMIT", 145)
+        engine.remove(2)
+        assert engine.match("MSFT", 1.0) == []
+        assert engine.match("AAPL", 100.0) == [1]
+
+
+def test_marketable_limit_order_fills_immediately(client, authenticated_user, mock_quote, mock_market_open, mock_company_name):
+    response = client.post(
+        "/api/orders",
+        json={"symbol": "AAPL", "side": "BUY", "quantity": 10, "order_type": "LIMIT", "limit_price": 155},
+    )
+    assert response.status_code == 200
+    order = response.get_json()["order"]
+    assert order["status"] == "FILLED"
+    assert order["order_type"] == "LIMIT"
+    assert order["price"] == 150.0
+
+
+def test_limit_order_requires_a_price(client, authenticated_user, mock_quote, mock_market_open):
+    response = client.post(
+        "/api/orders",
+        json={"symbol": "AAPL", "side": "BUY", "quantity": 10, "order_type": "LIMIT"},
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        "/api/orders",
+        json={"symbol": "AAPL", "side": "BUY", "quantity": 10, "order_type": "TRAILING"},
+    )
+    assert response.status_code == 400
+
+
+def test_resting_limit_buy_fills_on_crossing_tick(app, client, authenticated_user, mock_quote, mock_market_open, mock_company_name):
+    response = client.post(
+        "/api/orders",
+        json={"symbol": "AAPL", "side": "BUY", "quantity": 10, "order_type": "LIMIT", "limit_price": 140},
+    )
+    assert response.status_code == 200
+    order_id = response.get_json()["order"]["id"]
+    assert response.get_json()["order"]["status"] == "PENDING"
+    assert matching_engine.symbols() == {"AAPL"}
+
+    assert matching_engine.match("AAPL", 141.0) == []
+    matched = matching_engine.match("AAPL", 139.0)
+    assert matched == [order_id]
+
+    with app.app_context():
+        filled = matching_engine.execute(matched, 139.0)
+        assert [order.id for order in filled] == [order_id]
+        order = db.session.get(Order, order_id)
+        assert order.status == "FILLED"
+        assert order.price == Decimal("139.0000")
+
+        position = db.session.execute(db.select(Position).filter_by(symbol="AAPL")).scalar_one()
+        assert position.quantity == 10
+        account = db.session.get(Account, order.account_id)
+        assert account.cash_balance == Decimal("100000") - Decimal("1390")
+
+
+def test_resting_stop_sell_is_rejected_without_shares(app, client, authenticated_user, mock_quote, mock_market_open, mock_company_name):
+    client.post("/api/orders", json={"symbol": "AAPL", "side": "BUY", "quantity": 5})
+    response = client.post(
+        "/api/orders",
+        json={"symbol": "AAPL", "side": "SELL", "quantity": 5, "order_type": "STOP", "stop_price": 140},
+    )
+    order_id = response.get_json()["order"]["id"]
+    client.post("/api/orders", json={"symbol": "AAPL", "side": "SELL", "quantity": 5})
+
+    with app.app_context():
+        matching_engine.execute(matching_engine.match("AAPL", 139.0), 139.0)
+        order = db.session.get(Order, order_id)
+        assert order.status == "REJECTED"
+        assert order.status_text == "Insufficient shares"
+
+
+def test_closed_market_keeps_the_order_resting(app, client, authenticated_user, mock_quote, mock_market_open, mock_company_name):
+    mock_market_open.return_value = False
+    response = client.post(
+        "/api/orders",
+        json={"symbol": "AAPL", "side": "BUY", "quantity": 1, "order_type": "LIMIT", "limit_price": 155},
+    )
+    order_id = response.get_json()["order"]["id"]
+    assert response.get_json()["order"]["status"] == "PENDING"
+
+    with app.app_context():
+        assert matching_engine.execute(matching_engine.match("AAPL", 150.0), 150.0) == []
+        assert db.session.get(Order, order_id).status == "PENDING"
+        # The processor leaves resting orders to the engine
+        assert matching_engine.load() == 1
+    assert matching_engine.match("AAPL", 150.0) == [order_id]
+
+
+def test_out_of_session_ticks_leave_the_book_alone(app, mock_market_open, monkeypatch):
+    engine = MatchingEngine()
+    engine.app = app
+    engine.add(1, "AAPL", "BUY", "LIMIT", 155)
+    submitted = []
+    monkeypatch.setattr(engine._executor, "submit", lambda *args: submitted.append(args))
+
+    mock_market_open.return_value = False
+    engine.on_tick("AAPL", 150.0)
+    assert len(engine) == 1
+    assert submitted == []
+
+    mock_market_open.return_value = True
+    engine.on_tick("AAPL", 150.0)
+    assert len(engine) == 0
+    assert submitted == [(engine._execute_in_app, [1], 150.0)]
@@ -0,0 +1,177 @@
+"""
+Tests for schema migrations and the query plans of the hot order/position paths
+"""
+import os
+
+import pytest
+from sqlalchemy import create_engine, inspect, select, text
+
+from app.migrations import MIGRATIONS, migrate
+from app.models import Lot, Order, Position
+
+# Orders seeded for the query-plan checks
+QUERY_PLAN_ORDERS = int(os.environ.get("QUERY_PLAN_ORDERS", "2000000"))
+ACCOUNTS = 5000
+
+# Tables as the original db.create_all() built them: no secondary indexes,
+# no LIMIT/STOP columns, nothing stopping duplicate positions
+LEGACY_SCHEMA = [
+    """CREATE TABLE users (
+        id INTEGER PRIMARY KEY, email VARCHAR(255) NOT NULL UNIQUE,
+        password_hash VARCHAR(255) NOT NULL, created_at DATETIME NOT NULL)""",
+    """CREATE TABLE accounts (
+        id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id),
+        starting_balance NUMERIC(14, 2) NOT NULL, cash_balance NUMERIC(14, 2) NOT NULL,
+        created_at DATETIME NOT NULL)""",
+    """CREATE TABLE positions (
+        id INTEGER PRIMARY KEY, account_id INTEGER NOT NULL REFERENCES accounts (id),
+        symbol VARCHAR(16) NOT NULL, quantity INTEGER NOT NULL, avg_price NUMERIC(14, 4) NOT NULL)""",
+    """CREATE TABLE orders (
+        id INTEGER PRIMARY KEY, account_id INTEGER NOT NULL REFERENCES accounts (id),
+        symbol VARCHAR(16) NOT NULL, side VARCHAR(4) NOT NULL, quantity INTEGER NOT NULL,
+        price NUMERIC(14, 4) NOT NULL, status VARCHAR(16) NOT NULL, created_at DATETIME NOT NULL,
+        stop_loss_price NUMERIC(10, 4), take_profit_price NUMERIC(10, 4), exchange VARCHAR(16),
+        currency VARCHAR(16), status_text VARCHAR(16))""",
+]
+
+SEED_ORDERS = """
+WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :rows)
+INSERT INTO orders (account_id, symbol, side, quantity, price, status, created_at, status_text)
+SELECT i % :accounts + 1,
+       CASE i % 4 WHEN 0 THEN 'AAPL' WHEN 1 THEN 'MSFT' WHEN 2 THEN 'NVDA' ELSE 'AMZN' END,
+       CASE WHEN i % 3 THEN 'BUY' ELSE 'SELL' END,
+       1, 100.0,
+       CASE WHEN i % 1000 THEN 'FILLED' ELSE 'PENDING' END,
+       '2026-01-01 00:00:00',
+       CASE WHEN i % 7 THEN 'CLOSED' ELSE 'OPEN' END
+FROM n
+"""
+
+
+def _legacy_engine():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+    return engine
+
+
+@pytest.fixture(autouse=True)
+def lock_path(monkeypatch, tmp_path):
+    monkeypatch.setenv("MIGRATIONS_LOCK_PATH", str(tmp_path / "migrations.lock"))
+
+
+def test_upgrades_a_create_all_database(lock_path):
+    engine = _legacy_engine()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users VALUES (1, 'a@example.com', 'x', '2026-01-01')"))
+        conn.execute(text("INSERT INTO accounts VALUES (1, 1, 1000, 1000, '2026-01-01')"))
+        conn.execute(text("INSERT INTO positions (account_id, symbol, quantity, avg_price) VALUES "
+                          "(1, 'AAPL', 10, 100), (1, 'AAPL', 30, 200), (1, 'MSFT', 5, 300)"))
+        conn.execute(text("INSERT INTO orders (account_id, symbol, side, quantity, price, status, created_at) "
+                          "VALUES (1, 'AAPL', 'BUY', 10, 100, 'FILLED', '2026-01-01')"))
+
+    assert migrate(engine) == [version for version, _, _ in MIGRATIONS]
+    assert migrate(engine) == []
+
+    inspector = inspect(engine)
+    assert {"order_type", "limit_price", "stop_price"} <= {c["name"] for c in inspector.get_columns("orders")}
+    assert inspector.has_table("securities")
+    assert {"ix_orders_status", "ix_orders_account_status", "ix_orders_account_id",
+            "ix_orders_account_symbol_side_status_text"} <= {i["name"] for i in inspector.get_indexes("orders")}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT order_type FROM orders")).scalar() == "MARKET"
+        # Duplicate positions were merged at their weighted average price
+        positions = conn.execute(text("SELECT symbol, quantity, avg_price FROM positions ORDER BY symbol")).all()
+    assert [(symbol, quantity, float(avg_price)) for symbol, quantity, avg_price in positions] == [
+        ("AAPL", 40, 175.0), ("MSFT", 5, 300.0),
+    ]
+
+
+def test_backfills_lots_from_open_buys(lock_path):
+    engine = _legacy_engine()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users VALUES (1, 'a@example.com', 'x', '2026-01-01')"))
+        conn.execute(text("INSERT INTO accounts VALUES (1, 1, 1000, 1000, '2026-01-01')"))
+        # 30 bought over three orders, 15 sold without closing any of them
+        conn.execute(text("INSERT INTO positions (account_id, symbol, quantity, avg_price) VALUES (1, 'AAPL', 15, 110)"))
+        conn.execute(text(
+            "INSERT INTO orders (id, account_id, symbol, side, quantity, price, status, created_at, status_text) VALUES "
+            "(1, 1, 'AAPL', 'BUY', 10, 100, 'FILLED', '2026-01-01', 'OPEN'), "
+            "(2, 1, 'AAPL', 'BUY', 10, 110, 'FILLED', '2026-01-02', 'OPEN'), "
+            "(3, 1, 'AAPL', 'BUY', 10, 120, 'FILLED', '2026-01-03', 'OPEN')"
+        ))
+        # Held without any BUY order on record
+        conn.execute(text("INSERT INTO positions (account_id, symbol, quantity, avg_price) VALUES (1, 'MSFT', 5, 300)"))
+    migrate(engine)
+
+    with engine.connect() as conn:
+        lots = conn.execute(text("SELECT symbol, buy_order_id, remaining, price FROM lots ORDER BY id")).all()
+        status = dict(conn.execute(text("SELECT id, status_text FROM orders")).all())
+    assert [(symbol, buy_order_id, remaining, float(price)) for symbol, buy_order_id, remaining, price in lots] == [
+        ("AAPL", 2, 5, 110.0), ("AAPL", 3, 10, 120.0), ("MSFT", None, 5, 300.0),
+    ]
+    assert status == {1: "CLOSED", 2: "OPEN", 3: "OPEN"}
+
+
+def test_fresh_database_migrates_to_the_model_schema(lock_path):
+    engine = create_engine("sqlite://")
+    migrate(engine)
+    indexes = {i["name"]: i for i in inspect(engine).get_indexes("positions")}
+    assert indexes["uq_positions_account_symbol"]["unique"]
+
+
+@pytest.fixture(scope="module")
+def seeded_engine(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("MIGRATIONS_LOCK_PATH", str(tmp_path_factory.mktemp("plans") / "migrations.lock"))
+        engine = _legacy_engine()
+        with engine.begin() as conn:
+            conn.execute(text(SEED_ORDERS), {"rows": QUERY_PLAN_ORDERS, "accounts": ACCOUNTS})
+            conn.execute(text(
+                "INSERT INTO positions (account_id, symbol, quantity, avg_price) "
+                "SELECT DISTINCT account_id, symbol, 1, 100.0 FROM orders"
+            ))
+        migrate(engine)
+    return engine
+
+
+HOT_QUERIES = {
+    # process_pending_orders
+    "pending orders": (select(Order.id).where(Order.status == "PENDING"), "ix_orders_status"),
+    # /api/orders
+    "order history": (
+        select(Order).where(Order.account_id == 42).order_by(Order.id.desc()).limit(50),
+        "ix_orders_account_id",
+    ),
+    "account pending orders": (
+        select(Order).where(Order.account_id == 42, Order.status == "PENDING"),
+        "ix_orders_account_status",
+    ),
+    # A holding's OPEN buy orders
+    "open buys": (
+        select(Order).where(
+            Order.account_id == 42, Order.symbol == "AAPL", Order.side == "BUY", Order.status_text == "OPEN"
+        ).order_by(Order.id),
+        "ix_orders_account_symbol_side_status_text",
+    ),
+    # Sells and the portfolio breakdown
+    "open lots": (
+        select(Lot).where(Lot.account_id == 42, Lot.symbol == "AAPL", Lot.closed_at.is_(None)).order_by(Lot.id),
+        "ix_lots_open",
+    ),
+    "position lookup": (
+        select(Position).where(Position.account_id == 42, Position.symbol == "AAPL"),
+        "uq_positions_account_symbol",
+    ),
+}
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_queries_use_their_index(seeded_engine, name):
+    query, index = HOT_QUERIES[name]
+    sql = str(query.compile(seeded_engine, compile_kwargs={"literal_binds": True}))
+    with seeded_engine.connect() as conn:
+        plan = " | ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+        assert f"INDEX {index}" in plan, plan
+        assert "TEMP B-TREE" not in plan, plan
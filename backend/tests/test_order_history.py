@@ -0,0 +1,70 @@
+"""
+Tests for paginated and streamed /api/orders history
+"""
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from app.extensions import db
+from app.models import Account, Order
+
+
+def _seed_orders(app, user_id, count=25):
+    """Orders alternate AAPL BUY / MSFT SELL, one per day from 2026-01-01."""
+    with app.app_context():
+        account = Account.query.filter_by(user_id=user_id).first()
+        db.session.add_all(
+            Order(
+                account_id=account.id,
+                symbol="AAPL" if i % 2 == 0 else "MSFT",
+                side="BUY" if i % 2 == 0 else "SELL",
+                quantity=1,
+                price=Decimal("100"),
+                status="PENDING" if i % 5 == 0 else "FILLED",
+                created_at=datetime(2026, 1, 1 + i, 15, 30),
+            )
+            for i in range(count)
+        )
+        db.session.commit()
+        return [order.id for order in account.orders.order_by(Order.id.desc())]
+
+
+def test_pages_walk_the_whole_history_newest_first(app, client, authenticated_user):
+    ids = _seed_orders(app, authenticated_user["user_id"])
+    seen, before_id = [], None
+    while True:
+        url = "/api/orders?limit=10" + (f"&before_id={before_id}" if before_id else "")
+        body = client.get(url).get_json()
+        seen += [order["id"] for order in body["orders"]]
+        before_id = body["next_before_id"]
+        if before_id is None:
+            break
+    assert seen == ids
+
+
+def test_filters_by_symbol_side_status_and_date(app, client, authenticated_user):
+    _seed_orders(app, authenticated_user["user_id"])
+    orders = client.get("/api/orders?symbol=msft&side=SELL").get_json()["orders"]
+    assert len(orders) == 12 and {order["symbol"] for order in orders} == {"MSFT"}
+
+    assert len(client.get("/api/orders?status=PENDING").get_json()["orders"]) == 5
+
+    # Bare dates cover the whole day
+    orders = client.get("/api/orders?start=2026-01-03&end=2026-01-05").get_json()["orders"]
+    assert [order["created_at"][:10] for order in orders] == ["2026-01-05", "2026-01-04", "2026-01-03"]
+    orders = client.get("/api/orders?end=2026-01-02T12:00:00Z").get_json()["orders"]
+    assert [order["created_at"][:10] for order in orders] == ["2026-01-01"]
+
+
+def test_ndjson_export_streams_every_matching_order(app, client, authenticated_user):
+    ids = _seed_orders(app, authenticated_user["user_id"], count=30)
+    response = client.get("/api/orders?format=ndjson")
+    assert response.mimetype == "application/x-ndjson"
+    assert response.is_streamed
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ids
+
+
+def test_rejects_bad_arguments(client, authenticated_user):
+    for query in ("limit=0", "limit=ten", "before_id=abc", "side=HOLD", "start=yesterday"):
+        assert client.get(f"/api/orders?{query}").status_code == 400, query
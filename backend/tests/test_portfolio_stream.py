@@ -0,0 +1,90 @@
+"""
+Tests for the /api/portfolio/stream Server-Sent Events feed
+"""
+import json
+
+from app.portfolio_stream import PortfolioStream, portfolio_stream
+
+
+def _next_event(chunks) -> dict:
+    """Read chunks until a complete event (not a comment or retry hint) has arrived."""
+    for chunk in chunks:
+        text = chunk.decode() if isinstance(chunk, bytes) else chunk
+        fields = {}
+        for line in text.strip().splitlines():
+            name, _, value = line.partition(": ")
+            fields[name] = value
+        if "event" in fields:
+            fields["data"] = json.loads(fields["data"])
+            return fields
+    raise AssertionError("stream ended")
+
+
+class TestPortfolioStream:
+    def test_resume_replays_only_relevant_events(self):
+        stream = PortfolioStream()
+        subscriber, event_id, replay = stream.subscribe(1, ["AAPL"])
+        assert replay is None
+
+        stream.on_tick("AAPL", 150.0)
+        stream.on_tick("MSFT", 300.0)
+        stream.on_tick("AAPL", 150.0)  # unchanged price, not published
+        stream.publish_fills([2])
+        assert subscriber.queue.qsize() == 1
+        stream.unsubscribe(subscriber)
+
+        _, _, replay = stream.subscribe(1, ["AAPL"], last_event_id=event_id)
+        assert [(kind, key, value) for kind, _, key, value in replay] == [("tick", "AAPL", 150.0)]
+
+    def test_unknown_event_id_starts_over(self):
+        stream = PortfolioStream()
+        _, _, replay = stream.subscribe(1, [], last_event_id="deadbeef-3")
+        assert replay is None
+
+    def test_event_ids_from_another_worker_start_over(self):
+        # Workers started in the same second must still not accept each other's ids
+        other, stream = PortfolioStream(), PortfolioStream()
+        other.on_tick("AAPL", 150.0)
+        _, _, replay = stream.subscribe(1, ["AAPL"], last_event_id=other.event_id(1))
+        assert replay is None
+
+
+def test_stream_sends_snapshot_then_position_deltas(client, authenticated_user, mock_quote, mock_market_open, mock_company_name):
+    client.post("/api/orders", json={"symbol": "AAPL", "side": "BUY", "quantity": 10})
+
+    response = client.get("/api/portfolio/stream", buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    chunks = iter(response.response)
+    try:
+        snapshot = _next_event(chunks)
+        assert snapshot["event"] == "snapshot"
+        assert snapshot["data"]["portfolio"][0]["symbol"] == "AAPL"
+
+        portfolio_stream.on_tick("AAPL", 160.0)
+        position = _next_event(chunks)
+        assert position["event"] == "position"
+        assert position["data"]["market_price"] == 160.0
+        assert position["data"]["unrealized_pnl"] == 100.0
+
+        portfolio_stream.publish_fills([1])
+        refreshed = _next_event(chunks)
+        assert refreshed["event"] == "snapshot"
+        assert refreshed["id"] != snapshot["id"]
+    finally:
+        response.close()
+    assert portfolio_stream.subscriber_count() == 0
+
+
+def test_fills_are_published_after_commit(client, authenticated_user, mock_quote, mock_market_open, mock_company_name):
+    subscriber, _, _ = portfolio_stream.subscribe(1, [])
+    try:
+        client.post("/api/orders", json={"symbol": "AAPL", "side": "BUY", "quantity": 1})
+        kind, _, account_id, _ = subscriber.queue.get_nowait()
+        assert (kind, account_id) == ("fill", 1)
+    finally:
+        portfolio_stream.unsubscribe(subscriber)
+
+
+def test_stream_requires_auth(client):
+    assert client.get("/api/portfolio/stream").status_code == 401
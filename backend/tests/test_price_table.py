@@ -0,0 +1,127 @@
+"""
+Tests for the price table shared between gunicorn workers
+"""
+import fcntl
+import os
+import struct
+import time
+
+import pytest
+
+from app.price_table import SharedPriceTable
+from app.websocket_manager import ws_manager
+
+
+@pytest.fixture()
+def table_path(tmp_path):
+    return str(tmp_path / "prices")
+
+
+def test_prices_written_by_one_process_are_read_by_another(table_path):
+    feeder = SharedPriceTable(table_path, capacity=8)
+    feeder.register("AAPL")
+
+    pid = os.fork()
+    if pid == 0:
+        # Child: a second worker mapping the same file publishes a tick
+        child = SharedPriceTable(table_path, capacity=8)
+        child.write("MSFT", 412.5, updated_at=1000.0)
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert feeder.symbols() == ["AAPL", "MSFT"]
+    assert feeder.read("MSFT") == (412.5, 1000.0)
+    assert feeder.read("AAPL") == (0.0, None)
+    assert feeder.read("NVDA") == (0.0, None)
+    assert feeder.ticks() == 1
+
+
+def test_register_is_idempotent_and_bounded(table_path):
+    table = SharedPriceTable(table_path, capacity=2)
+    other = SharedPriceTable(table_path, capacity=2)
+    assert table.register("AAPL") == other.register("AAPL") == 0
+    assert other.register("MSFT") == 1
+    with pytest.raises(RuntimeError):
+        table.register("NVDA")
+
+
+def test_reader_never_sees_a_half_written_slot(table_path):
+    table = SharedPriceTable(table_path, capacity=4)
+    table.write("AAPL", 190.0, updated_at=1.0)
+    offset = table._slot_offset(table.index_of("AAPL"))
+
+    # Writer stopped mid-update: the slot stays unreadable until the seq is even again
+    struct.pack_into("<Q", table._map, offset, 3)
+    with pytest.raises(RuntimeError):
+        table.read("AAPL")
+
+    table.write("AAPL", 191.0, updated_at=2.0)
+    assert table.read("AAPL") == (191.0, 2.0)
+
+
+def test_changed_since_reports_each_tick_once(table_path):
+    table = SharedPriceTable(table_path, capacity=4)
+    seen = {}
+    table.write("AAPL", 190.0)
+    table.write("MSFT", 410.0)
+    assert sorted(table.changed_since(seen)) == [("AAPL", 190.0), ("MSFT", 410.0)]
+    assert table.changed_since(seen) == []
+    table.write("AAPL", 191.0)
+    assert table.changed_since(seen) == [("AAPL", 191.0)]
+
+
+def test_manager_reads_prices_from_the_table(table_path):
+    table = SharedPriceTable(table_path)
+    ws_manager.table = table
+    try:
+        table.write("AAPL", 190.0, updated_at=1700000000.0)
+        assert ws_manager.get_price("AAPL") == 190.0
+        assert ws_manager.get_last_update("AAPL").timestamp() == 1700000000.0
+        assert ws_manager.get_last_update("MSFT") is None
+
+        # Followers only register new symbols; the feeder subscribes them upstream
+        ws_manager.subscribe("NVDA")
+        assert "NVDA" in table.symbols()
+    finally:
+        ws_manager.table = None
+        ws_manager.subscribed_symbols.discard("NVDA")
+
+
+def test_full_table_never_fails_a_subscribe_or_tick(table_path):
+    table = SharedPriceTable(table_path, capacity=1)
+    ws_manager.table = table
+    try:
+        ws_manager.subscribe("AAPL")
+        ws_manager.subscribe("MSFT")
+        ws_manager.subscribe("A" * 40)
+        ws_manager.handle_message({"id": "NVDA", "price": 120.0})
+        assert table.symbols() == ["AAPL"]
+        assert "MSFT" not in ws_manager.subscribed_symbols
+        assert ws_manager.price_cache["NVDA"] == 120.0
+    finally:
+        ws_manager.table = None
+        ws_manager.subscribed_symbols.discard("AAPL")
+        ws_manager.price_cache.pop("NVDA", None)
+        ws_manager.last_update.pop("NVDA", None)
+
+
+def test_feeder_resigns_when_its_websocket_dies(table_path, monkeypatch):
+    async def broken_websocket():
+        raise ConnectionError("socket closed")
+
+    ws_manager.table = SharedPriceTable(table_path)
+    monkeypatch.setattr(ws_manager, "_run_websocket", broken_websocket)
+    try:
+        assert ws_manager._try_become_feeder()
+        ws_manager._start_websocket([])
+        for _ in range(200):
+            if not ws_manager.is_feeder:
+                break
+            time.sleep(0.01)
+        assert not ws_manager.is_feeder
+        # Another worker can take the feed over
+        with open(f"{table_path}.feeder", "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    finally:
+        ws_manager._resign_feeder()
+        ws_manager.table = None
@@ -0,0 +1,198 @@
+"""
+Tests for the shared quote cache: TTLs, stale-while-revalidate and request coalescing
+"""
+import threading
+import time
+
+import pytest
+
+from app.quote_cache import QuoteCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_fresh_entry_is_served_from_cache(clock):
+    cache = QuoteCache(ttls={"quote": (5.0, 0.0)}, clock=clock)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"price": 150.0}
+
+    assert cache.get("quote", "AAPL", loader) == {"price": 150.0}
+    clock.now += 4
+    assert cache.get("quote", "AAPL", loader) == {"price": 150.0}
+
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+
+def test_expired_entry_is_reloaded(clock):
+    cache = QuoteCache(ttls={"quote": (5.0, 0.0)}, clock=clock)
+    prices = iter([150.0, 151.0])
+
+    assert cache.get("quote", "AAPL", lambda: next(prices)) == 150.0
+    clock.now += 6
+    assert cache.get("quote", "AAPL", lambda: next(prices)) == 151.0
+    assert cache.stats()["misses"] == 2
+
+
+def test_stale_entry_is_served_while_refreshing(clock):
+    cache = QuoteCache(ttls={"quote": (5.0, 60.0)}, clock=clock)
+    refreshed = threading.Event()
+
+    cache.get("quote", "AAPL", lambda: 150.0)
+    clock.now += 10
+
+    def slow_loader():
+        refreshed.set()
+        return 151.0
+
+    # Returns the old value immediately and refreshes in the background
+    assert cache.get("quote", "AAPL", slow_loader) == 150.0
+    assert refreshed.wait(timeout=2)
+    for _ in range(100):
+        if cache.stats()["in_flight"] == 0:
+            break
+        time.sleep(0.01)
+    assert cache.get("quote", "AAPL", lambda: 999.0) == 151.0
+    assert cache.stats()["stale"] == 1
+
+
+
+def test_pricing_callers_skip_the_stale_window(clock):
+    cache = QuoteCache(ttls={"quote": (5.0, 55.0)}, clock=clock)
+    cache.get("quote", "AAPL", lambda: 150.0)
+    clock.now += 30
+
+    # A fill must not be priced at a 30 s old quote; display reads may still show it
+    assert cache.get("quote", "AAPL", lambda: 151.0, serve_stale=False) == 151.0
+    clock.now += 30
+    assert cache.get("quote", "AAPL", lambda: 999.0) == 151.0
+    assert cache.stats()["misses"] == 2
+
+
+def test_concurrent_misses_are_coalesced():
+    cache = QuoteCache(ttls={"quote": (5.0, 0.0)})
+    release = threading.Event()
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        release.wait(timeout=5)
+        return {"price": 150.0}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get("quote", "AAPL", slow_loader)))
+        for _ in range(50)
+    ]
+    for thread in threads:
+        thread.start()
+    # Let every thread reach the cache before the upstream call returns
+    for _ in range(200):
+        if cache.stats()["coalesced"] == 49:
+            break
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(calls) == 1
+    assert len(results) == 50
+    assert all(result == {"price": 150.0} for result in results)
+    assert cache.stats()["coalesced"] == 49
+
+
+def test_loader_errors_propagate_and_are_not_cached(clock):
+    cache = QuoteCache(ttls={"quote": (5.0, 0.0)}, clock=clock)
+
+    def failing_loader():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        cache.get("quote", "AAPL", failing_loader)
+    assert cache.get("quote", "AAPL", lambda: 150.0) == 150.0
+    assert cache.stats()["errors"] == 1
+
+
+def test_failed_reload_serves_last_good_value_marked_stale(clock):
+    cache = QuoteCache(ttls={"quote": (5.0, 0.0)}, clock=clock)
+    cache.get("quote", "AAPL", lambda: {"price": 150.0})
+    clock.now += 3600
+
+    def failing_loader():
+        raise RuntimeError("upstream down")
+
+    # Opt-in only: pricing paths must see the failure
+    with pytest.raises(RuntimeError):
+        cache.get("quote", "AAPL", failing_loader)
+    assert cache.get("quote", "AAPL", failing_loader, fallback=True) == {"price": 150.0, "stale": True}
+    assert cache.get("quote", "AAPL", lambda: {"price": 151.0}) == {"price": 151.0}
+    assert cache.stats()["fallbacks"] == 1
+
+
+
+def test_capped_field_evicts_least_recently_used(clock):
+    cache = QuoteCache(ttls={"search": (60.0, 0.0)}, clock=clock, max_entries={"search": 2})
+    cache.get("search", "a", lambda: ["A"])
+    cache.get("search", "b", lambda: ["B"])
+    cache.get("search", "a", lambda: ["unused"])
+    cache.get("search", "c", lambda: ["C"])
+
+    assert cache.peek("search", "a") == ["A"]
+    assert cache.peek("search", "b") is None
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evicted"] == 1
+    # Uncapped fields are untouched
+    for symbol in "DEF":
+        cache.get("quote", symbol, lambda: 1.0)
+    assert cache.stats()["entries"] == 5
+
+
+def test_fetch_quote_uses_cache_in_mock_mode(monkeypatch):
+    from app import market_data
+    from app.quote_cache import quote_cache
+
+    monkeypatch.setenv("MARKET_DATA_MOCK", "true")
+    quote_cache.clear()
+
+    first = market_data.fetch_quote("aapl")
+    second = market_data.fetch_quote("AAPL")
+
+    assert first == second
+    assert first["symbol"] == "AAPL"
+    assert quote_cache.stats()["misses"] == 1
+    assert quote_cache.stats()["hits"] == 1
+
+
+def test_fetch_quotes_dedupes_and_skips_failures(monkeypatch):
+    from app import market_data
+
+    calls = []
+
+    def fake_fetch_quote(symbol, allow_stale=False):
+        calls.append(symbol)
+        if symbol == "BAD":
+            raise RuntimeError("no data")
+        return {"symbol": symbol, "price": 100.0}
+
+    monkeypatch.setattr(market_data, "fetch_quote", fake_fetch_quote)
+
+    quotes = market_data.fetch_quotes(["aapl", "AAPL", "MSFT", "BAD", ""])
+
+    assert set(quotes) == {"AAPL", "MSFT"}
+    assert sorted(calls) == ["AAPL", "BAD", "MSFT"]
@@ -0,0 +1,116 @@
+"""
+Tests for the security master (static per-symbol metadata)
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+from app import create_app, security_master
+from app.extensions import db
+from app.models import Security
+
+
+def _profiles(symbols):
+    return {symbol: {"symbol": symbol, "name": f"{symbol} Corp", "exchange": "NMS"} for symbol in symbols}
+
+
+@pytest.fixture()
+def file_app(monkeypatch, tmp_path):
+    # A file database: the in-memory one shares a single connection between sessions
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'securities.db'}")
+    monkeypatch.setenv("BAR_STORE_PATH", ":memory:")
+    monkeypatch.setenv("JWT_SECRET_KEY", "test-jwt-secret-key-with-minimum-32-chars-for-security")
+    app = create_app(config={"TESTING": True})
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_unseen_symbols_are_filled_once(app):
+    with app.app_context(), patch("app.security_master.fetch_company_profiles", side_effect=_profiles) as upstream:
+        first = security_master.company_names(["aapl", "MSFT"])
+        assert first == {"AAPL": "AAPL Corp", "MSFT": "MSFT Corp"}
+        assert upstream.call_count == 1
+
+        # Served from memory, then from the table after the map is dropped
+        security_master.company_names(["AAPL", "MSFT"])
+        security_master.init_app(app)
+        again = security_master.get_securities(["AAPL"])
+        assert again["AAPL"]["exchange"] == "NMS"
+        assert upstream.call_count == 1
+
+
+def test_failed_lookup_falls_back_to_symbol(app):
+    with app.app_context(), patch("app.security_master.fetch_company_profiles", return_value={}):
+        assert security_master.company_names(["ZZZZ"]) == {"ZZZZ": "ZZZZ"}
+        assert db.session.execute(db.select(Security).filter_by(symbol="ZZZZ")).scalar_one().name is None
+
+
+def test_record_security_needs_no_upstream_call(app):
+    with app.app_context(), patch("app.security_master.fetch_company_profiles") as upstream:
+        security_master.record_security("AAPL", name="Apple Inc.", exchange="NMS", currency="USD")
+        db.session.commit()
+        assert security_master.company_names(["AAPL"]) == {"AAPL": "Apple Inc."}
+        upstream.assert_not_called()
+
+
+def test_refresh_updates_stale_rows(app):
+    with app.app_context():
+        db.session.add(Security(symbol="AAPL", name=None, updated_at=datetime(1970, 1, 1)))
+        db.session.add(
+            Security(symbol="MSFT", name="Microsoft", updated_at=datetime.now(timezone.utc) - timedelta(hours=1))
+        )
+        db.session.commit()
+
+        with patch("app.security_master.fetch_company_profiles", side_effect=_profiles) as upstream:
+            assert security_master.refresh_securities() == 1
+            upstream.assert_called_once_with(["AAPL"])
+
+        assert security_master.get_security("AAPL")["name"] == "AAPL Corp"
+
+
+def test_failed_refresh_backs_off(app):
+    with app.app_context():
+        # A lookup that failed when the symbol was first seen is retried on the next run
+        with patch("app.security_master.fetch_company_profiles", return_value={}):
+            security_master.get_securities(["ZZZZ"])
+        with patch("app.security_master.fetch_company_profiles", return_value={}) as upstream:
+            assert security_master.refresh_securities() == 0
+            upstream.assert_called_once_with(["ZZZZ"])
+            # ... but not on every run after that
+            assert security_master.refresh_securities() == 0
+            upstream.assert_called_once()
+
+        row = db.session.execute(db.select(Security).filter_by(symbol="ZZZZ")).scalar_one()
+        row.updated_at -= security_master.RETRY_AFTER
+        db.session.commit()
+        with patch("app.security_master.fetch_company_profiles", side_effect=_profiles):
+            assert security_master.refresh_securities() == 1
+
+
+def test_portfolio_makes_no_upstream_name_lookups(client, authenticated_user, mock_quote, mock_market_open):
+    client.post("/api/orders", json={"symbol": "AAPL", "side": "BUY", "quantity": 10})
+
+    with patch("app.security_master.fetch_company_profiles") as upstream:
+        response = client.get("/api/portfolio")
+
+    assert response.status_code == 200
+    assert response.get_json()["portfolio"][0]["company_name"] == "AAPL"
+    upstream.assert_not_called()
+
+
+def test_filling_leaves_the_callers_session_alone(file_app):
+    with file_app.app_context(), patch("app.security_master.fetch_company_profiles", side_effect=_profiles):
+        pending = Security(symbol="PEND", name="Pending Corp")
+        db.session.add(pending)
+
+        assert security_master.company_names(["AAPL"]) == {"AAPL": "AAPL Corp"}
+        # The caller's work is neither flushed, committed nor discarded
+        assert pending in db.session.new
+
+        db.session.rollback()
+        assert [row.symbol for row in Security.query.all()] == ["AAPL"]
@@ -0,0 +1,123 @@
+"""
+Tests for the local symbol search index
+"""
+import threading
+import time
+from unittest.mock import patch
+
+from app.extensions import db
+from app.models import Security, WatchlistItem
+from app.quote_cache import quote_cache
+from app.symbol_index import SymbolIndex, _learn_pool, search_symbols, symbol_index
+
+SECURITIES = [
+    ("AAPL", "Apple Inc.", "NMS"),
+    ("AMZN", "Amazon.com, Inc.", "NMS"),
+    ("AMD", "Advanced Micro Devices, Inc.", "NMS"),
+    ("MSFT", "Microsoft Corporation", "NMS"),
+    ("A", "Agilent Technologies, Inc.", "NYQ"),
+    ("BP.L", "BP p.l.c.", "LSE"),
+]
+
+
+def _index(popularity=None):
+    index = SymbolIndex()
+    index.build(SECURITIES, popularity)
+    return index
+
+
+def _symbols(results):
+    return [result["symbol"] for result in results]
+
+
+class TestSymbolIndex:
+    def test_exact_symbol_then_popular_prefix_matches(self):
+        index = _index({"AMZN": 5, "AMD": 1})
+        assert _symbols(index.lookup("a", limit=4)) == ["A", "AMZN", "AMD", "AAPL"]
+        assert _symbols(index.lookup("am")) == ["AMZN", "AMD"]
+
+    def test_matches_company_name_words_and_exchange_suffix(self):
+        index = _index()
+        assert _symbols(index.lookup("micro")) == ["AMD", "MSFT"]
+        assert _symbols(index.lookup("advanced micro")) == ["AMD"]
+        assert _symbols(index.lookup("bp")) == ["BP.L"]
+        assert index.lookup("apple")[0] == {
+            "symbol": "AAPL", "shortName": "Apple Inc.", "longName": "Apple Inc.", "exchange": "NMS",
+        }
+
+    def test_boosted_symbols_rank_ahead_of_popularity(self):
+        index = _index({"AMZN": 5})
+        assert _symbols(index.lookup("am", boosted={"amd"})) == ["AMD", "AMZN"]
+
+    def test_fuzzy_fallback_for_typos(self):
+        assert _symbols(_index().lookup("microsft"))[0] == "MSFT"
+
+    def test_thousands_of_entries_stay_fast(self):
+        index = SymbolIndex()
+        index.build([(f"S{i:05d}", f"Company {i} Holdings", "NMS") for i in range(20000)])
+        start = time.perf_counter()
+        for _ in range(100):
+            results = index.lookup("company 1", limit=10)
+        assert len(results) == 10
+        assert (time.perf_counter() - start) / 100 < 0.005
+
+
+def test_search_serves_local_results_without_upstream(app, client):
+    with app.app_context():
+        db.session.add_all(Security(symbol=symbol, name=name, exchange=exchange) for symbol, name, exchange in SECURITIES)
+        db.session.commit()
+
+    release = threading.Event()
+
+    def slow_upstream(query, max_results):
+        release.wait(timeout=5)
+        return [{"symbol": "AMZN.MX", "shortName": "Amazon", "longName": "Amazon.com, Inc.", "exchange": "MEX"}]
+
+    with patch("app.symbol_index.search_stocks", side_effect=slow_upstream) as upstream:
+        # A local match answers at once; upstream is asked in the background
+        start = time.perf_counter()
+        assert _symbols(client.get("/api/search?q=amazon").get_json()["results"]) == ["AMZN"]
+        assert _symbols(client.get("/api/search?q=amazon").get_json()["results"]) == ["AMZN"]
+        assert time.perf_counter() - start < 1
+        release.set()
+        _learn_pool.submit(lambda: None).result(timeout=5)
+        # Once per query, and what it found is learned
+        assert upstream.call_count == 1
+        assert "AMZN.MX" in _symbols(client.get("/api/search?q=amazon").get_json()["results"])
+        assert upstream.call_count == 1
+    quote_cache.clear()
+
+
+def test_upstream_results_are_learned(app):
+    quote_cache.clear()
+    with app.app_context():
+        symbol_index.load()
+    with patch("app.symbol_index.search_stocks") as upstream:
+        upstream.return_value = [{"symbol": "NVDA", "shortName": "NVIDIA", "longName": "NVIDIA Corporation", "exchange": "NMS"}]
+        assert _symbols(search_symbols("nvidia")) == ["NVDA"]
+    assert _symbols(symbol_index.lookup("nvid")) == ["NVDA"]
+
+    # Recorded in the security master, so the periodic rebuild keeps it
+    _learn_pool.submit(lambda: None).result(timeout=5)
+    with app.app_context():
+        symbol_index.load()
+    assert _symbols(symbol_index.lookup("nvid")) == ["NVDA"]
+    quote_cache.clear()
+
+
+def test_held_and_watched_symbols_are_boosted(app, client, authenticated_user):
+    with app.app_context():
+        db.session.add_all(Security(symbol=symbol, name=name, exchange=exchange) for symbol, name, exchange in SECURITIES)
+        # AMZN is more popular overall, but this user watches AMD
+        user_id = authenticated_user["user_id"]
+        db.session.add_all([
+            WatchlistItem(user_id=user_id + 1, symbol="AMZN"),
+            WatchlistItem(user_id=user_id + 2, symbol="AMZN"),
+            WatchlistItem(user_id=user_id, symbol="AMD"),
+        ])
+        db.session.commit()
+    with patch("app.symbol_index.search_stocks", return_value=[]):
+        assert _symbols(client.get("/api/search?q=am").get_json()["results"]) == ["AMD", "AMZN"]
+        client.post("/api/auth/logout")
+        assert _symbols(client.get("/api/search?q=am").get_json()["results"]) == ["AMZN", "AMD"]
+    quote_cache.clear()
@@ -0,0 +1,105 @@
+"""
+Tests for the in-memory revoked-token filter
+"""
+import importlib
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import RevokedToken
+from app.token_blocklist import EVICT_SECONDS, SYNC_SECONDS, TokenBlocklist
+
+# app/__init__ re-exports the token_blocklist singleton under the module's name
+blocklist_module = importlib.import_module("app.token_blocklist")
+
+
+@pytest.fixture()
+def blocklist(app, monkeypatch, tmp_path):
+    monkeypatch.setenv("REVOCATION_MARKER_PATH", str(tmp_path / "revocations"))
+    now = [0.0]
+    blocklist = TokenBlocklist(clock=lambda: now[0])
+    blocklist.init_app(app)
+    blocklist.now = now
+    return blocklist
+
+
+@pytest.fixture()
+def queries(app):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", record)
+        yield statements
+        event.remove(db.engine, "before_cursor_execute", record)
+
+
+def _expires(minutes=15):
+    return datetime.now(timezone.utc) + timedelta(minutes=minutes)
+
+
+def test_unrevoked_tokens_are_answered_from_memory(app, blocklist, queries):
+    with app.app_context():
+        blocklist.revoke("revoked-jti", _expires())
+        assert blocklist.is_revoked("revoked-jti") is True
+        queries.clear()
+        for i in range(100):
+            assert blocklist.is_revoked(f"live-jti-{i}") is False
+        assert queries == []
+
+
+def test_revocations_from_other_workers_are_seen(app, blocklist):
+    other = TokenBlocklist()
+    other.init_app(app)
+    other.marker_path = blocklist.marker_path
+    with app.app_context():
+        assert blocklist.is_revoked("jti-a") is False
+        # Another worker on this host: the marker makes it visible at once
+        other.revoke("jti-a", _expires())
+        assert blocklist.is_revoked("jti-a") is True
+
+        # Another host: only the database row, picked up by the periodic sync
+        db.session.add(RevokedToken(jti="jti-b", expires_at=_expires()))
+        db.session.commit()
+        assert blocklist.is_revoked("jti-b") is False
+        blocklist.now[0] += SYNC_SECONDS
+        assert blocklist.is_revoked("jti-b") is True
+
+
+def test_revocations_survive_restarts(app, blocklist):
+    with app.app_context():
+        blocklist.revoke("jti-a", _expires())
+    restarted = TokenBlocklist()
+    restarted.init_app(app)
+    with app.app_context():
+        assert restarted.is_revoked("jti-a") is True
+        assert len(restarted) == 1
+
+
+def test_hash_collisions_are_confirmed_against_the_database(app, blocklist, monkeypatch):
+    monkeypatch.setattr(blocklist_module, "_hash", lambda jti: 42)
+    with app.app_context():
+        blocklist.revoke("jti-a", _expires())
+        assert blocklist.is_revoked("jti-b") is False
+    assert blocklist.stats()["db_checks"] == 1
+
+
+def test_expired_tokens_are_evicted(app, blocklist):
+    with app.app_context():
+        blocklist.revoke("jti-expired", datetime.now(timezone.utc) - timedelta(seconds=1))
+        blocklist.revoke("jti-live", _expires())
+        blocklist.now[0] += EVICT_SECONDS
+        blocklist.is_revoked("jti-live")
+    assert len(blocklist) == 1
+
+
+def test_marker_file_is_created_on_first_revocation(app, blocklist):
+    assert not os.path.exists(blocklist.marker_path)
+    with app.app_context():
+        blocklist.revoke("jti-a", _expires())
+    assert os.path.exists(blocklist.marker_path)
@@ -0,0 +1,88 @@
+"""
+Tests for the stop-loss / take-profit trigger book
+"""
+from decimal import Decimal
+
+from app.extensions import db
+from app.models import Order, Position
+from app.price_levels import PriceLevels
+from app.trigger_engine import STOP_LOSS, TAKE_PROFIT, TriggerBook, trigger_book
+
+
+class TestPriceLevels:
+    def test_pops_only_crossed_entries(self):
+        levels = PriceLevels()
+        for entry_id, price in [(1, 100.0), (2, 105.0), (3, 110.0)]:
+            levels.add(entry_id, price)
+
+        assert levels.pop_at_or_below(104.0) == [1]
+        assert levels.pop_at_or_above(110.0) == [3]
+        assert len(levels) == 1
+        assert 2 in levels
+
+    def test_re_adding_moves_an_entry(self):
+        levels = PriceLevels()
+        levels.add(1, 100.0)
+        levels.add(1, 120.0)
+        assert levels.pop_at_or_below(110.0) == []
+        assert levels.price_of(1) == 120.0
+        assert levels.remove(1)
+        assert not levels.remove(1)
+
+
+class TestTriggerBook:
+    def test_ticks_fire_only_crossed_thresholds(self):
+        book = TriggerBook()
+        book.upsert(1, "AAPL", Decimal("140"), Decimal("170"))
+        book.upsert(2, "AAPL", Decimal("145"), None)
+
+        assert book.crossed("AAPL", 146.0) == []
+        assert book.crossed("AAPL", 144.0) == [(2, STOP_LOSS)]
+        assert book.crossed("AAPL", 171.0) == [(1, TAKE_PROFIT)]
+        # Order 1's stop-loss went with its take-profit
+        assert book.crossed("AAPL", 100.0) == []
+        assert len(book) == 0
+
+    def test_other_symbols_are_untouched(self):
+        book = TriggerBook()
+        book.upsert(1, "AAPL", Decimal("140"), None)
+        assert book.crossed("MSFT", 1.0) == []
+        assert len(book) == 1
+
+
+def test_crossed_stop_loss_sells_the_buy_order(app, client, authenticated_user, mock_quote, mock_market_open, mock_company_name):
+    buy = client.post("/api/orders", json={"symbol": "AAPL", "side": "BUY", "quantity": 10})
+    buy_id = buy.get_json()["order"]["id"]
+
+    response = client.post(
+        "/api/portfolio/breakdown/thresholds",
+        json={"id": buy_id, "stop_loss_price": 140, "take_profit_price": 170},
+    )
+    assert response.status_code == 200
+    assert trigger_book.symbols() == {"AAPL"}
+
+    fired = trigger_book.crossed("AAPL", 139.5)
+    assert fired == [(buy_id, STOP_LOSS)]
+
+    with app.app_context():
+        sell_orders = trigger_book.execute(fired, 139.5)
+        assert len(sell_orders) == 1
+        assert sell_orders[0].status == "FILLED"
+
+        buy_order = db.session.get(Order, buy_id)
+        assert buy_order.status_text == "CLOSED"
+        assert db.session.execute(db.select(Position).filter_by(symbol="AAPL")).scalar_one_or_none() is None
+
+
+def test_book_is_rebuilt_from_the_database(app, client, authenticated_user, mock_quote, mock_market_open, mock_company_name):
+    buy = client.post("/api/orders", json={"symbol": "AAPL", "side": "BUY", "quantity": 10})
+    buy_id = buy.get_json()["order"]["id"]
+    client.post(
+        "/api/portfolio/breakdown/thresholds",
+        json={"id": buy_id, "stop_loss_price": 140, "take_profit_price": 170},
+    )
+
+    trigger_book.clear()
+    with app.app_context():
+        assert trigger_book.load() == 1
+    assert trigger_book.crossed("AAPL", 175.0) == [(buy_id, TAKE_PROFIT)]
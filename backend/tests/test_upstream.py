@@ -0,0 +1,112 @@
+"""
+Tests for the shared upstream session and Ticker registry
+"""
+from unittest.mock import Mock, patch
+
+import pytest
+
+from app import upstream
+from app.upstream import CircuitBreaker, TickerRegistry, TokenBucket, UpstreamUnavailable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_tickers_are_reused_until_too_old_for_the_caller():
+    clock = FakeClock()
+    registry = TickerRegistry(size=2, clock=clock)
+    first = registry.get("AAPL")
+    assert registry.get("AAPL") is first
+
+    clock.now = 60.0
+    # Reference data accepts an hour-old Ticker; quotes need a fresh one
+    assert registry.get("AAPL", max_age=upstream.REFERENCE_MAX_AGE) is first
+    assert registry.get("AAPL") is not first
+    assert registry.stats() == {"hits": 2, "misses": 2, "tickers": 1}
+
+
+def test_ticker_registry_evicts_least_recently_used():
+    registry = TickerRegistry(size=2)
+    aapl = registry.get("AAPL")
+    registry.get("MSFT")
+    registry.get("AAPL")
+    registry.get("NVDA")
+    assert registry.get("AAPL") is aapl
+    assert registry.stats()["tickers"] == 2
+    assert registry.get("MSFT") is not None
+    assert registry.stats()["misses"] == 4
+
+
+def test_tickers_share_the_pooled_session():
+    assert upstream.session() is upstream.session()
+    with patch.object(upstream.yf, "Ticker") as ticker_cls:
+        TickerRegistry().get("AAPL")
+    ticker_cls.assert_called_once_with("AAPL", session=upstream.session())
+
+
+def test_session_clamps_timeouts():
+    http = upstream.session()
+    with patch("requests.Session.request", return_value=Mock(status_code=200)) as request:
+        http.get("https://example.invalid", timeout=30)
+        assert request.call_args.kwargs["timeout"] == upstream.UPSTREAM_TIMEOUT
+        http.get("https://example.invalid", timeout=2)
+        assert request.call_args.kwargs["timeout"] == 2
+
+
+def test_token_bucket_delays_then_rejects():
+    clock = FakeClock()
+    slept = []
+    bucket = TokenBucket(rate=2.0, burst=2, max_wait=1.0, clock=clock, sleep=slept.append)
+    bucket.acquire()
+    bucket.acquire()
+    bucket.acquire()  # waits for the next token
+    bucket.acquire()
+    assert slept == [0.5, 1.0]
+    with pytest.raises(UpstreamUnavailable):
+        bucket.acquire()
+    assert bucket.stats()["rejected"] == 1
+
+    clock.now = 10.0
+    bucket.acquire()
+    assert slept == [0.5, 1.0]
+
+
+def test_breaker_opens_then_lets_one_probe_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failures=2, reset_seconds=30.0, clock=clock)
+    for _ in range(2):
+        breaker.before()
+        breaker.record(False)
+    assert breaker.state == "open"
+    with pytest.raises(UpstreamUnavailable):
+        breaker.before()
+
+    clock.now = 31.0
+    breaker.before()  # the probe
+    with pytest.raises(UpstreamUnavailable):
+        breaker.before()
+    breaker.record(False)
+    assert breaker.state == "open"
+
+    clock.now = 62.0
+    breaker.before()
+    breaker.record(True)
+    assert breaker.state == "closed"
+    breaker.before()
+
+
+def test_session_fails_fast_while_the_breaker_is_open(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(upstream, "breaker", CircuitBreaker(failures=2, clock=clock))
+    http = upstream.session()
+    with patch("requests.Session.request", return_value=Mock(status_code=429)) as request:
+        http.get("https://example.invalid")
+        http.get("https://example.invalid")
+        with pytest.raises(UpstreamUnavailable):
+            http.get("https://example.invalid")
+    assert request.call_count == 2
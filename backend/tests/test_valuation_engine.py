@@ -0,0 +1,60 @@
+"""
+Tests for the incrementally maintained account valuations
+"""
+from decimal import Decimal
+
+from app.extensions import db
+from app.models import Position
+from app.valuation_engine import AccountValuation, valuation_engine
+
+
+class TestAccountValuation:
+    def test_positions_and_ticks_adjust_equity_in_place(self):
+        valuation = AccountValuation()
+        valuation.set_position("AAPL", 10, Decimal("100"), Decimal("110"))
+        valuation.set_position("MSFT", 2, Decimal("300"), Decimal("300"))
+        assert valuation.equity_value == Decimal("1700")
+        assert valuation.unrealized_pnl == Decimal("100")
+
+        valuation.reprice("AAPL", Decimal("90"))
+        assert valuation.equity_value == Decimal("1500")
+        assert valuation.unrealized_pnl == Decimal("-100")
+
+        valuation.set_position("AAPL", 0, Decimal("0"), Decimal("90"))
+        assert valuation.equity_value == Decimal("600")
+        assert valuation.unrealized_pnl == Decimal("0")
+
+
+def test_summary_follows_fills_and_ticks_without_requoting(client, authenticated_user, mock_quote, mock_market_open, mock_company_name):
+    client.get("/api/account")
+    buy = client.post("/api/orders", json={"symbol": "AAPL", "side": "BUY", "quantity": 10})
+    account = buy.get_json()["account"]
+    assert account["equity_value"] == 1500.0
+    assert account["total_value"] == 100000.0
+
+    quote_calls = mock_quote.call_count
+    valuation_engine.on_tick("AAPL", 160.0)
+    account = client.get("/api/account").get_json()["account"]
+    assert account["equity_value"] == 1600.0
+    assert account["unrealized_pnl"] == 100.0
+    assert account["total_value"] == 100100.0
+    assert mock_quote.call_count == quote_calls
+
+    sell = client.post("/api/orders", json={"symbol": "AAPL", "side": "SELL", "quantity": 4})
+    account = sell.get_json()["account"]
+    assert account["equity_value"] == 960.0
+    assert account["cash_balance"] == 99100.0
+
+
+def test_reconcile_corrects_drift(app, client, authenticated_user, mock_quote, mock_market_open, mock_company_name):
+    client.post("/api/orders", json={"symbol": "AAPL", "side": "BUY", "quantity": 10})
+
+    with app.app_context():
+        # A change made behind the engine's back, e.g. by another worker
+        position = db.session.execute(db.select(Position).filter_by(symbol="AAPL")).scalar_one()
+        position.quantity = 20
+        db.session.commit()
+        assert valuation_engine.reconcile() == 1
+        assert valuation_engine.reconcile() == 0
+
+    assert client.get("/api/account").get_json()["account"]["equity_value"] == 3000.0
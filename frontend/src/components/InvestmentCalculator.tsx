@@ -25,6 +25,9 @@ ChartJS.register(
 
 type ChartPoint = { time: number; close: number };
 
+// Points drawn; also sent as max_points so the server downsamples before sending
+const DISPLAY_POINTS = 100;
+
 function decimate(data: ChartPoint[], maxPoints: number): ChartPoint[] {
   if (data.length <= maxPoints) return data;
   const result: ChartPoint[] = [];
@@ -95,7 +98,7 @@ export default function InvestmentCalculator() {
   const boxRef = useRef<HTMLDivElement>(null);
   const BOX_WIDTH_ESTIMATE = 180;
 
-  const displayData = useMemo(() => decimate(chartData, 100), [chartData]);
+  const displayData = useMemo(() => decimate(chartData, DISPLAY_POINTS), [chartData]);
   const amt = parseFloat(amount) || 0;
   const firstClose = chartData[0]?.close;
   const investmentValues = useMemo(() => {
@@ -176,27 +179,29 @@ export default function InvestmentCalculator() {
         const start = new Date(startDateFull);
         const years = (Date.now() - start.getTime()) / (365.25 * 24 * 60 * 60 * 1000);
         const interval = years > 2 ? "1wk" : "1d";
-        url = `/chart/${encodeURIComponent(symbol)}?start=${startDateFull}&interval=${interval}`;
+        url = `/chart/${encodeURIComponent(symbol)}?start=${startDateFull}&interval=${interval}&format=columns&max_points=${DISPLAY_POINTS}`;
       } else {
-        url = `/chart/${encodeURIComponent(symbol)}?period=max&interval=1wk`;
+        url = `/chart/${encodeURIComponent(symbol)}?period=max&interval=1wk&format=columns&max_points=${DISPLAY_POINTS}`;
       }
       const res = await apiFetch(url);
       if (!res.ok) {
         const err = await res.json().catch(() => ({}));
         throw new Error((err as { error?: string }).error ?? "Failed to fetch data");
       }
-      const payload = (await res.json()) as { data?: { time: number; close: number }[] };
-      const data = payload.data ?? [];
-      if (data.length === 0) {
+      // Columnar payload: only the time and close columns are needed here
+      const payload = (await res.json()) as { data?: { time: number[]; close: number[] } };
+      const times = payload.data?.time ?? [];
+      const closes = payload.data?.close ?? [];
+      if (times.length === 0) {
         throw new Error("No historical data for this symbol.");
       }
 
-      const firstClose = data[0].close;
-      const lastClose = data[data.length - 1].close;
+      const firstClose = closes[0];
+      const lastClose = closes[closes.length - 1];
       const shares = amt / firstClose;
       const valueToday = shares * lastClose;
 
-      const firstDate = new Date(data[0].time * 1000);
+      const firstDate = new Date(times[0] * 1000);
       const effectiveDateStr = parsed
         ? formatMonthYear(startDate)
         : firstDate.toLocaleDateString("en-US", { month: "short", year: "numeric" });
@@ -204,7 +209,7 @@ export default function InvestmentCalculator() {
       setCurrentValue(valueToday);
       setEffectiveStartDate(effectiveDateStr);
       setCalculatedSymbol(symbol);
-      setChartData(data.map((d) => ({ time: d.time, close: d.close })));
+      setChartData(times.map((time, i) => ({ time, close: closes[i] })));
     } catch (err) {
       setError(err instanceof Error ? err.message : "Something went wrong.");
     } finally {
@@ -26,7 +26,8 @@ ChartJS.register(
   Filler
 );
 
-const MAX_POINTS = 120;
+// Also sent as max_points so the server downsamples before sending
+export const MAX_POINTS = 120;
 
 function decimate(data: ChartData[], maxPoints: number): ChartData[] {
   if (data.length <= maxPoints) return data;
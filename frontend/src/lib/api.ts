@@ -68,3 +68,57 @@ export async function apiFetch(
 
   return response;
 }
+
+export type EventStreamHandlers = Record<string, (data: unknown) => void>;
+
+/**
+ * Subscribe to a Server-Sent Events endpoint with cookies.
+ * - The browser reconnects on network errors and resumes with Last-Event-ID
+ * - If the server refuses the stream (e.g. the access token expired), refreshes
+ *   the tokens and reopens from the last event seen
+ * Returns a function that closes the stream.
+ */
+export function openEventStream(path: string, handlers: EventStreamHandlers): () => void {
+  const url = path.startsWith("http")
+    ? path
+    : `${API_BASE_URL}${path.startsWith("/") ? "" : "/"}${path}`;
+  let source: EventSource | null = null;
+  let lastEventId = "";
+  let closed = false;
+  let retryTimer: ReturnType<typeof setTimeout> | undefined;
+
+  const connect = () => {
+    const separator = url.includes("?") ? "&" : "?";
+    const streamUrl = lastEventId ? `${url}${separator}last_event_id=${encodeURIComponent(lastEventId)}` : url;
+    source = new EventSource(streamUrl, { withCredentials: true });
+
+    for (const [event, handler] of Object.entries(handlers)) {
+      source.addEventListener(event, (message) => {
+        const { data, lastEventId: eventId } = message as MessageEvent<string>;
+        if (eventId) lastEventId = eventId;
+        handler(JSON.parse(data));
+      });
+    }
+
+    source.onerror = () => {
+      // CONNECTING means the browser is already retrying on its own
+      if (closed || source?.readyState !== EventSource.CLOSED) return;
+      retryTimer = setTimeout(async () => {
+        try {
+          await refreshTokens();
+        } catch (error) {
+          console.error(error);
+        }
+        if (!closed) connect();
+      }, 3000);
+    };
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    source?.close();
+  };
+}
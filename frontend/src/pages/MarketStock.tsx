@@ -1,7 +1,7 @@
 import { useEffect, useMemo, useState } from "react";
 import { Search } from "lucide-react";  // Minus, Plus, X removed (price alerts disabled)
 import { useNavigate, useParams } from "react-router-dom";
-import StockChart from "../components/ui/Chart";
+import StockChart, { MAX_POINTS } from "../components/ui/Chart";
 import { LoadingSpinner } from "../components/ui/loading-spinner";
 import { apiFetch } from "../lib/api";
 import type { AiCompanyPayload, ChartData } from "../data/Mockdata";
@@ -18,6 +18,8 @@ const formatPrice = (v: unknown): string => {
   return Number.isNaN(n) ? "—" : n.toFixed(2);
 };
 
+const QUOTE_REFRESH_MS = 15000;
+
 const metricLabels: Array<{ key: keyof NonNullable<AiCompanyPayload["performance_metrics"]>; label: string }> = [
   { key: "past_week_growth", label: "Past Week Growth" },
   { key: "market_cap", label: "Market Cap" },
@@ -79,7 +81,7 @@ export default function MarketStock() {
 
       const { period: apiPeriod, interval } = periodMap[period] || periodMap["1mo"];
       const chartResponse = await apiFetch(
-        `/chart/${normalizedSymbol}?period=${apiPeriod}&interval=${interval}`
+        `/chart/${normalizedSymbol}?period=${apiPeriod}&interval=${interval}&max_points=${MAX_POINTS}`
       );
       
       if (chartResponse.ok) {
@@ -121,6 +123,33 @@ export default function MarketStock() {
     void load();
   }, [normalizedSymbol]);
 
+  // Keep the price fresh without re-requesting fundamentals, profile and calendar
+  useEffect(() => {
+    if (!normalizedSymbol) return;
+    const refreshQuote = async () => {
+      try {
+        const response = await apiFetch(`/market/${normalizedSymbol}?sections=quote`);
+        if (!response.ok) return;
+        const payload = (await response.json()) as { data?: Partial<AiCompanyPayload> };
+        const update = payload.data;
+        if (!update) return;
+        setData((current) =>
+          current && current.ticker === update.ticker
+            ? {
+                ...current,
+                quote: update.quote ?? current.quote,
+                market_status: update.market_status ?? current.market_status,
+              }
+            : current
+        );
+      } catch {
+        // Keep showing the last price
+      }
+    };
+    const timer = window.setInterval(() => void refreshQuote(), QUOTE_REFRESH_MS);
+    return () => window.clearInterval(timer);
+  }, [normalizedSymbol]);
+
   useEffect(() => {
     if (!normalizedSymbol) {
       setIsInWatchlist(false);
@@ -6,9 +6,11 @@ import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from ".
 import { TableSkeleton } from "../components/ui/table-skeleton";
 import { Button } from "../components/ui/button";
 import { apiFetch } from "../lib/api";
+import { usePortfolio } from "./PortfolioLayout";
 
 interface Order {
-  id: number,
+  id: number | null, // Buy order; null for lots carried over without one
+  lot_id: number,
   created_at: string,
   symbol: string,
   company_name: string,
@@ -40,9 +42,10 @@ export default function PortfolioBreakdown() {
   const [closeTradeModalActive, setCloseTradeModalActive] = useState<boolean>(false);
   const [closeAllTradesModalActive, setCloseAllTradesModalActive] = useState<boolean>(false);
   const [tradeError, setTradeError] = useState<string | null>(null);
+  const { subscribe } = usePortfolio();
   
-  const handleOrderOpen = (id: number) => {
-    const selectedOrder = orderHistory?.find((o: Order) => o.id === id) ?? null;
+  const handleOrderOpen = (lotId: number) => {
+    const selectedOrder = orderHistory?.find((o: Order) => o.lot_id === lotId) ?? null;
     setOrder(selectedOrder);
     
     // Pre-populate the input fields with existing values
@@ -65,13 +68,13 @@ export default function PortfolioBreakdown() {
     setOrder(null);
   }
 
-  const handleSellStock = async (id: number, symbol: string, quantity: number) => {
+  const handleSellStock = async (lotId: number, symbol: string, quantity: number) => {
     setLoading(true);
     if (!symbol || !quantity) return;
     try {
       const response = await apiFetch("/sell", {
         method: "POST",
-        body: { id, symbol, quantity },
+        body: { lot_id: lotId, symbol, quantity },
       });
       if (!response.ok) throw new Error("Failed to sell stock.");
       setCloseTradeModalActive(false);
@@ -84,7 +87,8 @@ export default function PortfolioBreakdown() {
   };
 
   const handleUpdateThresholds = async () => {
-    if (!order) return;
+    // Thresholds live on the buy order
+    if (!order || order.id === null) return;
     const response = await apiFetch("/portfolio/breakdown/thresholds", {
       method: "POST",
       body: { id: order.id, stop_loss_price: parseFloat(stopLossPrice), take_profit_price: parseFloat(takeProfitPrice) },
@@ -127,12 +131,39 @@ export default function PortfolioBreakdown() {
     }
 
     loadStatus(true);
-    const interval = setInterval(() => {
-      loadStatus(false);
-    }, 2000); // Refresh every 2 seconds
 
-    return () => clearInterval(interval);
-  }, []);
+    // Reprice the open orders on each tick; reload them only when something fills
+    let connected = false;
+    const unsubscribe = subscribe({
+      snapshot: () => {
+        if (connected) loadStatus(false);
+        connected = true;
+      },
+      position: (data) => {
+        const row = data as { symbol: string, market_price: number };
+        if (row.symbol !== symbol) return;
+        setOrderHistory((current) => {
+          if (!current || current.length === 0) return current;
+          const repriced = current.map((order) => {
+            const unrealized = (row.market_price - order.price) * order.quantity;
+            return {
+              ...order,
+              market_price: row.market_price,
+              unrealized_pnl: Number(unrealized.toFixed(2)),
+              unrealized_pnl_percentage: Number((unrealized / (order.price * order.quantity) * 100).toFixed(2)),
+              net_value: Number((row.market_price * order.quantity).toFixed(2)),
+            };
+          });
+          setMarketPrice(repriced[0].market_price);
+          setMarketPriceChange(repriced[0].unrealized_pnl);
+          setMarketPriceChangePercentage(repriced[0].unrealized_pnl_percentage);
+          return repriced;
+        });
+      },
+    });
+
+    return unsubscribe;
+  }, [subscribe]);
 
   useEffect(() => {
     const loadMarketStatus = async () => {
@@ -167,7 +198,7 @@ export default function PortfolioBreakdown() {
               <div>
                 <h2 className="text-lg font-semibold">Buy Position</h2>
                 <p className="text-xs text-muted-foreground mt-1">
-                  ID#{order?.id.toString()}
+                  {order?.id != null ? `ID#${order.id}` : `Lot #${order?.lot_id}`}
                 </p>
               </div>
               <Button
@@ -264,7 +295,7 @@ export default function PortfolioBreakdown() {
                   </div>
 
                   <div className="flex flex-col gap-3">
-                    <Button className="w-full bg-primary text-primary-foreground hover:bg-primary/90" onClick={handleUpdateThresholds}>
+                    <Button className="w-full bg-primary text-primary-foreground hover:bg-primary/90" onClick={handleUpdateThresholds} disabled={order.id === null}>
                       Update Thresholds
                     </Button>
                     <Button 
@@ -325,7 +356,7 @@ export default function PortfolioBreakdown() {
             </TableHeader>
             <TableBody>
               {orderHistory.map((order: Order) => (
-                <TableRow key={order.id} className="cursor-pointer" onClick={() => handleOrderOpen(order.id)}>
+                <TableRow key={order.lot_id} className="cursor-pointer" onClick={() => handleOrderOpen(order.lot_id)}>
                   <TableCell>
                     <div className="font-semibold">{order.symbol}</div>
                     <div className="text-xs text-muted-foreground">
@@ -365,7 +396,7 @@ export default function PortfolioBreakdown() {
                       className="w-20 h-8 border border-red-500 rounded-full bg-transparent text-red-500 transition-colors duration-300 ease-in-out hover:bg-red-500 hover:text-white hover:border-red-500" 
                       onClick={(e) => { 
                         e.stopPropagation();
-                        const selectedOrder = orderHistory?.find((o: Order) => o.id === order.id) ?? null;
+                        const selectedOrder = orderHistory?.find((o: Order) => o.lot_id === order.lot_id) ?? null;
                         setOrder(selectedOrder);
                         setCloseTradeModalActive(true); 
                       }}
@@ -395,7 +426,7 @@ export default function PortfolioBreakdown() {
               <div>
                 <h2 className="text-lg font-semibold">Close Trade</h2>
                 <p className="text-xs text-muted-foreground mt-1">
-                  ID#{order?.id.toString()}
+                  {order?.id != null ? `ID#${order.id}` : `Lot #${order?.lot_id}`}
                 </p>
               </div>
               <Button
@@ -472,7 +503,7 @@ export default function PortfolioBreakdown() {
                       className="w-full border-red-500 text-red-500 hover:bg-red-500 hover:text-white"
                       onClick={(e) => {
                         e.stopPropagation();
-                        handleSellStock(order.id, order.symbol, order.quantity);
+                        handleSellStock(order.lot_id, order.symbol, order.quantity);
                       }}
                     >
                       Close Trade
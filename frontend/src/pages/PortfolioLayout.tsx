@@ -1,8 +1,8 @@
-import { useState, useEffect } from "react";
-import { Outlet } from "react-router-dom";
-import { apiFetch } from "../lib/api";
+import { useState, useEffect, useCallback, useRef } from "react";
+import { Outlet, useOutletContext } from "react-router-dom";
+import { openEventStream, type EventStreamHandlers } from "../lib/api";
 
-interface Position {
+export interface Position {
   symbol: string,
   company_name: string,
   market_price: number,
@@ -13,6 +13,23 @@ interface Position {
   net_value: number;
 }
 
+export interface PortfolioContext {
+  loading: boolean,
+  positionsPayload: Position[] | null,
+  accountCash: number | null,
+  totalInvested: number | null,
+  profitLoss: number | null,
+  portfolioValue: number | null,
+  // Listen to the layout's /portfolio/stream; returns the unsubscribe function
+  subscribe: (handlers: EventStreamHandlers) => () => void,
+}
+
+// Portfolio pages share the layout's stream instead of opening their own: each
+// EventSource holds a server thread for as long as the tab is open
+export function usePortfolio() {
+  return useOutletContext<PortfolioContext>();
+}
+
 export default function PortfolioLayout() {
   const [loading, setLoading] = useState(false);
   const [positionsPayload, setPositionsPayload] = useState<Position[] | null>(null);
@@ -20,44 +37,58 @@ export default function PortfolioLayout() {
   const [totalInvested, setTotalInvested] = useState<number | null>(null);
   const [profitLoss, setProfitLoss] = useState<number | null>(null);
   const [portfolioValue, setPortfolioValue] = useState<number | null>(null);
+  const listeners = useRef(new Set<EventStreamHandlers>());
+
+  const subscribe = useCallback((handlers: EventStreamHandlers) => {
+    listeners.current.add(handlers);
+    return () => {
+      listeners.current.delete(handlers);
+    };
+  }, []);
 
   useEffect(() => {
     setLoading(true);
-    const loadStatus = async (showLoading: boolean) => {
-      if (showLoading) setLoading(true);
+    let positions: Position[] = [];
+    let cash = 0;
 
-      try {
-        const response = await apiFetch("/portfolio");
-        if (!response.ok) {
-          return;
-        }
-  
-        const payload = (await response.json()) as { account_cash: number, portfolio: Position[] };
-        const positions = Array.isArray(payload.portfolio) ? payload.portfolio : [];
-        setPositionsPayload(positions);
-        setAccountCash(payload.account_cash);
-        setTotalInvested(positions.reduce((acc, position) => acc + position.avg_price * position.quantity, 0));
-        setProfitLoss(positions.reduce((acc, position) => acc + position.unrealized_pnl, 0));
-        setPortfolioValue(payload.account_cash + (positions.reduce((acc, position) => acc + position.avg_price * position.quantity, 0) ?? 0) + (positions.reduce((acc, position) => acc + position.unrealized_pnl, 0) ?? 0));
-      } catch (error) {
-        console.error(error);
-      } finally {
-        if (showLoading) setLoading(false);
-      }
-    }
+    const applyPortfolio = () => {
+      const invested = positions.reduce((acc, position) => acc + position.avg_price * position.quantity, 0);
+      const pnl = positions.reduce((acc, position) => acc + position.unrealized_pnl, 0);
+      setPositionsPayload(positions);
+      setAccountCash(cash);
+      setTotalInvested(invested);
+      setProfitLoss(pnl);
+      setPortfolioValue(cash + invested + pnl);
+    };
 
-    loadStatus(true);
+    const notify = (event: string, data: unknown) => {
+      for (const handlers of listeners.current) handlers[event]?.(data);
+    };
 
-    const interval = setInterval(() => {
-      loadStatus(false);
-    }, 2000); // Refresh every 2 seconds
+    // Full portfolio on connect and after every fill, repriced rows on each tick
+    const close = openEventStream("/portfolio/stream", {
+      snapshot: (data) => {
+        const payload = data as { account_cash: number, portfolio: Position[] };
+        positions = Array.isArray(payload.portfolio) ? payload.portfolio : [];
+        cash = payload.account_cash;
+        applyPortfolio();
+        setLoading(false);
+        notify("snapshot", data);
+      },
+      position: (data) => {
+        const row = data as Position;
+        positions = positions.map((position) => (position.symbol === row.symbol ? row : position));
+        applyPortfolio();
+        notify("position", data);
+      },
+    });
 
-    return () => clearInterval(interval);
+    return close;
   }, []);
 
   return (
     <div className="pb-24">
-      <Outlet context={{ loading, positionsPayload, accountCash, totalInvested, profitLoss, portfolioValue }} />
+      <Outlet context={{ loading, positionsPayload, accountCash, totalInvested, profitLoss, portfolioValue, subscribe }} />
 
       {/* Bottom Section: Portfolio Value */}
       <div className="fixed bottom-0 z-30 left-[var(--sidebar-width)] right-0 border-t border-border/40 bg-card/95 backdrop-blur transition-[left] duration-300 ease-in-out">
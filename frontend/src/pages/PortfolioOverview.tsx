@@ -5,17 +5,7 @@ import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from ".
 import { TableSkeleton } from "../components/ui/table-skeleton";
 import { Button } from "../components/ui/button";
 import { apiFetch } from "../lib/api";
-
-interface Position {
-  symbol: string,
-  company_name: string,
-  market_price: number,
-  quantity: number,
-  avg_price: number,
-  unrealized_pnl: number,
-  unrealized_pnl_percentage: number,
-  net_value: number;
-}
+import { usePortfolio } from "./PortfolioLayout";
 
 interface PendingOrder {
   id: number;
@@ -32,51 +22,12 @@ interface PendingOrder {
 type ViewMode = "positions" | "pending";
 
 export default function PortfolioOverview() {
-  const [loading, setLoading] = useState(false);
-  const [positionsPayload, setPositionsPayload] = useState<Position[] | null>(null);
+  const { loading, positionsPayload, accountCash, totalInvested, profitLoss, portfolioValue } = usePortfolio();
   const [pendingOrders, setPendingOrders] = useState<PendingOrder[] | null>(null);
   const [pendingOrdersLoading, setPendingOrdersLoading] = useState(false);
   const [viewMode, setViewMode] = useState<ViewMode>("positions");
-  const [accountCash, setAccountCash] = useState<number | null>(null);
-  const [totalInvested, setTotalInvested] = useState<number | null>(null);
-  const [profitLoss, setProfitLoss] = useState<number | null>(null);
-  const [portfolioValue, setPortfolioValue] = useState<number | null>(null);
   const navigate = useNavigate();
 
-  useEffect(() => {
-    setLoading(true);
-    const loadStatus = async (showLoading: boolean) => {
-      if (showLoading) setLoading(true);
-
-      try {
-        const response = await apiFetch("/portfolio");
-        if (!response.ok) {
-          return;
-        }
-  
-        const payload = (await response.json()) as { account_cash: number, portfolio: Position[] };
-        const positions = Array.isArray(payload.portfolio) ? payload.portfolio : [];
-        setPositionsPayload(positions);
-        setAccountCash(payload.account_cash);
-        setTotalInvested(positions.reduce((acc, position) => acc + position.avg_price * position.quantity, 0));
-        setProfitLoss(positions.reduce((acc, position) => acc + position.unrealized_pnl, 0));
-        setPortfolioValue(payload.account_cash + (positions.reduce((acc, position) => acc + position.avg_price * position.quantity, 0) ?? 0) + (positions.reduce((acc, position) => acc + position.unrealized_pnl, 0) ?? 0));
-      } catch (error) {
-        console.error(error);
-      } finally {
-        if (showLoading) setLoading(false);
-      }
-    }
-
-    loadStatus(true);
-
-    const interval = setInterval(() => {
-      loadStatus(false);
-    }, 2000); // Refresh every 2 seconds
-
-    return () => clearInterval(interval);
-  }, []);
-
   useEffect(() => {
     if (viewMode !== "pending") return;
 